@@ -1,49 +1,219 @@
 import asyncio
+import os
+import signal
+import time
 from typing import Optional
 
 from bot import FlyMeBot
-from slack import create_slack_app, setup_slack_handlers, create_socket_handler
+from slack import create_slack_app, create_scheduler, setup_slack_handlers, create_socket_handler
 from graceful import GracefulShutdown
 from config import Config, setup_logging
+from constants import BOT_CONFIG
+from conversation import create_conversation_store
+from metrics import REGISTRY, MetricsServer
+from sharding import ShardRouter
+from snapshot import StateSnapshot
+from transport import HttpTransport
+from watches import WatchStore
 
 class FlyMeApp:
     """Main application class that orchestrates all components"""
     
     def __init__(self, config: Config):
         self.config = config
-        self.logger = setup_logging(config.log_level)
+        self.logger = setup_logging(
+            config.log_level,
+            max_chars=config.log_max_chars,
+            sample_rate=config.log_sample_rate
+        )
         self.bot: Optional[FlyMeBot] = None
         self.slack_app = None
         self.handler = None
-        self.shutdown = GracefulShutdown()
+        self.scheduler = None
+        self.metrics_server: Optional[MetricsServer] = None
+        self.router: Optional[ShardRouter] = None
+        self.transport: Optional[HttpTransport] = None
+        self.snapshot: Optional[StateSnapshot] = None
+        self.shutdown = GracefulShutdown(drain_timeout=BOT_CONFIG["drain_timeout"])
         
     async def initialize(self):
         """Initialize all application components"""
         self.logger.info("Launching FlyMe application...")
         
+        # One set of pooled, kept-warm connections for Slack, Arcade and OpenAI
+        self.transport = HttpTransport(
+            max_connections=BOT_CONFIG["http_max_connections"],
+            max_keepalive=BOT_CONFIG["http_max_keepalive"],
+            keepalive_expiry=BOT_CONFIG["http_keepalive_expiry"],
+            http2=BOT_CONFIG["http2"],
+            warm_interval=BOT_CONFIG["http_warm_interval"]
+        )
+        
         # Create Slack app
-        self.slack_app = create_slack_app()
+        self.slack_app = create_slack_app(self.transport)
+        
+        # Conversation memory, persisted to SQLite when CONVERSATION_DB is set
+        conversations = create_conversation_store(
+            self.config.conversation_db,
+            max_turns=BOT_CONFIG["max_conversation_history"],
+            idle_ttl=BOT_CONFIG["conversation_idle_ttl"],
+            max_users=BOT_CONFIG["conversation_max_users"]
+        )
+        
+        # Price watches live in SQLite so they survive restarts and are shared by workers
+        watch_store = WatchStore(self.config.watch_db)
         
         # Initialize bot with Slack client
-        self.bot = FlyMeBot(slack_client=self.slack_app.client)
+        self.bot = FlyMeBot(
+            slack_client=self.slack_app.client,
+            conversation_store=conversations,
+            transport=self.transport,
+            watch_store=watch_store
+        )
         await self.bot.initialize()
+        self.transport.start()
         
-        # Set up Slack handlers
-        setup_slack_handlers(self.slack_app, self.bot)
+        # Conversations and caches saved by the previous process when it drained
+        if self.config.state_snapshot:
+            self.snapshot = StateSnapshot(
+                self.snapshot_path(),
+                max_age=BOT_CONFIG["snapshot_max_age"]
+            )
+            self.snapshot.restore(self.bot)
+        
+        # One process polls watched routes; with several workers that is worker 0
+        if self.bot.watcher and not self.config.worker_index:
+            self.bot.watcher.start()
+        
+        # Warm the profile cache in the background
+        if self.bot.profiles:
+            self.bot.profiles.start()
+        
+        # As one of several sharded workers, hand other workers' users to them
+        if self.config.worker_index is not None:
+            self.router = ShardRouter(
+                self.config.worker_index,
+                self.config.workers,
+                base_port=self.config.shard_port
+            )
+            await self.router.start()
+        
+        # Set up Slack handlers behind the per-user request scheduler
+        self.scheduler = create_scheduler()
+        setup_slack_handlers(self.slack_app, self.bot, self.scheduler, self.router)
+        
+        # Queue depth and cache hit rates are sampled when metrics are scraped
+        self.register_gauges()
+        if self.config.metrics_port:
+            # Each worker serves its own metrics on the next port up
+            port = self.config.metrics_port + (self.config.worker_index or 0)
+            self.metrics_server = MetricsServer(REGISTRY, port=port)
+            await self.metrics_server.start()
         
         # Create Socket Mode handler
         self.handler = await create_socket_handler(self.slack_app)
         
-        # Set up graceful shutdown
+        # Set up graceful shutdown: stop taking events, finish requests, save state,
+        # then clean up; pooled connections close after everything using them
+        self.shutdown.add_drain_handler(self.stop_accepting)
+        self.shutdown.add_drain_handler(self.finish_requests)
+        if self.snapshot:
+            self.shutdown.add_drain_handler(self.save_state)
         self.shutdown.add_handler(self.cleanup)
+        self.shutdown.add_handler(self.transport.close)
         self.shutdown.setup_signal_handlers()
         
         self.logger.info("FlyMe application initialized successfully")
         
+    def register_gauges(self):
+        """Expose scheduler and cache state as scrape-time gauges"""
+        scheduler, bot = self.scheduler, self.bot
+        REGISTRY.gauge("flyme_queue_depth", "Requests waiting for a worker", lambda: scheduler.depth)
+        REGISTRY.gauge("flyme_active_requests", "Requests being processed", lambda: scheduler.active)
+        REGISTRY.gauge(
+            "flyme_tool_cache_hit_ratio", "Tool cache hits (incl. coalesced) per lookup",
+            lambda: bot.tool_cache.stats()["hit_rate"]
+        )
+        REGISTRY.gauge(
+            "flyme_answer_cache_hit_ratio", "First-turn requests answered from the answer cache",
+            lambda: bot.answer_cache.stats()["hit_rate"]
+        )
+        if bot.profiles:
+            REGISTRY.gauge(
+                "flyme_profile_cache_hit_ratio", "Profile cache hits per lookup",
+                lambda: bot.profiles.stats()["hit_rate"]
+            )
+        if bot.watcher:
+            REGISTRY.gauge(
+                "flyme_watched_routes", "Distinct routes polled for price watches",
+                lambda: bot.watcher.stats()["routes"]
+            )
+        if self.router:
+            router = self.router
+            REGISTRY.gauge(
+                "flyme_forwarded_events", "Events forwarded to the owning worker",
+                lambda: router.forwarded
+            )
+        
+    def snapshot_path(self) -> str:
+        """The snapshot file; each sharded worker hands over its own"""
+        if self.config.worker_index is None:
+            return self.config.state_snapshot
+        root, ext = os.path.splitext(self.config.state_snapshot)
+        return f"{root}.{self.config.worker_index}{ext}"
+        
+    async def stop_accepting(self):
+        """Close the Socket Mode connection so Slack sends new events to other connections"""
+        if self.handler:
+            await self.handler.close_async()
+            self.handler = None
+            
+    async def finish_requests(self):
+        """Let queued and running requests reply within the drain budget"""
+        unfinished = await self.scheduler.drain(self.shutdown.remaining())
+        if unfinished:
+            self.logger.warning(f"Drain budget spent with requests unfinished for {unfinished} users")
+            
+    def save_state(self):
+        """Snapshot conversations and caches for the next process"""
+        self.snapshot.save(self.bot)
+        
+    async def retire(self, pid: int):
+        """Drain the instance this one replaces, then take over its saved state"""
+        self.logger.info(f"Connected to Slack; draining previous instance (pid {pid})")
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            self.logger.info(f"Previous instance (pid {pid}) already exited")
+        else:
+            give_up = time.monotonic() + BOT_CONFIG["drain_timeout"] + 30
+            while time.monotonic() < give_up and process_alive(pid):
+                await asyncio.sleep(0.5)
+        if self.snapshot:
+            self.snapshot.restore(self.bot)
+            
+    async def serve(self):
+        """Connect to Slack, retire the instance this one replaces, then listen until stopped"""
+        await self.handler.connect_async()
+        if self.config.replace_pid:
+            await self.retire(self.config.replace_pid)
+        await asyncio.sleep(float("inf"))
+        
     async def cleanup(self):
         """Clean up resources during shutdown"""
         if self.handler:
             await self.handler.close_async()
+        if self.metrics_server:
+            await self.metrics_server.stop()
+        if self.router:
+            await self.router.stop()
+        if self.bot and self.bot.profiles:
+            await self.bot.profiles.stop()
+        if self.bot and self.bot.watcher:
+            await self.bot.watcher.stop()
+            self.bot.watcher.store.close()
+        if self.bot:
+            self.bot.conversation_history.close()
             
     async def run(self):
         """Run the application"""
@@ -51,7 +221,7 @@ class FlyMeApp:
         
         try:
             # Create tasks for both the handler and shutdown wait
-            handler_task = asyncio.create_task(self.handler.start_async())
+            handler_task = asyncio.create_task(self.serve())
             shutdown_task = asyncio.create_task(self.shutdown.wait_for_shutdown())
             
             # Wait for either the handler to stop or shutdown signal
@@ -77,10 +247,20 @@ class FlyMeApp:
             await self.shutdown.shutdown()
             
     def print_banner(self):
-        """Print application banner"""
-        print("\n" + "="*50)
-        print("🚀 FlyMe - Find Flights in Slack!")
-        print("="*50)
-        print("Bot is listening for messages... (Press Ctrl+C to stop)")
-        print("="*50 + "\n")
+        """Log application banner"""
+        self.logger.info("="*50)
+        self.logger.info("🚀 FlyMe - Find Flights in Slack!")
+        self.logger.info("Bot is listening for messages... (Press Ctrl+C to stop)")
+        self.logger.info("="*50)
         
+
+
+def process_alive(pid: int) -> bool:
+    """Whether a process with this pid still exists"""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
@@ -0,0 +1,480 @@
+#!/usr/bin/env python3
+"""
+FlyMe offline load test
+
+Drives setup_slack_handlers and FlyMeBot with local stand-ins for Slack
+(Socket Mode events and the Web API), Arcade (recorded Google Flights/Hotels
+payloads) and the model (a scripted runner), then reports latency
+percentiles, throughput and peak memory. No network access or API keys are
+needed, so regressions can be caught offline:
+
+    python benchmark.py --concurrency 20 --requests 400
+"""
+import argparse
+import asyncio
+import inspect
+import itertools
+import json
+import logging
+import os
+import random
+import re
+import time
+import tracemalloc
+from types import SimpleNamespace
+from typing import Dict, List, Optional
+
+import bot as bot_module
+from bot import FlyMeBot
+from constants import BOT_CONFIG, SEARCH_TOOLS
+from scheduler import RequestScheduler
+from slack import setup_slack_handlers
+
+BENCH_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmarks")
+
+_TZ_HUBS = re.compile(r"Main airports in the user's timezone[^:]*:[^.]*\.")
+_ISO_DATE = re.compile(r"\b\d{4}-\d{2}-\d{2}\b")
+_IATA = re.compile(r"\b[A-Z]{3}\b")
+
+
+def _jittered(delay: float) -> float:
+    return max(0.0, random.uniform(delay * 0.5, delay * 1.5))
+
+
+class FakeSlackClient:
+    """In-memory stand-in for slack_sdk's AsyncWebClient"""
+
+    def __init__(self, delay: float = 0.02):
+        self.delay = delay
+        self.sent = 0
+        self.updated = 0
+        self._ts = itertools.count(1)
+
+    async def chat_postMessage(self, channel, text="", **kwargs):
+        await asyncio.sleep(_jittered(self.delay))
+        self.sent += 1
+        return {"ok": True, "channel": channel, "ts": f"{time.time():.6f}.{next(self._ts)}"}
+
+    async def chat_update(self, channel, ts, text="", **kwargs):
+        await asyncio.sleep(_jittered(self.delay))
+        self.updated += 1
+        return {"ok": True, "channel": channel, "ts": ts}
+
+    async def users_info(self, user):
+        await asyncio.sleep(_jittered(self.delay))
+        return {"ok": True, "user": _fake_user(user)}
+
+    async def users_list(self, limit=200, cursor=None):
+        await asyncio.sleep(_jittered(self.delay))
+        start = int(cursor or 0)
+        members = [_fake_user(f"U{i:05d}") for i in range(start, min(start + limit, 500))]
+        next_cursor = str(start + limit) if start + limit < 500 else ""
+        return {"ok": True, "members": members, "response_metadata": {"next_cursor": next_cursor}}
+
+
+def _fake_user(user_id: str) -> dict:
+    return {
+        "id": user_id,
+        "tz": "America/New_York",
+        "tz_label": "Eastern Standard Time",
+    }
+
+
+class FakeSlackApp:
+    """Collects handlers registered by setup_slack_handlers and dispatches events to them
+
+    Like Bolt, only the first listener registered for an event type runs.
+    """
+
+    def __init__(self, client: FakeSlackClient):
+        self.client = client
+        self.listeners: Dict[str, list] = {}
+        self.logger = logging.getLogger("flyme.benchmark.slack")
+
+    def event(self, event_type):
+        def register(func):
+            self.listeners.setdefault(event_type, []).append(func)
+            return func
+        return register
+
+    async def dispatch(self, body: dict):
+        event = body["event"]
+        listeners = self.listeners.get(event["type"])
+        if not listeners:
+            return
+        listener = listeners[0]
+
+        async def say(text):
+            return await self.client.chat_postMessage(channel=event.get("channel"), text=text)
+
+        available = {
+            "event": event,
+            "body": body,
+            "say": say,
+            "client": self.client,
+            "logger": self.logger,
+        }
+        params = inspect.signature(listener).parameters
+        await listener(**{name: available[name] for name in params if name in available})
+
+
+class FakeSocketModeSource:
+    """Produces Socket Mode events_api envelopes for corpus messages"""
+
+    def __init__(self, app: FakeSlackApp):
+        self.app = app
+        self._event_ids = itertools.count(1)
+
+    async def send(self, user_id: str, kind: str, text: str):
+        if kind == "mention":
+            event = {
+                "type": "app_mention",
+                "user": user_id,
+                "text": text.replace("@FlyMe", "<@UFLYME>"),
+                "channel": "C0TRAVEL",
+            }
+        else:
+            event = {
+                "type": "message",
+                "channel_type": "im",
+                "user": user_id,
+                "text": text,
+                "channel": f"D{user_id}",
+            }
+        body = {
+            "event_id": f"Ev{next(self._event_ids):08d}",
+            "event_time": int(time.time()),
+            "event": event,
+        }
+        await self.app.dispatch(body)
+
+
+class StubArcade:
+    """Stand-in for AsyncArcade that answers from recorded payloads"""
+
+    def __init__(self, payloads: dict, delay: float = 0.8, **kwargs):
+        self.payloads = payloads
+        self.delay = delay
+        self.calls = 0
+        self.tools = SimpleNamespace(execute=self.execute)
+
+    async def execute(self, tool_name: str, input: dict, user_id: Optional[str] = None):
+        self.calls += 1
+        await asyncio.sleep(_jittered(self.delay))
+        key = "hotels" if "hotel" in tool_name.lower() else "flights"
+        return SimpleNamespace(success=True, output=SimpleNamespace(value=self.payloads[key], error=None))
+
+
+async def stub_fetch_arcade_tools(client: StubArcade, user_id=None):
+    """FunctionTools shaped like agents_arcade's, backed by the stub client"""
+    from agents import FunctionTool
+
+    def make_tool(arcade_name: str):
+        async def on_invoke(ctx, arguments):
+            response = await client.execute(arcade_name, json.loads(arguments or "{}"), user_id)
+            return json.dumps(response.output.value)
+
+        return FunctionTool(
+            name=arcade_name.replace(".", "_"),
+            description=f"Recorded {arcade_name}",
+            params_json_schema={"type": "object", "properties": {}, "additionalProperties": True},
+            on_invoke_tool=on_invoke,
+            strict_json_schema=False
+        )
+
+    return [make_tool(name) for name in SEARCH_TOOLS.values()]
+
+
+class ScriptedRunner:
+    """Replaces agents.Runner with a deterministic, delay-driven script
+
+    Each request is one clarification turn when details are missing, or a
+    tool turn followed by a synthesis turn when the conversation already
+    names airports/places and dates. Tool calls go through the bot's real
+    wrapped tools, so caching, rate limiting and deadlines are exercised.
+    """
+
+    model_delay = 0.5
+    # Mean seconds per turn for the small gathering model, and turns taken per model
+    gather_model_delay = 0.2
+    turns: Dict[str, int] = {}
+
+    @classmethod
+    def _plan(cls, agent, prompt: str):
+        # Only look at the conversation, not the reminder boilerplate
+        conversation = prompt.split("IMPORTANT REMINDERS")[0]
+        # Timezone hubs are suggestions to confirm, not the user's origin
+        conversation = _TZ_HUBS.sub("", conversation)
+        tools = {tool.name: tool for tool in getattr(agent, "tools", [])}
+        dates = _ISO_DATE.findall(conversation)
+
+        if "hotel search request" in conversation and len(dates) >= 2:
+            return tools.get(SEARCH_TOOLS["hotels"].replace(".", "_")), {
+                "location": "Chicago",
+                "checkin_date": dates[-2],
+                "checkout_date": dates[-1],
+                "guests": 2,
+            }
+
+        codes = [c for c in _IATA.findall(conversation) if c not in {"USD"}]
+        if len(codes) >= 2 and dates:
+            args = {
+                "departure_airport_code": codes[-2],
+                "arrival_airport_code": codes[-1],
+                "outbound_date": dates[-2] if len(dates) >= 2 else dates[-1],
+            }
+            name = SEARCH_TOOLS["one_way"]
+            if len(dates) >= 2:
+                args["return_date"] = dates[-1]
+                name = SEARCH_TOOLS["roundtrip"]
+            return tools.get(name.replace(".", "_")), args
+        return None, None
+
+    @classmethod
+    async def _turn(cls, agent):
+        model = str(getattr(agent, "model", ""))
+        cls.turns[model] = cls.turns.get(model, 0) + 1
+        small = model == BOT_CONFIG["gather_model"]
+        await asyncio.sleep(_jittered(cls.gather_model_delay if small else cls.model_delay))
+
+    @classmethod
+    async def _execute(cls, agent, prompt: str, on_event=None):
+        emit = on_event or (lambda *args: None)
+        emit("turn")
+        await cls._turn(agent)
+        tool, args = cls._plan(agent, prompt)
+        if tool is None:
+            # The gathering model hands off when the full model could search
+            for target in getattr(agent, "handoffs", None) or []:
+                tool, args = cls._plan(target, prompt)
+                if tool is not None:
+                    agent = target
+                    emit("turn")
+                    await cls._turn(agent)
+                    break
+        if tool is None:
+            answer = "Happy to help! Where are you flying from, and which dates work for you?"
+        else:
+            emit("tool", tool.name)
+            ctx = SimpleNamespace(context={"user_id": "benchmark"}, tool_call_id="call_bench")
+            result = await tool.on_invoke_tool(ctx, json.dumps(args))
+            emit("turn")
+            await cls._turn(agent)
+            answer = f"Here are the best options I found:\n{str(result)[:400]}"
+        for start in range(0, len(answer), 40):
+            emit("text", answer[start:start + 40])
+        return answer
+
+    @classmethod
+    async def run(cls, starting_agent, input, **kwargs):
+        return SimpleNamespace(final_output=await cls._execute(starting_agent, input))
+
+    @classmethod
+    def run_streamed(cls, starting_agent, input, **kwargs):
+        return _ScriptedStream(cls, starting_agent, input)
+
+
+class _ScriptedStream:
+    """Mimics RunResultStreaming's stream_events()/final_output/cancel()"""
+
+    def __init__(self, runner, agent, prompt):
+        self.final_output = None
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._task = asyncio.get_running_loop().create_task(self._produce(runner, agent, prompt))
+
+    async def _produce(self, runner, agent, prompt):
+        def emit(kind, value=None):
+            if kind == "turn":
+                event = SimpleNamespace(type="raw_response_event", data=SimpleNamespace(type="response.created"))
+            elif kind == "text":
+                event = SimpleNamespace(
+                    type="raw_response_event",
+                    data=SimpleNamespace(type="response.output_text.delta", delta=value)
+                )
+            else:
+                event = SimpleNamespace(
+                    type="run_item_stream_event",
+                    name="tool_called",
+                    item=SimpleNamespace(raw_item=SimpleNamespace(name=value))
+                )
+            self._queue.put_nowait(event)
+
+        try:
+            self.final_output = await runner._execute(agent, prompt, emit)
+        finally:
+            self._queue.put_nowait(None)
+
+    async def stream_events(self):
+        while True:
+            event = await self._queue.get()
+            if event is None:
+                break
+            yield event
+        await self._task
+
+    def cancel(self):
+        self._task.cancel()
+
+
+class TimedScheduler(RequestScheduler):
+    """RequestScheduler that records submit-to-completion latency per request"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.latencies: List[float] = []
+        self.completed: Dict[str, asyncio.Event] = {}
+
+    def submit(self, user_id, job):
+        done = asyncio.Event()
+        submitted = time.perf_counter()
+
+        async def timed_job():
+            try:
+                await job()
+            finally:
+                self.latencies.append(time.perf_counter() - submitted)
+                done.set()
+
+        position = super().submit(user_id, timed_job)
+        # Simulated users are unique and wait for each reply, so one slot each
+        if position is None:
+            self.completed.pop(user_id, None)
+        else:
+            self.completed[user_id] = done
+        return position
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered) + 0.5) - 1))
+    return ordered[index]
+
+
+async def run_benchmark(args) -> dict:
+    with open(os.path.join(BENCH_DIR, "corpus.json")) as f:
+        corpus = json.load(f)
+    with open(os.path.join(BENCH_DIR, "payloads.json")) as f:
+        payloads = json.load(f)
+
+    random.seed(args.seed)
+    BOT_CONFIG["stream_responses"] = not args.no_stream
+    ScriptedRunner.model_delay = args.model_delay
+    ScriptedRunner.gather_model_delay = args.gather_model_delay
+
+    # Swap the remote backends for local stand-ins
+    bot_module.Runner = ScriptedRunner
+    bot_module.fetch_arcade_tools = stub_fetch_arcade_tools
+    bot_module.create_arcade_client = lambda http_client=None: StubArcade(payloads, delay=args.tool_delay)
+    BOT_CONFIG["tool_schema_cache"] = ""
+    bot_module.install_model_rate_limiter = lambda *a, **k: None
+
+    slack_client = FakeSlackClient(delay=args.slack_delay)
+    app = FakeSlackApp(slack_client)
+    bot = FlyMeBot(slack_client=slack_client)
+    if not await bot.initialize():
+        raise RuntimeError("FlyMeBot failed to initialize with the stub backends")
+    await bot.profiles.warm()
+
+    scheduler = TimedScheduler(
+        max_workers=args.workers or BOT_CONFIG["max_concurrent_requests"],
+        max_queued=BOT_CONFIG["max_queued_requests"],
+        dedup_ttl=BOT_CONFIG["event_dedup_ttl"]
+    )
+    setup_slack_handlers(app, bot, scheduler)
+    source = FakeSocketModeSource(app)
+
+    # Replay conversations; each simulated user waits for a reply before continuing
+    sent = 0
+    shed = 0
+    lock = asyncio.Lock()
+
+    async def replay(user_index: int):
+        nonlocal sent, shed
+        conversation = corpus[user_index % len(corpus)]
+        user_id = f"U{user_index:05d}"
+        for message in conversation["messages"]:
+            async with lock:
+                if sent >= args.requests:
+                    return
+                sent += 1
+            await source.send(user_id, conversation["kind"], message)
+            done = scheduler.completed.pop(user_id, None)
+            if done is None:
+                shed += 1
+                continue
+            await done.wait()
+            if args.think_time:
+                await asyncio.sleep(_jittered(args.think_time))
+
+    tracemalloc.start()
+    started = time.perf_counter()
+    user_ids = itertools.count()
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def user_slot():
+        while sent < args.requests:
+            async with semaphore:
+                await replay(next(user_ids))
+
+    await asyncio.gather(*(user_slot() for _ in range(args.concurrency)))
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    await bot.profiles.stop()
+
+    latencies = scheduler.latencies
+    return {
+        "requests": len(latencies),
+        "shed": shed,
+        "concurrency": args.concurrency,
+        "elapsed_s": round(elapsed, 3),
+        "rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+        "peak_mem_mb": round(peak / 1024 / 1024, 2),
+        "arcade_calls": bot.arcade_client.calls,
+        "tool_cache": bot.tool_cache.stats(),
+        "answer_cache": bot.answer_cache.stats(),
+        "prefetch": bot.prefetcher.stats() if bot.prefetcher else None,
+        "model_turns": dict(ScriptedRunner.turns),
+        "slack_posts": slack_client.sent,
+        "slack_updates": slack_client.updated,
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="FlyMe offline load test")
+    parser.add_argument("--concurrency", type=int, default=10, help="Simulated users talking at once")
+    parser.add_argument("--requests", type=int, default=200, help="Total messages to replay")
+    parser.add_argument("--workers", type=int, default=0, help="Scheduler workers (default: BOT_CONFIG)")
+    parser.add_argument("--model-delay", type=float, default=0.5, help="Mean seconds per scripted model turn")
+    parser.add_argument("--gather-model-delay", type=float, default=0.2, help="Mean seconds per turn of the small gathering model")
+    parser.add_argument("--tool-delay", type=float, default=0.8, help="Mean seconds per stub Arcade call")
+    parser.add_argument("--slack-delay", type=float, default=0.02, help="Mean seconds per fake Slack API call")
+    parser.add_argument("--think-time", type=float, default=0.0, help="Mean seconds a user waits between messages")
+    parser.add_argument("--no-stream", action="store_true", help="Disable streamed progress updates")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.WARNING)
+    report = asyncio.run(run_benchmark(args))
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print("\n" + "="*50)
+    print("FlyMe benchmark")
+    print("="*50)
+    for key, value in report.items():
+        print(f"{key:>14}: {value}")
+    print("="*50)
+
+
+if __name__ == "__main__":
+    main()
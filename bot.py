@@ -1,124 +1,448 @@
 import os
-from datetime import datetime
-from collections import defaultdict
-from agents import Agent, Runner
-from arcadepy import AsyncArcade
-from agents_arcade import get_arcade_tools
+import json
+import asyncio
+import logging
+from typing import Optional
+from agents import Agent, RunContextWrapper, Runner
+from cache import AnswerCache, ToolResultCache
 from constants import BOT_CONFIG, ERROR_MESSAGES
+from context_builder import ContextBuilder
+from conversation import ConversationStore
+from deadline import Deadline, bound_tools, current_deadline
+from fanout import FlexibleDateSearch
+from fastpath import format_results, parse_query, route_kind
+from geo import resolve_trip_places
+from metrics import REGISTRY, create_run_hooks, timed_tools
+from outbound import OutboundQueue
+from prefetch import SearchPrefetcher
+from profiles import UserProfileCache
+from prompts import GATHER_INSTRUCTIONS, InstructionTemplate
+from ratelimit import AdaptiveRateLimiter, install_model_rate_limiter, rate_limited_tools
+from reducers import current_trip, reduced_tools
+from toolschemas import DeferredToolset, ToolSchemaCache, tool_schema_version, tool_spec
+from watches import WATCH_TOOL, PriceWatcher
+
+logger = logging.getLogger("flyme.bot")
+
+# Arcade toolkits the agent is given
+TOOLKITS = ["search"]
+
+def create_arcade_client(http_client=None):
+    """Create the Arcade client (imported on first use; not needed for a warm start)"""
+    from arcadepy import DEFAULT_TIMEOUT, AsyncArcade
+    if http_client is None:
+        return AsyncArcade(api_key=os.getenv("ARCADE_API_KEY"))
+    # Given explicitly: with a custom http_client the SDK would use that client's timeout instead
+    return AsyncArcade(api_key=os.getenv("ARCADE_API_KEY"), http_client=http_client, timeout=DEFAULT_TIMEOUT)
+
+async def fetch_arcade_tools(client, user_id):
+    """Fetch the live Arcade tool definitions"""
+    from agents_arcade import get_arcade_tools
+    return await get_arcade_tools(client, toolkits=TOOLKITS, user_id=user_id)
 
 class FlyMeBot:
-    def __init__(self, slack_client=None):
-        self.arcade_client = AsyncArcade(api_key=os.getenv("ARCADE_API_KEY"))
+    def __init__(self, slack_client=None, conversation_store=None, transport=None, watch_store=None):
+        self._arcade_client = None
+        # Shared connection pools (see transport.py); None uses each SDK's own
+        self.transport = transport
         self.agent = None
+        self.gatherer = None
         self.user_id = "flyme_slack_user"
         self.slack_client = slack_client
-        # Add conversation memory
-        self.conversation_history = defaultdict(list)
+        # Client-side rate limiting shared by every request
+        self.model_limiter = AdaptiveRateLimiter("openai", rate=BOT_CONFIG["model_rate_limit"])
+        self.arcade_limiter = AdaptiveRateLimiter("arcade", rate=BOT_CONFIG["arcade_rate_limit"])
+        # Timezone lookups are served from a background-refreshed cache
+        self.profiles = UserProfileCache(
+            slack_client,
+            ttl=BOT_CONFIG["profile_cache_ttl"],
+            max_size=BOT_CONFIG["profile_cache_size"],
+            refresh_interval=BOT_CONFIG["profile_refresh_interval"]
+        ) if slack_client else None
+        # Replies are queued per channel, paced, split and retried on ratelimited
+        self.outbound = OutboundQueue(
+            slack_client,
+            post_rate=BOT_CONFIG["slack_post_rate"],
+            update_rate=BOT_CONFIG["slack_update_rate"],
+            max_retries=BOT_CONFIG["slack_max_retries"],
+            max_chars=BOT_CONFIG["slack_max_message_chars"],
+            blocks=BOT_CONFIG["block_kit_results"]
+        ) if slack_client else None
+        # Add conversation memory (bounded, optionally persisted)
+        self.conversation_history = conversation_store or ConversationStore(
+            max_turns=BOT_CONFIG["max_conversation_history"],
+            idle_ttl=BOT_CONFIG["conversation_idle_ttl"],
+            max_users=BOT_CONFIG["conversation_max_users"]
+        )
+        # Prompt context: trip facts, running summary and recent turns within a token budget
+        self.context = ContextBuilder(
+            token_budget=BOT_CONFIG["context_token_budget"],
+            turn_tokens=BOT_CONFIG["context_turn_tokens"],
+            idle_ttl=BOT_CONFIG["conversation_idle_ttl"],
+            max_users=BOT_CONFIG["conversation_max_users"]
+        )
+        self.conversation_history.on_evict = self.context.fold
+        # Shared cache for identical flight/hotel searches across users
+        self.tool_cache = ToolResultCache(
+            ttl=BOT_CONFIG["tool_cache_ttl"],
+            max_size=BOT_CONFIG["tool_cache_size"]
+        )
+        # Whole answers to recent first-turn requests
+        self.answer_cache = AnswerCache(
+            ttl=BOT_CONFIG["answer_cache_ttl"],
+            max_size=BOT_CONFIG["answer_cache_size"]
+        )
+        # Tool definitions from the last run let the agent start without a network call
+        self.schema_cache = ToolSchemaCache(
+            BOT_CONFIG["tool_schema_cache"],
+            max_age=BOT_CONFIG["tool_schema_max_age"]
+        )
+        self.toolset: Optional[DeferredToolset] = None
+        # Cached, rate-limited search tools by name, for calls made without the agent
+        self.search_tools = {}
+        # Likely searches started while the agent is still asking for details
+        self.prefetcher = SearchPrefetcher(
+            ttl=BOT_CONFIG["prefetch_ttl"],
+            max_per_user=BOT_CONFIG["prefetch_max_per_user"],
+            concurrency=BOT_CONFIG["prefetch_concurrency"],
+            trip_lengths=BOT_CONFIG["prefetch_trip_lengths"],
+            cache=self.tool_cache
+        ) if BOT_CONFIG["prefetch_enabled"] else None
+        # Price watches, polled in the background and alerted by DM
+        self.watcher = PriceWatcher(
+            watch_store,
+            self.outbound,
+            interval=BOT_CONFIG["watch_interval"],
+            tick=BOT_CONFIG["watch_tick"],
+            max_per_tick=BOT_CONFIG["watch_max_per_tick"],
+            max_per_user=BOT_CONFIG["watch_max_per_user"]
+        ) if watch_store is not None and slack_client else None
+        
+    @property
+    def arcade_client(self):
+        if self._arcade_client is None:
+            if self.transport is not None:
+                self._arcade_client = create_arcade_client(self.transport.client("arcade"))
+            else:
+                self._arcade_client = create_arcade_client()
+        return self._arcade_client
         
     async def get_user_location(self, user_id):
-        """Get user's timezone from Slack profile"""
-        if not self.slack_client:
+        """Get user's timezone from the cached Slack profile"""
+        if not self.profiles:
             return None
             
-        try:
-            user_info = await self.slack_client.users_info(user=user_id)
-            user_data = user_info.get("user", {})
-            tz = user_data.get("tz", "")
-            tz_label = user_data.get("tz_label", "")
-            
-            # Returns the timezone for agent interpretation
-            if tz_label:
-                return f"{tz_label} timezone"
-            elif tz:
-                return f"{tz} timezone"
-            
-            return None
-                
-        except Exception as e:
+        # Never waits on Slack; a miss queues a background fetch
+        profile = self.profiles.peek(user_id)
+        if not profile:
             return None
+            
+        # Returns the timezone for agent interpretation
+        if profile.tz_label:
+            return f"{profile.tz_label} timezone"
+        elif profile.tz:
+            return f"{profile.tz} timezone"
+        
+        return None
     
     async def initialize(self):
         """Initialize the flight search agent"""
         try:
-            print("\n" + "="*50)
-            print("Initializing service...")
-            print(f"ARCADE_API_KEY present: {bool(os.getenv('ARCADE_API_KEY'))}")
-            print(f"OPENAI_API_KEY present: {bool(os.getenv('OPENAI_API_KEY'))}")
-            print(f"SLACK_BOT_TOKEN present: {bool(os.getenv('SLACK_BOT_TOKEN'))}")
-            print(f"SLACK_APP_TOKEN present: {bool(os.getenv('SLACK_APP_TOKEN'))}")
-            
-            tools = await get_arcade_tools(
-                self.arcade_client,
-                toolkits=["search"],
-                user_id=self.user_id
-            )
+            logger.info("Initializing service...")
+            for key in ("ARCADE_API_KEY", "OPENAI_API_KEY", "SLACK_BOT_TOKEN", "SLACK_APP_TOKEN"):
+                logger.info(f"{key} present: {bool(os.getenv(key))}")
             
-            print(f"Loaded {len(tools)} tools")
-            for tool in tools:
-                print(f"Tool available: {tool.name if hasattr(tool, 'name') else str(tool)}")
-            
-            # Load agent instructions
-            with open('instructions.md', 'r') as f:
-                instructions_template = f.read()
+            version = tool_schema_version(TOOLKITS)
+            specs = self.schema_cache.load(version)
+            if specs:
+                # Warm start: build the agent from cached schemas, fetch live tools in the background
+                self.toolset = DeferredToolset(
+                    self._fetch_tools,
+                    on_loaded=lambda fetched: self._on_tools_fetched(fetched, specs, version)
+                )
+                self.toolset.start().add_done_callback(self._on_tool_fetch_done)
+                tools = self.toolset.tools(specs)
+                logger.info(f"Using {len(specs)} cached tool definitions")
+            else:
+                tools = await self._fetch_tools()
+                self.schema_cache.save([tool_spec(tool) for tool in tools], version)
             
-            instructions = instructions_template.replace(
-                '{current_date}', 
-                datetime.now().strftime("%Y-%m-%d")
+            # Model requests wait on the limiter and feed back rate-limit headers
+            install_model_rate_limiter(
+                self.model_limiter,
+                BOT_CONFIG["model_max_retries"],
+                transport=self.transport
             )
             
-            print(f"Instructions loaded, length: {len(instructions)}")
+            # Rendered now so a missing file fails startup; re-rendered when
+            # the date changes or instructions.md is edited
+            instructions = InstructionTemplate("instructions.md")
+            instructions.render()
             
             self.agent = Agent(
                 name="FlyMe Assistant",
                 model=BOT_CONFIG["model"],
                 instructions=instructions,
-                tools=tools
+                tools=self._wrap_tools(tools),
+                handoff_description="Searches flights and hotels and presents the results once trip details are known"
             )
             
-            print("Agent initialized successfully")
-            print("="*50)
+            # Clarifying turns run on a small, fast model that hands off once details are complete
+            self.gatherer = None
+            if BOT_CONFIG["gather_model"]:
+                self.gatherer = Agent(
+                    name="FlyMe Concierge",
+                    model=BOT_CONFIG["gather_model"],
+                    instructions=InstructionTemplate("instructions.md", extra=GATHER_INSTRUCTIONS),
+                    handoffs=[self.agent]
+                )
+            
+            logger.info("Agent initialized successfully")
             return True
             
         except Exception as e:
-            print(f"[ERROR] Detected in initialize: {str(e)}")
-            print("\n" + "="*50)
-            import traceback
-            traceback.print_exc()
+            logger.exception(f"Detected in initialize: {e}")
             return False
     
-    async def search_flights(self, query, user_id, user_location=None):
+    async def _fetch_tools(self):
+        return await fetch_arcade_tools(self.arcade_client, self.user_id)
+    
+    def _on_tool_fetch_done(self, task):
+        if not task.cancelled() and task.exception():
+            logger.warning(f"Background tool fetch failed; will retry on first tool call: {task.exception()}")
+    
+    def _on_tools_fetched(self, tools, cached_specs, version):
+        """Refresh the on-disk cache, and the agent's tools if Arcade's changed"""
+        specs = [tool_spec(tool) for tool in tools]
+        if specs == cached_specs:
+            return
+        logger.info("Arcade tool definitions changed; updating agent tools")
+        self.schema_cache.save(specs, version)
+        self.toolset = None
+        if self.agent:
+            self.agent.tools = self._wrap_tools(tools)
+    
+    def _wrap_tools(self, tools):
+        """Apply rate limiting, caching, fan-out, deadlines and timing to raw tools"""
+        # Remote calls are rate limited; cache hits skip the limiter
+        tools = rate_limited_tools(tools, self.arcade_limiter)
+        if self.prefetcher:
+            # Prefetches bypass the shared cache so a wasted one can be cancelled
+            self.prefetcher.bind(tools)
+        tools = self.tool_cache.wrap_tools(tools)
+        if self.prefetcher:
+            tools = self.prefetcher.wrap_tools(tools)
+        # The fast path calls these directly, so they are timed like the agent's tool calls
+        self.search_tools = {
+            tool.name: tool for tool in timed_tools(tools, REGISTRY) if hasattr(tool, "on_invoke_tool")
+        }
+        
+        # One tool call searches a whole flexible date window in parallel
+        flexible_search = FlexibleDateSearch(
+            tools,
+            concurrency=BOT_CONFIG["fanout_concurrency"],
+            max_searches=BOT_CONFIG["fanout_max_searches"]
+        )
+        if flexible_search.available():
+            tools.append(flexible_search.as_tool())
+        
+        # Watches poll through the same cached, rate-limited searches
+        if self.watcher:
+            self.watcher.bind(tools)
+            tools.append(self.watcher.as_tool())
+        
+        # Every tool call is bounded by the request's remaining time; the deadline
+        # records raw payloads so a timed-out request can still quote prices
+        tools = bound_tools(tools, BOT_CONFIG["tool_call_timeout"])
+        
+        # The model sees the top results in a dense format, not the raw payloads
+        tools = reduced_tools(tools, BOT_CONFIG["search_result_limit"])
+        tools = timed_tools(tools, REGISTRY)
+        
+        logger.info(f"Loaded {len(tools)} tools")
+        for tool in tools:
+            logger.debug(f"Tool available: {tool.name if hasattr(tool, 'name') else str(tool)}")
+        return tools
+    
+    def route(self, text, user_id):
+        """flights or hotels for a message, from its own cues or the conversation so far"""
+        facts = self.context.facts(user_id, self.conversation_history.history(user_id))
+        return route_kind(text, facts.kind)
+    
+    async def _fast_answer(self, kind, query, progress=None):
+        """Search and format in Python when the message specifies everything, else None"""
+        plan = parse_query(query, kind)
+        tool = self.search_tools.get(plan.tool) if plan else None
+        if tool is None:
+            return None
+        if progress:
+            progress.on_tool_start(plan.tool)
+        
+        invoke = tool.on_invoke_tool(RunContextWrapper(context={"user_id": self.user_id}), json.dumps(plan.args))
+        deadline = current_deadline.get()
+        try:
+            async with REGISTRY.timed("fast_path", kind=kind):
+                if deadline is not None:
+                    payload = await deadline.run(invoke, reserve=BOT_CONFIG["reply_reserve"])
+                else:
+                    payload = await invoke
+            if deadline is not None:
+                # A later timeout (e.g. in the agent fallback) can still quote these prices
+                deadline.record_tool_result(plan.tool, plan.args, payload)
+            answer = format_results(plan, payload)
+        except asyncio.TimeoutError:
+            raise
+        except Exception as e:
+            logger.warning(f"Fast path search failed, using the agent: {e}")
+            return None
+        
+        REGISTRY.counter("flyme_fast_path_total", "Requests answered without the agent").inc(
+            kind=kind, outcome="answered" if answer else "fallback"
+        )
+        return answer
+    
+    def _select_agent(self, kind, facts=None):
+        """The full model once there is enough to search, the small model while gathering"""
+        if self.gatherer is None or facts is None:
+            return self.agent
+        ready = facts.hotel_ready if kind == "hotels" else facts.flight_ready
+        if ready or (facts.flexible and (facts.destination or facts.location)):
+            return self.agent
+        return self.gatherer
+    
+    async def _run_agent(self, full_context, progress=None, facts=None, kind="flights"):
+        """Run the agent within the request deadline, streaming to progress if given"""
+        agent = self._select_agent(kind, facts)
+        REGISTRY.counter("flyme_agent_route_total", "Requests started on each agent").inc(
+            agent=agent.name, model=str(agent.model)
+        )
+        deadline = current_deadline.get()
+        token = None
+        if deadline is None:
+            deadline = Deadline(BOT_CONFIG["response_timeout"])
+            token = current_deadline.set(deadline)
+        # Search results are ranked against this user's stated preferences
+        trip_token = current_trip.set(facts)
+        
+        try:
+            if progress is None:
+                result = await deadline.run(
+                    Runner.run(
+                        starting_agent=agent,
+                        input=full_context,
+                        context={"user_id": self.user_id},
+                        max_turns=BOT_CONFIG["max_turns"],
+                        hooks=create_run_hooks(REGISTRY)
+                    ),
+                    reserve=BOT_CONFIG["reply_reserve"]
+                )
+                return result.final_output
+            
+            result = Runner.run_streamed(
+                starting_agent=agent,
+                input=full_context,
+                context={"user_id": self.user_id},
+                max_turns=BOT_CONFIG["max_turns"],
+                hooks=create_run_hooks(REGISTRY)
+            )
+            
+            async def consume():
+                async for event in result.stream_events():
+                    if event.type == "raw_response_event":
+                        data_type = getattr(event.data, "type", "")
+                        if data_type == "response.created":
+                            deadline.text = ""
+                            progress.on_turn_start()
+                        elif data_type == "response.output_text.delta":
+                            deadline.text += event.data.delta
+                            progress.on_text(event.data.delta)
+                    elif event.type == "run_item_stream_event" and event.name == "tool_called":
+                        progress.on_tool_start(getattr(event.item.raw_item, "name", ""))
+            
+            try:
+                await deadline.run(consume(), reserve=BOT_CONFIG["reply_reserve"])
+            except asyncio.TimeoutError:
+                result.cancel()
+                raise
+            return result.final_output
+        finally:
+            current_trip.reset(trip_token)
+            if token is not None:
+                current_deadline.reset(token)
+    
+    def _partial_response(self):
+        """Answer with whatever finished before the deadline"""
+        deadline = current_deadline.get()
+        if deadline is None:
+            return ERROR_MESSAGES["timeout"]
+        return deadline.partial_response(
+            ERROR_MESSAGES["timeout"],
+            ERROR_MESSAGES["timeout_partial"]
+        )
+    
+    def _place_context(self, user_id, query, kind="flights"):
+        """Resolved airport codes (and likely home airports) for the prompt"""
+        profile = self.profiles.peek(user_id) if self.profiles else None
+        tz = profile.tz if profile else ""
+        line = resolve_trip_places(query, self.context.facts(user_id), tz, kind)
+        return f"{line} " if line else ""
+    
+    def _remember_request(self, user_id, query):
+        """Store the user's turn; return the prompt context and whether this is the first turn"""
+        turn = self.conversation_history.append(user_id, "user", query)
+        previous = self.conversation_history.history(user_id)[:-1]  # Exclude current message
+        self.context.record(user_id, turn, previous)
+        return self.context.build(user_id, previous), not previous
+    
+    def _prefetch(self, user_id, kind):
+        """Start the searches the trip facts so far make likely"""
+        if self.prefetcher and self.search_tools:
+            self.prefetcher.update(user_id, kind, self.context.facts(user_id))
+    
+    def _shareable_answer(self):
+        """False when the answer depends on who asked (it used the price watch tool)"""
+        deadline = current_deadline.get()
+        # Without the request's deadline there is no record of the tools used
+        return deadline is not None and not deadline.used_tool(WATCH_TOOL)
+    
+    def _remember_reply(self, user_id, text):
+        turn = self.conversation_history.append(user_id, "assistant", text)
+        self.context.record(user_id, turn)
+    
+    async def search_flights(self, query, user_id, user_location=None, progress=None):
         """Search for flights based on user query with conversation memory"""
         try:
-            print(f"[Agent] Starting search_flights for user {user_id}")
-            print(f"[Agent] Query: {query}")
-            print(f"[Agent] User location: {user_location}")
+            logger.info(f"Starting search_flights for user {user_id}")
+            logger.info(f"Query: {query}")
+            logger.debug(f"User location: {user_location}")
             
             # Check if agent is initialized
             if not self.agent:
-                print("[ERROR] Agent not initialized!")
+                logger.error("Agent not initialized!")
                 return "Sorry, the bot is not properly initialized. Please try again later."
             
-            # Update conversation history
-            self.conversation_history[user_id].append({
-                "role": "user",
-                "content": query,
-                "timestamp": datetime.now()
-            })
-            
-            # Build conversation context for the agent
-            conversation_summary = ""
-            if len(self.conversation_history[user_id]) > 1:
-                recent_messages = self.conversation_history[user_id][-5:]  # Last 5 messages
-                conversation_summary = "Previous conversation:\n"
-                for msg in recent_messages[:-1]:  # Exclude current message
-                    role = msg['role'].capitalize()
-                    conversation_summary += f"{role}: {msg['content']}\n"
+            # Update conversation history and build the budgeted context
+            conversation_summary, first_turn = self._remember_request(user_id, query)
+            
+            # A first message identical in substance to a recent one gets the same answer
+            answer_key = AnswerCache.key("flights", query, user_location) if first_turn else None
+            cached = self.answer_cache.get(answer_key) if answer_key else None
+            if cached is not None:
+                logger.info("Answer cache hit")
+                self._remember_reply(user_id, cached)
+                return cached
             
             # Add user location if available
             location_context = ""
             if user_location:
                 location_context = f"User's timezone: {user_location}. Use this to infer their likely departure location if they don't specify one. "
             
+            # Airport codes for the places mentioned, resolved locally instead of by the model
+            location_context += self._place_context(user_id, query)
+            
+            # Searches the facts make likely run while the agent decides what to ask
+            self._prefetch(user_id, "flights")
+            
             # Combine all context
             full_context = f"""{location_context}{conversation_summary}
 
@@ -129,40 +453,46 @@ IMPORTANT REMINDERS:
 2. Extract all relevant information from the conversation history to understand what the user needs.
 3. If you have enough information to search for flights, use the Search tools immediately.
 4. If you need more information, ask for it conversationally.
-5. If the user says they're flexible with dates, DO NOT ask for specific dates. Instead, search across multiple dates in their timeframe.
-6. If you see timezone information, use it to intelligently guess the user's location but ask for confirmation if needed."""
+5. If the user says they're flexible with dates, DO NOT ask for specific dates. Instead, call FlyMe_FlexibleDateSearch once with their date window.
+6. If you see timezone information, use it to intelligently guess the user's location but ask for confirmation if needed.
+7. If resolved places are given, use those airport codes; do not ask the user for codes you were given."""
             
-            print(f"[AGENT] Sending to agent:\n{full_context}")
+            # Full prompt dumps are expensive and large; only build them at DEBUG
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(f"Sending to agent:\n{full_context}")
             
             try:
-                result = await Runner.run(
-                    starting_agent=self.agent,
-                    input=full_context,
-                    context={"user_id": self.user_id},
-                    max_turns=BOT_CONFIG["max_turns"]
-                )
+                # Fully specified searches skip the model entirely
+                final_output = await self._fast_answer("flights", query, progress)
+                if final_output is None:
+                    final_output = await self._run_agent(
+                        full_context,
+                        progress,
+                        facts=self.context.facts(user_id)
+                    )
                 
-                print(f"[AGENT] Response: {result.final_output[:200]}...")
+                logger.info(f"Response: {final_output[:200]}...")
+                logger.debug(f"Tool cache: {self.tool_cache.stats()}")
                 
                 # Store the response
-                self.conversation_history[user_id].append({
-                    "role": "assistant",
-                    "content": result.final_output,
-                    "timestamp": datetime.now()
-                })
+                self._remember_reply(user_id, final_output)
+                if answer_key and self._shareable_answer():
+                    self.answer_cache.set(answer_key, final_output)
                 
-                return result.final_output
+                return final_output
+            
+            except asyncio.TimeoutError:
+                logger.warning("Deadline reached, returning partial results")
+                partial = self._partial_response()
+                self._remember_reply(user_id, partial)
+                return partial
             
             except Exception as agent_error:
-                print(f"[ERROR] Detected in Runner.run: {str(agent_error)}")
-                import traceback
-                traceback.print_exc()
+                logger.error(f"Detected in Runner.run: {agent_error}")
                 raise
             
         except Exception as e:
-            print(f"[ERROR] Detected in search_flights: {str(e)}")
-            import traceback
-            traceback.print_exc()
+            logger.exception(f"Detected in search_flights: {e}")
             
             error_str = str(e)
             if "rate_limit_exceeded" in error_str or "429" in error_str:
@@ -170,39 +500,39 @@ IMPORTANT REMINDERS:
             else:
                 return ERROR_MESSAGES["generic"]
 
-    async def search_hotels(self, query, user_id, user_location=None):
+    async def search_hotels(self, query, user_id, user_location=None, progress=None):
         """Search for hotels based on user query"""
         try:
-            print(f"[Agent] Starting search_hotels for user {user_id}")
-            print(f"[Agent] Query: {query}")
-            print(f"[Agent] User location: {user_location}")
+            logger.info(f"Starting search_hotels for user {user_id}")
+            logger.info(f"Query: {query}")
+            logger.debug(f"User location: {user_location}")
             
             # Check if agent is initialized
             if not self.agent:
-                print("[ERROR] Agent not initialized!")
+                logger.error("Agent not initialized!")
                 return "Sorry, the bot is not properly initialized. Please try again later."
             
-            # Update conversation history
-            self.conversation_history[user_id].append({
-                "role": "user",
-                "content": query,
-                "timestamp": datetime.now()
-            })
-            
-            # Build conversation context for the agent
-            conversation_summary = ""
-            if len(self.conversation_history[user_id]) > 1:
-                recent_messages = self.conversation_history[user_id][-5:]  # Last 5 messages
-                conversation_summary = "Previous conversation:\n"
-                for msg in recent_messages[:-1]:  # Exclude current message
-                    role = msg['role'].capitalize()
-                    conversation_summary += f"{role}: {msg['content']}\n"
+            # Update conversation history and build the budgeted context
+            conversation_summary, first_turn = self._remember_request(user_id, query)
+            
+            # A first message identical in substance to a recent one gets the same answer
+            answer_key = AnswerCache.key("hotels", query, user_location) if first_turn else None
+            cached = self.answer_cache.get(answer_key) if answer_key else None
+            if cached is not None:
+                logger.info("Answer cache hit")
+                self._remember_reply(user_id, cached)
+                return cached
             
             # Add user location if available
             location_context = ""
             if user_location:
                 location_context = f"User's timezone: {user_location}. Use this to infer their likely search location if they don't specify one. "
             
+            location_context += self._place_context(user_id, query, kind="hotels")
+            
+            # Searches the facts make likely run while the agent decides what to ask
+            self._prefetch(user_id, "hotels")
+            
             # Combine all context for hotel search
             full_context = f"""{location_context}{conversation_summary}
 
@@ -215,40 +545,46 @@ IMPORTANT REMINDERS FOR HOTEL SEARCH:
 4. If you need more information, ask for it conversationally.
 5. Essential information needed: destination/city, check-in date, check-out date, number of guests
 6. Helpful additional info: budget range, hotel preferences (luxury, budget, business, etc.)
-7. If the user says they're flexible with dates, search across multiple date ranges in their timeframe.
+7. If the user says they're flexible with dates, call FlyMe_FlexibleDateSearch once with their date window.
 8. CRITICAL: Use Slack link format <URL|Hotel Name> NOT markdown [Hotel Name](URL) - markdown breaks in Slack!"""
             
-            print(f"[AGENT] Sending hotel search to agent:\n{full_context}")
+            # Full prompt dumps are expensive and large; only build them at DEBUG
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(f"Sending hotel search to agent:\n{full_context}")
             
             try:
-                result = await Runner.run(
-                    starting_agent=self.agent,
-                    input=full_context,
-                    context={"user_id": self.user_id},
-                    max_turns=BOT_CONFIG["max_turns"]
-                )
+                # Fully specified searches skip the model entirely
+                final_output = await self._fast_answer("hotels", query, progress)
+                if final_output is None:
+                    final_output = await self._run_agent(
+                        full_context,
+                        progress,
+                        facts=self.context.facts(user_id),
+                        kind="hotels"
+                    )
                 
-                print(f"[AGENT] Hotel Response: {result.final_output[:200]}...")
+                logger.info(f"Hotel Response: {final_output[:200]}...")
+                logger.debug(f"Tool cache: {self.tool_cache.stats()}")
                 
                 # Store the response
-                self.conversation_history[user_id].append({
-                    "role": "assistant",
-                    "content": result.final_output,
-                    "timestamp": datetime.now()
-                })
+                self._remember_reply(user_id, final_output)
+                if answer_key and self._shareable_answer():
+                    self.answer_cache.set(answer_key, final_output)
                 
-                return result.final_output
+                return final_output
+            
+            except asyncio.TimeoutError:
+                logger.warning("Deadline reached, returning partial hotel results")
+                partial = self._partial_response()
+                self._remember_reply(user_id, partial)
+                return partial
             
             except Exception as agent_error:
-                print(f"[ERROR] Detected in hotel Runner.run: {str(agent_error)}")
-                import traceback
-                traceback.print_exc()
+                logger.error(f"Detected in hotel Runner.run: {agent_error}")
                 raise
             
         except Exception as e:
-            print(f"[ERROR] Detected in search_hotels: {str(e)}")
-            import traceback
-            traceback.print_exc()
+            logger.exception(f"Detected in search_hotels: {e}")
             
             error_str = str(e)
             if "rate_limit_exceeded" in error_str or "429" in error_str:
@@ -0,0 +1,269 @@
+"""
+Result caching for Arcade tool calls and whole answers
+"""
+import asyncio
+import dataclasses
+import json
+import time
+from collections import OrderedDict
+from datetime import date
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+
+from trip import TripFacts, request_modifiers
+
+
+class TTLCache:
+    """Size-bounded LRU cache whose entries expire after a fixed TTL"""
+
+    def __init__(self, ttl: float, max_size: int):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return a live entry and mark it as recently used"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return default
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return default
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        """Store an entry, evicting the least recently used ones if full"""
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def items(self) -> List[Tuple[Hashable, Any, float]]:
+        """(key, value, seconds left) for every live entry, least recently used first"""
+        now = time.monotonic()
+        return [
+            (key, value, expires_at - now)
+            for key, (expires_at, value) in self._entries.items() if expires_at > now
+        ]
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        """Remove an entry and return its value"""
+        entry = self._entries.pop(key, None)
+        return default if entry is None else entry[1]
+
+    def clear(self):
+        self._entries.clear()
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.get(key, _MISSING) is not _MISSING
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+_MISSING = object()
+
+
+def normalize_arguments(arguments: Any) -> str:
+    """Build a stable cache key fragment from tool arguments
+
+    Strings are trimmed and case-folded (airport codes, city names and dates
+    are all case-insensitive for the search tools), empty values are dropped
+    and keys are sorted so argument order never causes a miss.
+    """
+    if isinstance(arguments, str):
+        try:
+            arguments = json.loads(arguments) if arguments.strip() else {}
+        except json.JSONDecodeError:
+            return arguments.strip().lower()
+
+    def _normalize(value):
+        if isinstance(value, str):
+            return value.strip().lower()
+        if isinstance(value, dict):
+            return {
+                k: _normalize(v) for k, v in value.items()
+                if v is not None and v != ""
+            }
+        if isinstance(value, (list, tuple)):
+            return [_normalize(v) for v in value]
+        return value
+
+    return json.dumps(_normalize(arguments), sort_keys=True, separators=(",", ":"))
+
+
+class _InFlight:
+    """A search shared by every caller asking for the same key"""
+
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class ToolResultCache:
+    """TTL/LRU cache for tool results that coalesces identical in-flight calls"""
+
+    def __init__(self, ttl: float = 300, max_size: int = 256):
+        self._results = TTLCache(ttl=ttl, max_size=max_size)
+        self._in_flight: Dict[Tuple[str, str], _InFlight] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    async def fetch(
+        self,
+        tool_name: str,
+        arguments: Any,
+        fetcher: Callable[[], Awaitable[Any]],
+    ) -> Any:
+        """Return a cached result or run fetcher, sharing it with concurrent callers"""
+        key = (tool_name, normalize_arguments(arguments))
+
+        cached = self._results.get(key, _MISSING)
+        if cached is not _MISSING:
+            self.hits += 1
+            return cached
+
+        flight = self._in_flight.get(key)
+        if flight is None:
+            self.misses += 1
+            # The search runs in a task the cache owns, not in the first caller
+            task = asyncio.get_running_loop().create_task(self._run(key, fetcher))
+            flight = self._in_flight[key] = _InFlight(task)
+        else:
+            self.coalesced += 1
+
+        flight.waiters += 1
+        try:
+            # Shielded: a caller that is cancelled (deadline, disconnect) stops
+            # waiting without cancelling the search for everyone else
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if not flight.waiters and not flight.task.done():
+                # Nobody is left to use the result; a later caller starts afresh
+                flight.task.cancel()
+                if self._in_flight.get(key) is flight:
+                    del self._in_flight[key]
+
+    async def _run(self, key: Tuple[str, str], fetcher: Callable[[], Awaitable[Any]]) -> Any:
+        try:
+            result = await fetcher()
+        finally:
+            flight = self._in_flight.get(key)
+            if flight is not None and flight.task is asyncio.current_task():
+                del self._in_flight[key]
+        # Errors are never cached; waiting callers see the same failure
+        self._results.set(key, result)
+        return result
+
+    def has(self, tool_name: str, arguments: Any) -> bool:
+        """Whether a call would be answered without a new request (cached or in flight)"""
+        key = (tool_name, normalize_arguments(arguments))
+        return key in self._in_flight or self._results.get(key, _MISSING) is not _MISSING
+
+    def store(self, tool_name: str, arguments: Any, result: Any):
+        """Cache a result fetched outside fetch() (e.g. by a prefetch)"""
+        self._results.set((tool_name, normalize_arguments(arguments)), result)
+
+    def entries(self) -> List[list]:
+        """[tool name, arguments key, result, seconds left] per live result, for a snapshot"""
+        return [[tool, arguments, result, ttl] for (tool, arguments), result, ttl in self._results.items()]
+
+    def restore(self, entries: List[list], age: float = 0):
+        """Reload entries() saved age seconds ago, keeping only the TTL they had left"""
+        for tool, arguments, result, ttl in entries:
+            if ttl > age:
+                self._results.set((tool, arguments), result, ttl - age)
+
+    def wrap_tools(self, tools):
+        """Return copies of agent FunctionTools whose invocations go through the cache"""
+        return [self.wrap_tool(tool) for tool in tools]
+
+    def wrap_tool(self, tool):
+        """Return a copy of a FunctionTool whose invocations go through the cache"""
+        invoke = getattr(tool, "on_invoke_tool", None)
+        if invoke is None:
+            return tool
+
+        async def cached_invoke(ctx, arguments):
+            return await self.fetch(tool.name, arguments, lambda: invoke(ctx, arguments))
+
+        return dataclasses.replace(tool, on_invoke_tool=cached_invoke)
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss/coalesce counters for logging and metrics"""
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "size": len(self._results),
+            "hit_rate": (self.hits + self.coalesced) / lookups if lookups else 0.0,
+        }
+
+    def clear(self):
+        self._results.clear()
+
+
+class AnswerCache:
+    """Final answers to first-turn requests, keyed on what was asked
+
+    The key is the request's extracted trip facts (with dates resolved),
+    its remaining modifier words, the user's location hint and today's
+    date, so differently worded versions of the same question share an
+    entry. Only requests with no conversation history may use it, since a
+    follow-up's answer depends on what came before.
+    """
+
+    def __init__(self, ttl: float = 120, max_size: int = 500):
+        self._answers = TTLCache(ttl=ttl, max_size=max_size)
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(kind: str, query: str, location: Optional[str] = None, today: Optional[date] = None) -> str:
+        today = today or date.today()
+        facts = TripFacts().update(query, today)
+        return json.dumps(
+            [kind, facts.as_dict(), request_modifiers(query, facts), (location or "").lower(), today.isoformat()],
+            sort_keys=True,
+            separators=(",", ":")
+        )
+
+    def get(self, key: str) -> Optional[str]:
+        answer = self._answers.get(key)
+        if answer is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return answer
+
+    def set(self, key: str, answer: str):
+        self._answers.set(key, answer)
+
+    def entries(self) -> List[list]:
+        """[key, answer, seconds left] per live answer, for a snapshot"""
+        return [[key, answer, ttl] for key, answer, ttl in self._answers.items()]
+
+    def restore(self, entries: List[list], age: float = 0):
+        """Reload entries() saved age seconds ago, keeping only the TTL they had left"""
+        for key, answer, ttl in entries:
+            if ttl > age:
+                self._answers.set(key, answer, ttl - age)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": len(self._answers),
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+    def clear(self):
+        self._answers.clear()
@@ -1,5 +1,9 @@
 import os
+import atexit
 import logging
+import logging.handlers
+import queue
+import random
 from dataclasses import dataclass
 from typing import List, Optional
 
@@ -11,6 +15,16 @@ class Config:
     slack_bot_token: str
     slack_app_token: str
     log_level: str = "INFO"
+    conversation_db: str = ""
+    metrics_port: int = 0
+    log_max_chars: int = 2000
+    log_sample_rate: float = 1.0
+    workers: int = 1
+    worker_index: Optional[int] = None
+    shard_port: int = 47200
+    watch_db: str = "flyme_watches.db"
+    state_snapshot: str = "flyme_state.json"
+    replace_pid: Optional[int] = None
     
     @classmethod
     def from_env(cls) -> Optional['Config']:
@@ -20,7 +34,17 @@ class Config:
             openai_api_key=os.getenv("OPENAI_API_KEY", ""),
             slack_bot_token=os.getenv("SLACK_BOT_TOKEN", ""),
             slack_app_token=os.getenv("SLACK_APP_TOKEN", ""),
-            log_level=os.getenv("LOG_LEVEL", "INFO")
+            log_level=os.getenv("LOG_LEVEL", "INFO"),
+            conversation_db=os.getenv("CONVERSATION_DB", ""),
+            metrics_port=int(os.getenv("METRICS_PORT", "0") or 0),
+            log_max_chars=int(os.getenv("LOG_MAX_CHARS", "2000") or 0),
+            log_sample_rate=float(os.getenv("LOG_SAMPLE_RATE", "1.0") or 1.0),
+            workers=int(os.getenv("FLYME_WORKERS", "1") or 1),
+            worker_index=int(os.environ["FLYME_WORKER_INDEX"]) if os.getenv("FLYME_WORKER_INDEX") else None,
+            shard_port=int(os.getenv("SHARD_PORT", "47200") or 47200),
+            watch_db=os.getenv("WATCH_DB", "flyme_watches.db"),
+            state_snapshot=os.getenv("STATE_SNAPSHOT", "flyme_state.json"),
+            replace_pid=int(os.environ["FLYME_REPLACE_PID"]) if os.getenv("FLYME_REPLACE_PID") else None
         )
     
     def validate(self) -> List[str]:
@@ -35,15 +59,64 @@ class Config:
         if not self.slack_app_token:
             missing.append("SLACK_APP_TOKEN")
         return missing
+    
+    @property
+    def is_supervisor(self) -> bool:
+        """True when this process should start workers rather than serve Slack"""
+        return self.workers > 1 and self.worker_index is None
+
+
+class PayloadFilter(logging.Filter):
+    """Truncate oversized log messages and sample high-volume ones
+
+    Records logged with extra={"sampled": True} (per-stage metric lines,
+    payload dumps) are kept with probability sample_rate; everything else
+    is always kept.
+    """
+    
+    def __init__(self, max_chars: int = 2000, sample_rate: float = 1.0):
+        super().__init__()
+        self.max_chars = max_chars
+        self.sample_rate = sample_rate
+        
+    def filter(self, record: logging.LogRecord) -> bool:
+        if getattr(record, "sampled", False) and random.random() >= self.sample_rate:
+            return False
+        if self.max_chars:
+            message = record.getMessage()
+            if len(message) > self.max_chars:
+                record.msg = f"{message[:self.max_chars]}... [{len(message) - self.max_chars} chars truncated]"
+                record.args = None
+        return True
+
 
+# Background thread that writes queued log records
+_log_listener: Optional[logging.handlers.QueueListener] = None
 
-def setup_logging(level: str = "INFO"):
-    """Configure application logging"""
+
+def setup_logging(level: str = "INFO", max_chars: int = 2000, sample_rate: float = 1.0):
+    """Configure application logging
+    
+    Handlers on the event loop only enqueue records; formatting and console
+    I/O happen on a listener thread so logging never blocks a request.
+    """
+    global _log_listener
     log_format = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-    logging.basicConfig(
-        level=getattr(logging, level.upper()),
-        format=log_format
-    )
+    
+    root = logging.getLogger()
+    root.setLevel(getattr(logging, level.upper()))
+    if _log_listener is None:
+        console = logging.StreamHandler()
+        console.setFormatter(logging.Formatter(log_format))
+        
+        log_queue = queue.SimpleQueue()
+        queue_handler = logging.handlers.QueueHandler(log_queue)
+        queue_handler.addFilter(PayloadFilter(max_chars, sample_rate))
+        root.handlers = [queue_handler]
+        
+        _log_listener = logging.handlers.QueueListener(log_queue, console, respect_handler_level=True)
+        _log_listener.start()
+        atexit.register(stop_logging)
     
     # Logger levels for noise reduction
     logging.getLogger("slack_bolt").setLevel(logging.WARNING) # Silences slackbolt messages with level warning
@@ -53,3 +126,11 @@ def setup_logging(level: str = "INFO"):
     logging.getLogger("websocket").setLevel(logging.WARNING) # Silences websocket messages with level warning
     
     return logging.getLogger("flyme")
+
+
+def stop_logging():
+    """Flush queued log records and stop the listener thread"""
+    global _log_listener
+    if _log_listener is not None:
+        _log_listener.stop()
+        _log_listener = None
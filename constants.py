@@ -2,12 +2,74 @@
 Application-wide constants
 """
 
+# USD per million input/output tokens, for the per-model cost counters
+MODEL_PRICING = {
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4o-mini": (0.15, 0.60),
+}
+
 # Bot configuration
 BOT_CONFIG = {
     "model": "gpt-4o",
+    "gather_model": "gpt-4o-mini",  # Clarifying turns before a search ("" uses model throughout)
     "max_turns": 10,
-    "max_conversation_history": 5,
-    "response_timeout": 30,
+    "max_conversation_history": 5,  # Turns kept per user
+    "conversation_idle_ttl": 24 * 3600,  # Seconds before an idle conversation is forgotten
+    "conversation_max_users": 1000,  # Conversations kept in memory (LRU evicted)
+    "context_token_budget": 1200,  # Max prompt tokens for facts, summary and recent turns
+    "context_turn_tokens": 200,  # Max tokens kept from any single previous turn
+    "response_timeout": 30,  # Seconds from pickup to reply for one request
+    "profile_lookup_budget": 0.05,  # Share of the deadline for the profile lookup
+    "tool_call_timeout": 15,  # Max seconds for a single tool call
+    "reply_reserve": 1.0,  # Seconds kept back to post the (partial) reply
+    "tool_cache_ttl": 300,  # Seconds a search result stays fresh
+    "tool_cache_size": 256,  # Max cached tool results (LRU evicted)
+    "answer_cache_ttl": 120,  # Seconds a first-turn answer can be reused
+    "answer_cache_size": 500,  # Max cached answers (LRU evicted)
+    "tool_schema_cache": "flyme_tools.json",  # Arcade tool definitions for warm starts ("" disables)
+    "tool_schema_max_age": 7 * 24 * 3600,  # Seconds before cached tool definitions are refetched at startup
+    "profile_cache_ttl": 6 * 3600,  # Seconds before a cached timezone is refreshed
+    "profile_cache_size": 20000,  # Max cached Slack profiles (LRU evicted)
+    "profile_refresh_interval": 3600,  # Seconds between users_list sweeps
+    "max_concurrent_requests": 8,  # Agent runs in flight across all users
+    "max_queued_requests": 100,  # Waiting requests before new ones are shed
+    "event_dedup_ttl": 600,  # Seconds to remember event_ids for retry dedup
+    "stream_responses": True,  # Edit one message in place as the agent works
+    "stream_update_interval": 1.2,  # Min seconds between chat.update edits
+    "slack_post_rate": 1.0,  # chat.postMessage calls per second per channel
+    "slack_update_rate": 2.0,  # chat.update calls per second workspace-wide; halved while Slack rate limits
+    "slack_max_retries": 5,  # Retries of a reply Slack rejected as ratelimited
+    "slack_max_message_chars": 3500,  # Longer replies are split between options
+    "block_kit_results": True,  # Render flight/hotel options as Block Kit sections
+    "model_rate_limit": 8,  # OpenAI requests per second before headers adjust it
+    "model_max_retries": 4,  # OpenAI client retries on 429/5xx (jittered backoff)
+    "http_max_connections": 100,  # Pooled connections per upstream (Slack, Arcade, OpenAI)
+    "http_max_keepalive": 20,  # Idle connections kept open per upstream
+    "http_keepalive_expiry": 90,  # Seconds an idle pooled connection is kept
+    "http2": True,  # Use HTTP/2 for Arcade/OpenAI when the h2 package is installed
+    "http_warm_interval": 30,  # Seconds of idleness before an upstream gets a warm-up ping
+    "arcade_rate_limit": 5,  # Arcade tool calls per second
+    "search_result_limit": 5,  # Ranked flight/hotel options passed to the model per search
+    "fanout_concurrency": 4,  # Parallel searches per flexible-date request
+    "fanout_max_searches": 21,  # Max date combinations per flexible-date request
+    "prefetch_enabled": True,  # Start likely searches while the agent is still clarifying
+    "prefetch_ttl": 120,  # Seconds a user's prefetched results stay usable
+    "prefetch_max_per_user": 3,  # Speculative searches in flight per user
+    "prefetch_concurrency": 4,  # Speculative searches in flight across all users
+    "prefetch_trip_lengths": [7, 3],  # Guessed nights when the return/check-out date is missing
+    "watch_interval": 3 * 3600,  # Seconds between price checks of a watched route
+    "watch_tick": 60,  # Seconds between scans for routes that are due
+    "watch_max_per_tick": 5,  # Max watched routes searched per scan
+    "watch_max_per_user": 10,  # Price watches one user may hold
+    "drain_timeout": 40,  # Seconds in-flight requests get to finish on shutdown
+    "snapshot_max_age": 600,  # Seconds a saved state snapshot stays worth restoring
+}
+
+# Arcade search tools (the agent sees these with "." replaced by "_")
+SEARCH_TOOLS = {
+    "one_way": "Search.SearchOneWayFlights",
+    "roundtrip": "Search.SearchRoundtripFlights",
+    "hotels": "Search.GoogleHotels",
 }
 
 # Error messages
@@ -17,4 +79,7 @@ ERROR_MESSAGES = {
     "no_hotel_results": "I couldn't find any hotels matching your criteria. Try adjusting your dates, location, or budget range.",
     "generic": "I encountered an error while searching for flights. Please try again.",
     "hotel_generic": "I encountered an error while searching for hotels. Please try again.",
+    "timeout": "That search took longer than expected and I couldn't finish it. Please try again, or narrow down your dates.",
+    "timeout_partial": "I ran out of time before finishing, so these results may be incomplete.",
+    "busy": "I'm handling a lot of requests right now. Please try again in a few minutes.",
 }
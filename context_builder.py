@@ -0,0 +1,172 @@
+"""
+Token-budgeted prompt context with running summaries and trip facts
+"""
+import logging
+from collections import deque
+from typing import Deque, Dict, Iterable, List
+
+from cache import TTLCache
+from trip import TripFacts
+
+logger = logging.getLogger("flyme.context")
+
+try:
+    import tiktoken
+except ImportError:  # Optional; fall back to a character heuristic
+    tiktoken = None
+
+_encoding = None
+
+
+def count_tokens(text: str) -> int:
+    """Token count with tiktoken when installed, ~4 characters per token otherwise"""
+    global _encoding
+    if tiktoken is not None:
+        if _encoding is None:
+            _encoding = tiktoken.get_encoding("o200k_base")
+        return len(_encoding.encode(text, disallowed_special=()))
+    return max(1, (len(text) + 3) // 4)
+
+
+def compact_turn(role: str, content: str, max_tokens: int) -> str:
+    """One prompt line for a turn, clipped to max_tokens
+
+    Long assistant replies are mostly flight/hotel listings the trip facts
+    already capture, so only their opening is kept.
+    """
+    text = " ".join(content.split())
+    max_chars = max_tokens * 4
+    if len(text) > max_chars:
+        text = text[:max_chars].rsplit(" ", 1)[0] + " …"
+    return f"{role.capitalize()}: {text}"
+
+
+class ConversationContext:
+    """Per-user facts and running summary, updated one turn at a time"""
+
+    __slots__ = ("facts", "summary")
+
+    def __init__(self, summary_items: int):
+        self.facts = TripFacts()
+        self.summary: Deque[str] = deque(maxlen=summary_items)
+
+
+class ContextBuilder:
+    """Assembles the conversation part of the prompt within a fixed token budget
+
+    Each turn is compacted and token-counted once, when it is recorded; the
+    recorded line and count are cached on the Turn. Turns that age out of the
+    conversation store are folded into a short running summary, and every
+    user message updates the extracted trip facts. Building a prompt then
+    only concatenates cached pieces newest-first until the budget is spent.
+    """
+
+    def __init__(
+        self,
+        token_budget: int = 1200,
+        turn_tokens: int = 200,
+        summary_items: int = 6,
+        idle_ttl: float = 24 * 3600,
+        max_users: int = 1000,
+    ):
+        self.token_budget = token_budget
+        self.turn_tokens = turn_tokens
+        self.summary_items = summary_items
+        self._contexts = TTLCache(ttl=idle_ttl, max_size=max_users)
+
+    def _context(self, user_id: str, history: Iterable = ()) -> ConversationContext:
+        context = self._contexts.get(user_id)
+        if context is None:
+            # New or evicted user: rebuild facts from whatever history survives
+            context = ConversationContext(self.summary_items)
+            for turn in history:
+                if turn.role == "user":
+                    context.facts.update(turn.content)
+        self._contexts.set(user_id, context)
+        return context
+
+    def facts(self, user_id: str, history: Iterable = ()) -> TripFacts:
+        return self._context(user_id, history).facts
+
+    def record(self, user_id: str, turn, history: Iterable = ()):
+        """Account for a newly stored turn"""
+        context = self._context(user_id, history)
+        if turn.role == "user":
+            context.facts.update(turn.content)
+        self._prepare(turn)
+
+    def fold(self, user_id: str, turn):
+        """Summarize a turn that fell out of the conversation store's window"""
+        context = self._contexts.get(user_id)
+        if context is None:
+            return
+        first_line = turn.content.strip().splitlines()[0] if turn.content.strip() else ""
+        prefix = "User asked" if turn.role == "user" else "FlyMe replied"
+        context.summary.append(f"{prefix}: {compact_turn('', first_line, 30)[2:]}")
+
+    def forget(self, user_id: str):
+        self._contexts.pop(user_id)
+
+    def snapshot(self) -> Dict[str, dict]:
+        """Facts and running summary by user, for a state snapshot"""
+        return {
+            uid: {"facts": context.facts.as_dict(), "summary": list(context.summary)}
+            for uid, context, _ in self._contexts.items()
+        }
+
+    def restore(self, user_id: str, saved: dict, newer: Iterable = ()):
+        """Reinstate a snapshot() entry, then fold in turns recorded since"""
+        context = ConversationContext(self.summary_items)
+        context.facts = TripFacts.from_dict(saved.get("facts", {}))
+        context.summary.extend(saved.get("summary", ()))
+        for turn in newer:
+            if turn.role == "user":
+                context.facts.update(turn.content)
+        self._contexts.set(user_id, context)
+
+    def _prepare(self, turn):
+        if getattr(turn, "line", None) is None:
+            turn.line = compact_turn(turn.role, turn.content, self.turn_tokens)
+            turn.tokens = count_tokens(turn.line)
+
+    def build(self, user_id: str, history: List) -> str:
+        """Facts, summary and as many recent turns as fit the token budget
+
+        history is the retained turns, oldest first, excluding the current
+        request.
+        """
+        context = self._context(user_id, history)
+        sections = []
+        used = 0
+
+        facts = context.facts.render()
+        if facts:
+            line = f"Known trip details: {facts}"
+            sections.append(line)
+            used += count_tokens(line)
+
+        summary = ""
+        if context.summary:
+            summary = "Earlier in this conversation: " + " ".join(context.summary)
+            summary_tokens = count_tokens(summary)
+            if used + summary_tokens <= self.token_budget:
+                used += summary_tokens
+            else:
+                summary = ""
+
+        recent = []
+        for turn in reversed(history):
+            self._prepare(turn)
+            if used + turn.tokens > self.token_budget:
+                break
+            recent.append(turn.line)
+            used += turn.tokens
+
+        if summary:
+            sections.append(summary)
+        if recent:
+            sections.append("Previous conversation:\n" + "\n".join(reversed(recent)))
+        if not sections:
+            return ""
+        logger.debug(f"Context for {user_id}: ~{used} tokens")
+        return "\n".join(sections) + "\n"
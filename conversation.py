@@ -0,0 +1,220 @@
+"""
+Bounded conversation memory with optional SQLite persistence
+"""
+import logging
+import sqlite3
+import time
+from collections import OrderedDict, deque
+from typing import Callable, Deque, Dict, Iterable, List, Optional
+
+logger = logging.getLogger("flyme.conversation")
+
+
+class Turn:
+    """A single user or assistant message
+
+    line and tokens cache the turn's compacted prompt form so it is only
+    computed once (see context_builder).
+    """
+
+    __slots__ = ("role", "content", "ts", "line", "tokens")
+
+    def __init__(self, role: str, content: str, ts: Optional[float] = None):
+        self.role = role
+        self.content = content
+        self.ts = time.time() if ts is None else ts
+        self.line: Optional[str] = None
+        self.tokens = 0
+
+    def __repr__(self):
+        return f"Turn({self.role!r}, {self.content[:40]!r})"
+
+
+class MemoryBackend:
+    """Backend that keeps nothing outside the store's in-memory LRU"""
+
+    persistent = False
+
+    def load(self, user_id: str, limit: int) -> List[Turn]:
+        return []
+
+    def append(self, user_id: str, turn: Turn, keep: int):
+        pass
+
+    def delete(self, user_id: str):
+        pass
+
+    def prune(self, idle_before: float) -> int:
+        return 0
+
+    def close(self):
+        pass
+
+
+class SQLiteBackend:
+    """Local SQLite (WAL mode) backend so history survives restarts"""
+
+    persistent = True
+
+    def __init__(self, path: str):
+        self.path = path
+        self.db = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS turns ("
+            " seq INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " user_id TEXT NOT NULL,"
+            " role TEXT NOT NULL,"
+            " content TEXT NOT NULL,"
+            " ts REAL NOT NULL)"
+        )
+        self.db.execute("CREATE INDEX IF NOT EXISTS turns_user ON turns (user_id, seq)")
+
+    def load(self, user_id: str, limit: int) -> List[Turn]:
+        rows = self.db.execute(
+            "SELECT role, content, ts FROM turns WHERE user_id = ? ORDER BY seq DESC LIMIT ?",
+            (user_id, limit)
+        ).fetchall()
+        return [Turn(role, content, ts) for role, content, ts in reversed(rows)]
+
+    def append(self, user_id: str, turn: Turn, keep: int):
+        with self.db:
+            self.db.execute("BEGIN")
+            self.db.execute(
+                "INSERT INTO turns (user_id, role, content, ts) VALUES (?, ?, ?, ?)",
+                (user_id, turn.role, turn.content, turn.ts)
+            )
+            # Trim everything older than the newest `keep` turns for this user
+            self.db.execute(
+                "DELETE FROM turns WHERE user_id = ? AND seq <= ("
+                " SELECT seq FROM turns WHERE user_id = ? ORDER BY seq DESC LIMIT 1 OFFSET ?)",
+                (user_id, user_id, keep)
+            )
+
+    def delete(self, user_id: str):
+        self.db.execute("DELETE FROM turns WHERE user_id = ?", (user_id,))
+
+    def prune(self, idle_before: float) -> int:
+        cursor = self.db.execute(
+            "DELETE FROM turns WHERE user_id IN ("
+            " SELECT user_id FROM turns GROUP BY user_id HAVING MAX(ts) < ?)",
+            (idle_before,)
+        )
+        return cursor.rowcount
+
+    def close(self):
+        self.db.close()
+
+
+class ConversationStore:
+    """Per-user conversation history with turn caps and idle/LRU eviction
+
+    Recent users are kept in an in-memory LRU of fixed-length deques. When a
+    persistent backend is configured, evicted users are reloaded from it on
+    their next message; otherwise eviction simply forgets them.
+    """
+
+    def __init__(
+        self,
+        max_turns: int = 5,
+        idle_ttl: float = 24 * 3600,
+        max_users: int = 1000,
+        backend=None,
+        sweep_interval: float = 60,
+        on_evict: Optional[Callable[[str, Turn], None]] = None,
+    ):
+        self.max_turns = max_turns
+        self.idle_ttl = idle_ttl
+        self.max_users = max_users
+        self.backend = backend or MemoryBackend()
+        self.sweep_interval = sweep_interval
+        # Called with (user_id, turn) when a turn falls out of the per-user window
+        self.on_evict = on_evict
+        self._hot: "OrderedDict[str, Deque[Turn]]" = OrderedDict()
+        self._last_sweep = time.monotonic()
+
+    def _turns(self, user_id: str) -> Deque[Turn]:
+        turns = self._hot.get(user_id)
+        if turns is None:
+            turns = deque(self.backend.load(user_id, self.max_turns), maxlen=self.max_turns)
+            if turns and time.time() - turns[-1].ts > self.idle_ttl:
+                turns.clear()
+            self._hot[user_id] = turns
+            while len(self._hot) > self.max_users:
+                self._hot.popitem(last=False)
+        else:
+            self._hot.move_to_end(user_id)
+        return turns
+
+    def append(self, user_id: str, role: str, content: str) -> Turn:
+        """Record a turn, dropping the oldest one past the per-user cap"""
+        self._maybe_sweep()
+        turns = self._turns(user_id)
+        turn = Turn(role, content)
+        # A user returning after the idle TTL starts a fresh conversation
+        if turns and turn.ts - turns[-1].ts > self.idle_ttl:
+            turns.clear()
+            self.backend.delete(user_id)
+        if len(turns) == turns.maxlen and self.on_evict is not None:
+            self.on_evict(user_id, turns[0])
+        turns.append(turn)
+        self.backend.append(user_id, turn, self.max_turns)
+        return turn
+
+    def history(self, user_id: str) -> List[Turn]:
+        """Return the user's retained turns, oldest first"""
+        return list(self._turns(user_id))
+
+    def load(self, user_id: str, turns: Iterable[Turn]):
+        """Replace a user's in-memory history (e.g. from a snapshot)"""
+        self._hot[user_id] = deque(turns, maxlen=self.max_turns)
+        self._hot.move_to_end(user_id)
+        while len(self._hot) > self.max_users:
+            self._hot.popitem(last=False)
+
+    def merge(self, user_id: str, turns: Iterable[Turn]):
+        """Add turns recorded by another process, keeping the newest max_turns"""
+        current = self._turns(user_id)
+        seen = {(turn.ts, turn.role) for turn in current}
+        merged = list(current) + [turn for turn in turns if (turn.ts, turn.role) not in seen]
+        merged.sort(key=lambda turn: turn.ts)
+        self.load(user_id, merged[-self.max_turns:])
+
+    def snapshot(self) -> Dict[str, List[Turn]]:
+        """Every in-memory conversation that is still within the idle TTL"""
+        cutoff = time.time() - self.idle_ttl
+        return {uid: list(turns) for uid, turns in self._hot.items() if turns and turns[-1].ts >= cutoff}
+
+    def clear(self, user_id: str):
+        self._hot.pop(user_id, None)
+        self.backend.delete(user_id)
+
+    def _maybe_sweep(self):
+        now = time.monotonic()
+        if now - self._last_sweep >= self.sweep_interval:
+            self._last_sweep = now
+            self.evict_idle()
+
+    def evict_idle(self) -> int:
+        """Forget users with no activity within the idle TTL"""
+        cutoff = time.time() - self.idle_ttl
+        idle = [uid for uid, turns in self._hot.items() if not turns or turns[-1].ts < cutoff]
+        for user_id in idle:
+            del self._hot[user_id]
+        pruned = self.backend.prune(cutoff)
+        if idle or pruned:
+            logger.debug(f"Evicted {len(idle)} idle conversations ({pruned} stored turns)")
+        return len(idle)
+
+    def __len__(self) -> int:
+        return len(self._hot)
+
+    def close(self):
+        self.backend.close()
+
+
+def create_conversation_store(db_path: str = "", **kwargs) -> ConversationStore:
+    """Build a store backed by SQLite when db_path is set, memory otherwise"""
+    backend = SQLiteBackend(db_path) if db_path else MemoryBackend()
+    return ConversationStore(backend=backend, **kwargs)
@@ -0,0 +1,123 @@
+"""
+Per-request deadlines with partial-result collection
+"""
+import asyncio
+import contextvars
+import dataclasses
+import json
+import logging
+import time
+from typing import Any, Awaitable, List, Optional, Tuple
+
+from fanout import FLEXIBLE_SEARCH_TOOL, lowest_price
+
+logger = logging.getLogger("flyme.deadline")
+
+# The deadline of the request currently being served, visible to tool calls
+current_deadline: contextvars.ContextVar[Optional["Deadline"]] = contextvars.ContextVar(
+    "current_deadline", default=None
+)
+
+
+class Deadline:
+    """Time budget for one Slack request, shared by every stage it runs
+
+    Stages ask for a slice of what remains (budget) rather than a fixed
+    timeout, so a slow profile lookup or tool call leaves less time for the
+    rest instead of pushing the reply past response_timeout. Completed tool
+    results and streamed text are kept so a timed-out request can still
+    answer with what it found.
+    """
+
+    def __init__(self, timeout: float):
+        self.timeout = timeout
+        self.expires_at = time.monotonic() + timeout
+        self.tool_results: List[Tuple[str, dict, Any]] = []
+        self.text = ""
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def budget(self, fraction: float = 1.0, cap: Optional[float] = None, reserve: float = 0.0) -> float:
+        """Seconds a stage may use: a fraction of what's left, optionally capped"""
+        seconds = max(0.0, self.remaining() - reserve) * fraction
+        return seconds if cap is None else min(seconds, cap)
+
+    async def run(self, awaitable: Awaitable, fraction: float = 1.0, cap: Optional[float] = None, reserve: float = 0.0):
+        """Await within this stage's budget, raising asyncio.TimeoutError past it"""
+        return await asyncio.wait_for(awaitable, self.budget(fraction, cap, reserve))
+
+    def record_tool_result(self, tool_name: str, arguments: Any, result: Any):
+        if isinstance(arguments, str):
+            try:
+                arguments = json.loads(arguments or "{}")
+            except json.JSONDecodeError:
+                arguments = {}
+        self.tool_results.append((tool_name, arguments, result))
+
+    def used_tool(self, tool_name: str) -> bool:
+        """Whether a call to tool_name completed during this request"""
+        return any(name == tool_name for name, _, _ in self.tool_results)
+
+    def partial_response(self, timeout_message: str, partial_note: str) -> str:
+        """Best answer available from the work finished before the deadline"""
+        if self.text.strip():
+            return f"{self.text.rstrip()}\n\n_{partial_note}_"
+
+        lines = []
+        for tool_name, arguments, result in self.tool_results:
+            if tool_name == FLEXIBLE_SEARCH_TOOL:
+                lines.append(str(result))
+                continue
+            price = lowest_price(result)
+            if price is not None:
+                lines.append(f"• {describe_search(arguments)}: from ${price:,.0f}")
+        if not lines:
+            return timeout_message
+        return "\n".join(lines) + f"\n\n_{partial_note}_"
+
+
+def describe_search(arguments: dict) -> str:
+    """Short label for a search's route/location and dates"""
+    if "location" in arguments:
+        label = arguments.get("location", "")
+        dates = [arguments.get("checkin_date"), arguments.get("checkout_date")]
+    else:
+        label = f"{arguments.get('departure_airport_code', '?')} → {arguments.get('arrival_airport_code', '?')}"
+        dates = [arguments.get("outbound_date"), arguments.get("return_date")]
+    dates = [d for d in dates if d]
+    return f"{label} ({' to '.join(dates)})" if dates else label
+
+
+def bound_tools(tools, tool_timeout: float):
+    """Return copies of FunctionTools bounded by the current request's deadline"""
+    return [bound_tool(tool, tool_timeout) for tool in tools]
+
+
+def bound_tool(tool, tool_timeout: float):
+    """Return a copy of a FunctionTool bounded by the current request's deadline"""
+    invoke = getattr(tool, "on_invoke_tool", None)
+    if invoke is None:
+        return tool
+
+    async def bounded_invoke(ctx, arguments):
+        deadline = current_deadline.get()
+        if deadline is None:
+            return await invoke(ctx, arguments)
+
+        timeout = deadline.budget(cap=tool_timeout)
+        if timeout <= 0:
+            return "Skipped: out of time for this request. Answer with the results you already have."
+        try:
+            result = await asyncio.wait_for(invoke(ctx, arguments), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Tool {tool.name} timed out after {timeout:.1f}s")
+            return "This search timed out. Answer with the results you already have."
+        deadline.record_tool_result(tool.name, arguments, result)
+        return result
+
+    return dataclasses.replace(tool, on_invoke_tool=bounded_invoke)
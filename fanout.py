@@ -0,0 +1,276 @@
+"""
+Parallel flexible-date search across a window of candidate dates
+"""
+import asyncio
+import json
+import logging
+import re
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from constants import SEARCH_TOOLS
+
+logger = logging.getLogger("flyme.fanout")
+
+FLEXIBLE_SEARCH_TOOL = "FlyMe_FlexibleDateSearch"
+
+FLEXIBLE_SEARCH_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "kind": {
+            "type": "string",
+            "enum": ["flights", "hotels"],
+            "description": "Search flights or hotels"
+        },
+        "origin": {
+            "type": "string",
+            "description": "Departure airport IATA code (flights only)"
+        },
+        "destination": {
+            "type": "string",
+            "description": "Arrival airport IATA code for flights, or city/area for hotels"
+        },
+        "earliest_date": {
+            "type": "string",
+            "description": "First possible departure/check-in date, YYYY-MM-DD"
+        },
+        "latest_date": {
+            "type": "string",
+            "description": "Last possible departure/check-in date, YYYY-MM-DD"
+        },
+        "trip_lengths": {
+            "type": "array",
+            "items": {"type": "integer"},
+            "description": "Candidate trip lengths in nights. Omit for one-way flights"
+        },
+        "guests": {
+            "type": "integer",
+            "description": "Number of hotel guests (hotels only)"
+        }
+    },
+    "required": ["kind", "destination", "earliest_date", "latest_date"],
+    "additionalProperties": False
+}
+
+FLEXIBLE_SEARCH_DESCRIPTION = (
+    "Search every date combination in a flexible window in one call. Runs the "
+    "flight or hotel searches in parallel and returns the lowest price for each "
+    "departure date and trip length. Use this whenever the user is flexible on "
+    "dates, then call the regular search tool for the chosen dates to get details."
+)
+
+_PRICE_KEYS = ("price", "total_price", "extracted_price", "rate_per_night", "lowest_price")
+
+
+def expand_dates(
+    earliest: date,
+    latest: date,
+    trip_lengths: Optional[List[int]] = None,
+    max_searches: int = 21,
+) -> List[Tuple[date, Optional[date]]]:
+    """Expand a date window into (outbound, return) pairs
+
+    If the full grid exceeds max_searches, departure dates are sampled evenly
+    across the window so the whole range is still covered.
+    """
+    if latest < earliest:
+        earliest, latest = latest, earliest
+    lengths = sorted({n for n in (trip_lengths or []) if n > 0}) or [None]
+    days = (latest - earliest).days + 1
+    max_departures = max(1, max_searches // len(lengths))
+
+    if days <= max_departures:
+        departures = [earliest + timedelta(days=i) for i in range(days)]
+    else:
+        step = (days - 1) / max(1, max_departures - 1)
+        departures = sorted({earliest + timedelta(days=round(i * step)) for i in range(max_departures)})
+
+    return [
+        (d, d + timedelta(days=n) if n else None)
+        for d in departures
+        for n in lengths
+    ]
+
+
+def lowest_price(payload: Any) -> Optional[float]:
+    """Find the lowest price anywhere in a search tool payload"""
+    if isinstance(payload, str):
+        try:
+            payload = json.loads(payload)
+        except json.JSONDecodeError:
+            return None
+
+    best = None
+    stack = [payload]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, dict):
+            for key, value in node.items():
+                if key in _PRICE_KEYS:
+                    price = parse_price(value)
+                    if price is not None and (best is None or price < best):
+                        best = price
+                elif isinstance(value, (dict, list)):
+                    stack.append(value)
+        elif isinstance(node, list):
+            stack.extend(node)
+    return best
+
+
+def parse_price(value: Any) -> Optional[float]:
+    """A positive price from a number, '$1,234' string or {'extracted_lowest': ...}"""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value) if value > 0 else None
+    if isinstance(value, str):
+        match = re.search(r"\d[\d,]*(?:\.\d+)?", value)
+        if match:
+            return float(match.group().replace(",", ""))
+    if isinstance(value, dict):
+        return parse_price(value.get("extracted_lowest", value.get("lowest")))
+    return None
+
+
+class FlexibleDateSearch:
+    """Fans a flexible date window out into concurrent Arcade searches"""
+
+    def __init__(self, tools, concurrency: int = 4, max_searches: int = 21):
+        # Keyed by agent tool name, e.g. "Search_SearchOneWayFlights"
+        self.tools = {tool.name: tool for tool in tools if hasattr(tool, "on_invoke_tool")}
+        self.concurrency = concurrency
+        self.max_searches = max_searches
+
+    def available(self) -> bool:
+        return any(_agent_name(name) in self.tools for name in SEARCH_TOOLS.values())
+
+    def build_requests(self, args: Dict[str, Any]) -> List[Tuple[str, Dict[str, Any]]]:
+        """Turn fan-out arguments into (tool name, tool arguments) pairs"""
+        earliest = date.fromisoformat(args["earliest_date"])
+        latest = date.fromisoformat(args["latest_date"])
+        kind = args.get("kind", "flights")
+        lengths = args.get("trip_lengths") or []
+        if kind == "hotels" and not lengths:
+            lengths = [1]
+
+        requests = []
+        for outbound, inbound in expand_dates(earliest, latest, lengths, self.max_searches):
+            requests.append(search_request(
+                kind, args.get("origin", ""), args["destination"], outbound, inbound, args.get("guests")
+            ))
+        return requests
+
+    async def search(self, ctx, args: Dict[str, Any]) -> str:
+        """Run every candidate search concurrently and render a price matrix"""
+        requests = self.build_requests(args)
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def run_one(tool_name, tool_args):
+            tool = self.tools.get(tool_name)
+            if tool is None:
+                return None
+            async with semaphore:
+                try:
+                    payload = await tool.on_invoke_tool(ctx, json.dumps(tool_args))
+                except Exception as e:
+                    logger.warning(f"Fan-out search {tool_name} {tool_args} failed: {e}")
+                    return None
+            return lowest_price(payload)
+
+        prices = await asyncio.gather(*(run_one(name, a) for name, a in requests))
+        return render_matrix(args, requests, prices)
+
+    def as_tool(self):
+        """Expose the fan-out as a single agent tool"""
+        from agents import FunctionTool
+
+        async def on_invoke(ctx, arguments):
+            try:
+                args = json.loads(arguments or "{}")
+                return await self.search(ctx, args)
+            except (KeyError, ValueError) as e:
+                return f"Invalid flexible search arguments: {e}"
+
+        return FunctionTool(
+            name=FLEXIBLE_SEARCH_TOOL,
+            description=FLEXIBLE_SEARCH_DESCRIPTION,
+            params_json_schema=FLEXIBLE_SEARCH_SCHEMA,
+            on_invoke_tool=on_invoke,
+            strict_json_schema=False
+        )
+
+
+def search_request(
+    kind: str,
+    origin: str,
+    destination: str,
+    outbound: date,
+    inbound: Optional[date] = None,
+    guests: Optional[int] = None,
+) -> Tuple[str, Dict[str, Any]]:
+    """The (agent tool name, arguments) pair for one flight or hotel search"""
+    if kind == "hotels":
+        tool_args = {
+            "location": destination,
+            "checkin_date": outbound.isoformat(),
+            "checkout_date": inbound.isoformat(),
+        }
+        if guests:
+            tool_args["guests"] = guests
+        return _agent_name(SEARCH_TOOLS["hotels"]), tool_args
+
+    tool_args = {
+        "departure_airport_code": origin.upper(),
+        "arrival_airport_code": destination.upper(),
+        "outbound_date": outbound.isoformat(),
+    }
+    tool = SEARCH_TOOLS["one_way"]
+    if inbound:
+        tool_args["return_date"] = inbound.isoformat()
+        tool = SEARCH_TOOLS["roundtrip"]
+    return _agent_name(tool), tool_args
+
+
+def render_matrix(args, requests, prices) -> str:
+    """Compact price-by-date table: one row per departure, one column per length"""
+    kind = args.get("kind", "flights")
+    date_key = "checkin_date" if kind == "hotels" else "outbound_date"
+    return_key = "checkout_date" if kind == "hotels" else "return_date"
+
+    rows: Dict[str, Dict[str, Optional[float]]] = {}
+    columns: List[str] = []
+    best = None
+    for (_, tool_args), price in zip(requests, prices):
+        outbound = tool_args[date_key]
+        inbound = tool_args.get(return_key)
+        if inbound:
+            nights = (date.fromisoformat(inbound) - date.fromisoformat(outbound)).days
+            column = f"{nights}n"
+        else:
+            column = "one-way"
+        if column not in columns:
+            columns.append(column)
+        rows.setdefault(outbound, {})[column] = price
+        if price is not None and (best is None or price < best[0]):
+            best = (price, outbound, inbound)
+
+    if kind == "hotels":
+        title = f"Lowest hotel prices in {args['destination']}"
+    else:
+        title = f"Lowest flight prices {args.get('origin', '?').upper()}->{args['destination'].upper()}"
+
+    lines = [title, "date | " + " | ".join(columns)]
+    for outbound in sorted(rows):
+        cells = [rows[outbound].get(c) for c in columns]
+        lines.append(outbound + " | " + " | ".join(f"${p:,.0f}" if p is not None else "-" for p in cells))
+
+    if best is None:
+        lines.append("No prices found for any date in this window.")
+    else:
+        price, outbound, inbound = best
+        span = f"{outbound} to {inbound}" if inbound else outbound
+        lines.append(f"Cheapest: {span} at ${price:,.0f}")
+    return "\n".join(lines)
+
+
+def _agent_name(arcade_name: str) -> str:
+    """Arcade tool names use dots; the agent-side names use underscores"""
+    return arcade_name.replace(".", "_")
@@ -0,0 +1,206 @@
+"""
+Intent routing, and direct answers to fully specified searches without the agent
+"""
+import dataclasses
+import logging
+import re
+from datetime import date
+from typing import Any, Dict, Optional
+from urllib.parse import quote, quote_plus
+
+from fanout import search_request
+from geo import geo_index
+from reducers import dedupe, parse_flights, parse_hotels, rank_flights, rank_hotels
+from trip import TripFacts
+
+logger = logging.getLogger("flyme.fastpath")
+
+# Every cue the router and slot checks care about, matched in one pass
+_CUES = re.compile(
+    r"\b(?:"
+    r"(?P<hotel>hotels?|motels?|resorts?|accommodations?|lodging|airbnb|hostels?"
+    r"|check[\s-]?(?:in|out)|place to stay|somewhere to stay|where to stay"
+    # A room only with hotel context: "double room", "room for 2", not "room for a carry-on"
+    r"|(?:double|single|twin|king|queen|hotel) rooms?|rooms? for \d+)"
+    r"|(?P<flight>flights?|fly|flying|airfare|airlines?|plane tickets?|one[\s-]?way|round[\s-]?trip"
+    r"|non[\s-]?stop|direct flights?|layovers?)"
+    r"|(?P<open>flexible|whenever|any ?time|cheapest (?:day|time|week|month|way)|best time|recommend\w*"
+    r"|suggest\w*|ideas?|compare|versus|vs|weekend|what about|instead|also"
+    # "Paris or Rome", "Nov 3 or 4": alternatives between places or dates, not "window or aisle"
+    r"|(?-i:[A-Z]\w*|\d\w*)\s+or\s+(?-i:[A-Z]\w*|\d\w*))"
+    r")\b",
+    re.IGNORECASE
+)
+
+RESULT_LIMIT = 5
+
+
+def classify(text: str) -> Dict[str, int]:
+    """Counts of hotel, flight and open-ended cues in text"""
+    counts = {"hotel": 0, "flight": 0, "open": 0}
+    for match in _CUES.finditer(text):
+        counts[match.lastgroup] += 1
+    return counts
+
+
+def _places_by_role(text: str) -> Dict[str, Any]:
+    """The first place found for each role (origin, destination, location)"""
+    roles = {}
+    for role, place in geo_index().find_places(text):
+        roles.setdefault(role, place)
+    return roles
+
+
+def _names_route(roles) -> bool:
+    return "origin" in roles and "destination" in roles
+
+
+def route_kind(text: str, previous: Optional[str] = None) -> str:
+    """flights or hotels for a message, following the conversation when it has no cue
+
+    An origin and a destination ("Boston to Chicago") count as a flight cue.
+    """
+    counts = classify(text)
+    if not counts["flight"] and _names_route(_places_by_role(text)):
+        counts["flight"] = 1
+    if counts["hotel"] and not counts["flight"]:
+        return "hotels"
+    if counts["flight"]:
+        # Combined requests start with flights, as the instructions ask
+        return "flights"
+    return previous or "flights"
+
+
+@dataclasses.dataclass
+class FastQuery:
+    """A search whose every required slot came from the message itself"""
+    kind: str
+    tool: str
+    args: Dict[str, Any]
+    facts: TripFacts
+    label: str
+
+
+def _airport(role_places, role: str) -> Optional[str]:
+    """The one airport code for a role, or None if missing or a multi-airport area"""
+    place = role_places.get(role)
+    if place is None or len(place.codes) != 1:
+        return None
+    return place.codes[0]
+
+
+def parse_query(text: str, kind: str, today: Optional[date] = None) -> Optional[FastQuery]:
+    """The search a message fully specifies, or None when the agent should handle it
+
+    Anything open-ended (flexible dates, comparisons, a follow-up such as
+    "what about"), a mix of flight and hotel cues, a multi-airport city, a
+    hotel location the geo index doesn't know, a hotel request that names a
+    route or a missing date sends the message to the agent instead.
+    """
+    today = today or date.today()
+    counts = classify(text)
+    if counts["open"] or (counts["hotel"] and counts["flight"]):
+        return None
+    facts = TripFacts().update(text, today)
+    if facts.flexible or facts.month or not facts.depart_date or facts.depart_date < today:
+        return None
+
+    roles = _places_by_role(text)
+    if kind == "hotels":
+        location = facts.location or facts.destination
+        # An origin and a destination mean a trip, not a stay
+        if not counts["hotel"] or not location or not facts.return_date or _names_route(roles):
+            return None
+        # Only places the geo index knows; anything else may be a mis-parse
+        if geo_index().lookup(location) is None:
+            return None
+        if facts.return_date <= facts.depart_date:
+            return None
+        tool, args = search_request("hotels", "", location, facts.depart_date, facts.return_date, facts.guests)
+        return FastQuery("hotels", tool, args, facts, location)
+
+    origin = _airport(roles, "origin")
+    destination = _airport(roles, "destination")
+    if not origin or not destination or origin == destination:
+        return None
+    if facts.one_way is not True and facts.return_date is None:
+        return None
+    inbound = None if facts.one_way else facts.return_date
+    if inbound is not None and inbound < facts.depart_date:
+        return None
+    tool, args = search_request("flights", origin, destination, facts.depart_date, inbound)
+    return FastQuery("flights", tool, args, facts, f"{origin} → {destination}")
+
+
+def _day(value: date) -> str:
+    return f"{value:%a, %b} {value.day}"
+
+
+def _time(value: str) -> str:
+    return value[-5:] if len(value) >= 5 else value
+
+
+def format_flights(query: FastQuery, payload: Any, limit: int = RESULT_LIMIT) -> Optional[str]:
+    """Flight Results in the format instructions.md asks of the agent"""
+    options = parse_flights(payload)
+    if not options:
+        return None
+    ranked = rank_flights(dedupe(options), query.facts)
+    origin = query.args["departure_airport_code"]
+    destination = query.args["arrival_airport_code"]
+    dates = f"_Date: {_day(query.facts.depart_date)}"
+    if "return_date" in query.args:
+        dates += f" | Return: {_day(query.facts.return_date)}"
+    lines = [f"✈️ *Flight Results: {origin} → {destination}*", dates + "_", ""]
+    for index, option in enumerate(ranked[:limit], 1):
+        price = f"${option.price:,.0f}" if option.price is not None else "price n/a"
+        stops = "nonstop" if not option.stops else f"{option.stops} stop{'s' if option.stops > 1 else ''}"
+        if option.layovers:
+            stops += f" via {option.layovers}"
+        lines.append(f"*{index}. {option.airlines} {option.flight_numbers} - {price}*")
+        lines.append(f"• Departs: {_time(option.departs)} from {option.origin or origin}")
+        lines.append(f"• Arrives: {_time(option.arrives)} at {option.destination or destination}")
+        lines.append(f"• Duration: {option.minutes // 60}h {option.minutes % 60}m, {stops}")
+        if option.aircraft:
+            lines.append(f"• Aircraft: {option.aircraft}")
+        lines.append("")
+    link = (
+        "https://www.google.com/travel/flights?q="
+        + quote_plus(f"Flights from {origin} to {destination} on {query.args['outbound_date']}")
+    )
+    lines.append(f"_Found {len(ranked)} flights. <{link}|Search {origin} to {destination} on Google Flights>_")
+    return "\n".join(lines)
+
+
+def format_hotels(query: FastQuery, payload: Any, limit: int = RESULT_LIMIT) -> Optional[str]:
+    """Hotel Results in the format instructions.md asks of the agent"""
+    options = parse_hotels(payload)
+    if not options:
+        return None
+    ranked = rank_hotels(dedupe(options), query.facts)
+    nights = (query.facts.return_date - query.facts.depart_date).days
+    header = f"_Check-in: {_day(query.facts.depart_date)} | Check-out: {_day(query.facts.return_date)}"
+    if query.facts.guests:
+        header += f" | {query.facts.guests} guests"
+    lines = [f"🏨 *Hotel Results: {query.label}*", header + "_", ""]
+    for index, option in enumerate(ranked[:limit], 1):
+        nightly = f"${option.nightly:,.0f}/night" if option.nightly is not None else "price n/a"
+        name = f"<{option.link}|{option.name}>" if option.link else option.name
+        lines.append(f"*{index}. {name} - {nightly}*")
+        if option.rating is not None:
+            stars = "⭐" * max(1, round(option.rating))
+            lines.append(f"• Rating: {stars} ({option.rating}/5, {option.reviews:,} reviews)")
+        if option.amenities:
+            lines.append(f"• Amenities: {option.amenities}")
+        if option.total is not None:
+            lines.append(f"• Total: ${option.total:,.0f} for {nights} night{'s' if nights != 1 else ''}")
+        lines.append("")
+    link = f"https://www.google.com/travel/hotels/{quote(query.label)}"
+    lines.append(f"_Found {len(ranked)} hotels. <{link}|Search hotels in {query.label} on Google>_")
+    return "\n".join(lines)
+
+
+def format_results(query: FastQuery, payload: Any) -> Optional[str]:
+    if query.kind == "hotels":
+        return format_hotels(query, payload)
+    return format_flights(query, payload)
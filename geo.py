@@ -0,0 +1,318 @@
+"""
+Offline airport, city and metro-area index for resolving places to IATA codes
+"""
+import csv
+import dataclasses
+import logging
+import os
+import re
+import unicodedata
+from typing import Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger("flyme.geo")
+
+AIRPORTS_CSV = os.path.join(os.path.dirname(os.path.abspath(__file__)), "airports.csv")
+
+# Everyday names for metro areas and cities, mapped to the name they index under
+ALIASES = {
+    "nyc": "new york city",
+    "new york": "new york city",
+    "manhattan": "new york city",
+    "bay area": "san francisco bay area",
+    "the bay area": "san francisco bay area",
+    "sf": "san francisco",
+    "la": "los angeles",
+    "dc": "washington dc",
+    "philly": "philadelphia",
+    "vegas": "las vegas",
+    "dfw area": "dallas fort worth",
+    "bangalore": "bengaluru",
+    "bombay": "mumbai",
+    "saigon": "ho chi minh city",
+    "new delhi": "delhi",
+    "rio": "rio de janeiro",
+    "cabo": "los cabos",
+}
+
+# Single words that are place names here but usually mean something else
+_AMBIGUOUS = {"nice", "ontario", "reading", "split"}
+
+# Short keys (IATA codes, "LA", "SF") only match when typed in capitals
+_SHORT = 3
+_LOWERCASE_OK = {"nyc", "sf", "dc"}
+
+# Generic words dropped from airport names to make a second, shorter key
+_GENERIC = (" international", " airport")
+
+_TOKEN = re.compile(r"[\w'.&/-]+")
+_PLAIN = re.compile(r"[a-z0-9]+(?: [a-z0-9]+)*")
+_NON_WORD = re.compile(r"[^\w]+")
+
+# Preposition before a place -> the role it plays in the trip
+_ROLES = {
+    "from": "origin", "to": "destination", "into": "destination",
+    "in": "location", "near": "location", "at": "location",
+}
+
+
+def normalize(text: str) -> str:
+    """Lowercase, accent-free, punctuation-free form used as index keys"""
+    text = text.lower()
+    if _PLAIN.fullmatch(text):
+        return text
+    if not text.isascii():
+        text = unicodedata.normalize("NFKD", text)
+        text = "".join(c for c in text if not unicodedata.combining(c))
+    text = text.replace("'", "").replace(".", "")
+    return " ".join(_NON_WORD.sub(" ", text).split())
+
+
+@dataclasses.dataclass(frozen=True)
+class Place:
+    name: str
+    kind: str  # "airport", "city" or "metro"
+    codes: Tuple[str, ...]
+    country: str
+    tz: str
+
+    def describe(self) -> str:
+        if self.kind == "airport":
+            return f"{self.name} ({self.codes[0]})"
+        return f"{self.name} ({', '.join(self.codes)})"
+
+
+class _RadixTrie:
+    """Prefix tree with string-labelled edges; each node is [children, value]
+
+    Children map an edge's first character to (label, node), so a walk
+    compares whole labels at a time and shared prefixes are stored once.
+    """
+
+    __slots__ = ("root", "size")
+
+    def __init__(self):
+        self.root = [{}, None]
+        self.size = 0
+
+    def insert(self, key: str, value: int):
+        node, i = self.root, 0
+        while i < len(key):
+            edge = node[0].get(key[i])
+            if edge is None:
+                node[0][key[i]] = (key[i:], [{}, value])
+                self.size += 1
+                return
+            label, child = edge
+            common = 0
+            limit = min(len(label), len(key) - i)
+            while common < limit and label[common] == key[i + common]:
+                common += 1
+            if common < len(label):
+                # Split the edge where the new key diverges
+                middle = [{label[common]: (label[common:], child)}, None]
+                node[0][key[i]] = (label[:common], middle)
+                child = middle
+            node, i = child, i + common
+        if node[1] is None:
+            self.size += 1
+        node[1] = value
+
+    def get(self, key: str) -> Optional[int]:
+        node, i = self.root, 0
+        while i < len(key):
+            edge = node[0].get(key[i])
+            if edge is None or not key.startswith(edge[0], i):
+                return None
+            i += len(edge[0])
+            node = edge[1]
+        return node[1]
+
+    def matches(self, text: str, start: int) -> Iterator[Tuple[int, int]]:
+        """(end, value) for every key that is text[start:end] ending on a word boundary"""
+        node, i = self.root, start
+        while True:
+            if node[1] is not None and i > start and (i == len(text) or text[i] == " "):
+                yield i, node[1]
+            if i == len(text):
+                return
+            edge = node[0].get(text[i])
+            if edge is None or not text.startswith(edge[0], i):
+                return
+            i += len(edge[0])
+            node = edge[1]
+
+    def complete(self, prefix: str, limit: int = 10) -> List[int]:
+        """Values of up to limit keys starting with prefix"""
+        node, i = self.root, 0
+        while i < len(prefix):
+            edge = node[0].get(prefix[i])
+            if edge is None:
+                return []
+            label, child = edge
+            remaining = prefix[i:]
+            if not (label.startswith(remaining) or remaining.startswith(label)):
+                return []
+            i += len(label)
+            node = child
+        found, stack = [], [node]
+        while stack and len(found) < limit:
+            node = stack.pop()
+            if node[1] is not None:
+                found.append(node[1])
+            stack.extend(child for _, child in sorted(node[0].values(), reverse=True))
+        return found
+
+
+class GeoIndex:
+    """Airports, cities and metro areas from airports.csv behind one radix trie
+
+    Keys are IATA codes, airport names, city names, metro names and
+    ALIASES, all normalized. find_places scans a message once, taking the
+    longest match at each word, and tags each place with the preposition
+    before it (from/to/in) so origins and destinations can be told apart.
+    """
+
+    def __init__(self, path: str = AIRPORTS_CSV):
+        self.places: List[Place] = []
+        self._trie = _RadixTrie()
+        self._hubs: Dict[str, List[str]] = {}
+        self._load(path)
+
+    def _add(self, key: str, place_id: int):
+        key = normalize(key)
+        if key:
+            self._trie.insert(key, place_id)
+
+    def _load(self, path: str):
+        cities: Dict[Tuple[str, str], List[dict]] = {}
+        metros: Dict[str, List[dict]] = {}
+        with open(path, newline="", encoding="utf-8") as f:
+            rows = sorted(csv.DictReader(f), key=lambda row: int(row["rank"]))
+        for row in rows:
+            place_id = len(self.places)
+            self.places.append(Place(row["name"], "airport", (row["iata"],), row["country"], row["tz"]))
+            self._add(row["iata"], place_id)
+            self._add(row["name"], place_id)
+            for suffix in _GENERIC:
+                if row["name"].lower().endswith(suffix):
+                    self._add(row["name"][:-len(suffix)], place_id)
+            cities.setdefault((row["city"], row["country"]), []).append(row)
+            if row["metro"]:
+                metros.setdefault(row["metro"], []).append(row)
+            if int(row["rank"]) == 1:
+                self._hubs.setdefault(row["tz"], []).append(row["iata"])
+        # Cities and metros are added after airports so their names win
+        for (city, country), members in cities.items():
+            self._add(city, self._group(city, "city", members))
+        for metro, members in metros.items():
+            self._add(metro, self._group(metro, "metro", members))
+        for alias, target in ALIASES.items():
+            place_id = self._trie.get(normalize(target))
+            if place_id is not None:
+                self._add(alias, place_id)
+        logger.info(f"Geo index loaded: {len(rows)} airports, {self._trie.size} names")
+
+    def _group(self, name: str, kind: str, members: List[dict]) -> int:
+        self.places.append(Place(
+            name, kind, tuple(row["iata"] for row in members), members[0]["country"], members[0]["tz"]
+        ))
+        return len(self.places) - 1
+
+    def lookup(self, name: str) -> Optional[Place]:
+        """Exact match on a code, airport, city, metro or alias"""
+        place_id = self._trie.get(normalize(name))
+        return self.places[place_id] if place_id is not None else None
+
+    def complete(self, prefix: str, limit: int = 5) -> List[Place]:
+        """Places whose name starts with prefix ("san fr" -> San Francisco...)"""
+        seen, places = set(), []
+        for place_id in self._trie.complete(normalize(prefix), limit * 3):
+            if place_id not in seen:
+                seen.add(place_id)
+                places.append(self.places[place_id])
+        return places[:limit]
+
+    def hubs(self, tz: str, limit: int = 3) -> List[str]:
+        """Main airports in a timezone, for guessing where a user flies from"""
+        return self._hubs.get(tz, [])[:limit]
+
+    def find_places(self, text: str) -> List[Tuple[Optional[str], Place]]:
+        """(role, place) for each place in text; role is origin, destination, location or None"""
+        tokens = _TOKEN.findall(text)
+        words = [normalize(token) for token in tokens]
+        normalized = " ".join(words)
+        starts, offset = [], 0
+        for word in words:
+            starts.append(offset)
+            offset += len(word) + 1
+        found, index = [], 0
+        while index < len(words):
+            best = None
+            for end, place_id in self._trie.matches(normalized, starts[index]):
+                best = (end, place_id)
+            if best is None or not words[index]:
+                index += 1
+                continue
+            end, place_id = best
+            last = index
+            while last + 1 < len(starts) and starts[last + 1] < end:
+                last += 1
+            original = " ".join(tokens[index:last + 1])
+            key = normalized[starts[index]:end]
+            if (len(key) <= _SHORT and key not in _LOWERCASE_OK and not original.isupper()) \
+                    or (key in _AMBIGUOUS and not original[:1].isupper()):
+                index += 1
+                continue
+            role = _ROLES.get(words[index - 1]) if index else None
+            if role is None and last + 1 < len(words) and words[last + 1] == "to":
+                # "JFK to LAX"
+                role = "origin"
+            found.append((role, self.places[place_id]))
+            index = last + 1
+        return found
+
+
+_index: Optional[GeoIndex] = None
+
+
+def geo_index() -> GeoIndex:
+    """The shared index, loaded on first use"""
+    global _index
+    if _index is None:
+        _index = GeoIndex()
+    return _index
+
+
+def resolve_trip_places(text: str, facts=None, tz: str = "", kind: str = "flights") -> str:
+    """One prompt line naming the airports for the places in a request, or ""
+
+    Places found in the message take their role from the word before them;
+    places known from earlier turns fill the gaps. Flights use origin and
+    destination, hotels destination and location. With no origin anywhere,
+    a flight request also gets the main airports in the user's timezone as
+    likely departure points.
+    """
+    index = geo_index()
+    wanted = ("destination", "location") if kind == "hotels" else ("origin", "destination")
+    roles: Dict[str, Place] = {}
+    others: List[Place] = []
+    for role, place in index.find_places(text):
+        if role in wanted and role not in roles:
+            roles[role] = place
+        elif role not in wanted and place not in others:
+            others.append(place)
+    if facts is not None:
+        for role in wanted:
+            value = getattr(facts, role, None)
+            place = index.lookup(value) if value and role not in roles else None
+            if place:
+                roles[role] = place
+    parts = [f"{role} {place.describe()}" for role, place in roles.items()]
+    parts += [place.describe() for place in others if place not in roles.values()]
+    hubs = index.hubs(tz) if tz and kind == "flights" and "origin" not in roles else []
+    line = ""
+    if parts:
+        line = f"Resolved places: {'; '.join(parts)}."
+    if hubs:
+        line += f"{' ' if line else ''}Main airports in the user's timezone ({tz}): {', '.join(hubs)}."
+    return line
@@ -1,18 +1,55 @@
 import signal
 import sys
+import time
 import asyncio
 
 class GracefulShutdown:
-    """Handle graceful shutdown of the application"""
+    """Handle graceful shutdown of the application
     
-    def __init__(self):
+    Shutdown first drains: drain handlers stop new work from arriving and
+    let in-flight work finish, sharing one drain_timeout budget (see
+    remaining()). The regular handlers then release resources.
+    """
+    
+    def __init__(self, drain_timeout: float = 0):
         self.shutdown_event = asyncio.Event()
         self.handlers = []
+        self.drain_handlers = []
+        self.drain_timeout = drain_timeout
+        self.draining = False
+        self._drain_deadline = 0.0
         
     def add_handler(self, handler):
         """Add a handler to be called during shutdown"""
         self.handlers.append(handler)
         
+    def add_drain_handler(self, handler):
+        """Add a handler to be called, in order, while draining before shutdown"""
+        self.drain_handlers.append(handler)
+        
+    def remaining(self) -> float:
+        """Seconds left in the drain budget"""
+        return max(0.0, self._drain_deadline - time.monotonic())
+        
+    async def _call(self, handler):
+        try:
+            if asyncio.iscoroutinefunction(handler):
+                await handler()
+            else:
+                handler()
+        except Exception as e:
+            print(f"Error during shutdown: {e}")
+        
+    async def drain(self):
+        """Stop taking new work and let in-flight work finish within drain_timeout"""
+        if self.draining or not self.drain_handlers:
+            return
+        self.draining = True
+        self._drain_deadline = time.monotonic() + self.drain_timeout
+        print(f"Draining in-flight requests (up to {self.drain_timeout:.0f}s)...")
+        for handler in self.drain_handlers:
+            await self._call(handler)
+        
     async def shutdown(self):
         """Execute all shutdown handlers"""
         print("\n\nShutting down FlyMe Bot...")
@@ -23,14 +60,9 @@ class GracefulShutdown:
         logging.getLogger("slack_sdk").setLevel(logging.ERROR)
         logging.getLogger("slack_bolt.AsyncApp").setLevel(logging.ERROR)
         
+        await self.drain()
         for handler in self.handlers:
-            try:
-                if asyncio.iscoroutinefunction(handler):
-                    await handler()
-                else:
-                    handler()
-            except Exception as e:
-                print(f"Error during shutdown: {e}")
+            await self._call(handler)
                 
         print("Goodbye!")
         
@@ -7,8 +7,7 @@ import asyncio
 import sys
 from dotenv import load_dotenv
 
-from config import Config
-from app import FlyMeApp
+from config import Config, setup_logging
 
 def main():
     """Main entry point"""
@@ -28,11 +27,17 @@ def main():
         print("  - SLACK_APP_TOKEN")
         sys.exit(1)
     
-    # Create and run application
-    app = FlyMeApp(config)
+    # With FLYME_WORKERS > 1 this process only supervises workers and never imports the Slack/agent stacks
+    if config.is_supervisor:
+        from supervisor import Supervisor
+        setup_logging(config.log_level)
+        runner = Supervisor(config, config.workers).run()
+    else:
+        from app import FlyMeApp
+        runner = run_app(FlyMeApp(config))
     
     try:
-        asyncio.run(run_app(app))
+        asyncio.run(runner)
     except (KeyboardInterrupt, SystemExit):
         pass
     except Exception as e:
@@ -40,7 +45,7 @@ def main():
         sys.exit(1)
 
 
-async def run_app(app: FlyMeApp):
+async def run_app(app):
     """Run the application with proper initialization"""
     await app.initialize()
     await app.run()
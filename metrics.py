@@ -0,0 +1,285 @@
+"""
+Per-stage latency/throughput metrics with a Prometheus-format endpoint
+"""
+import asyncio
+import bisect
+import contextlib
+import dataclasses
+import json
+import logging
+import time
+from typing import Callable, Dict, Optional, Sequence, Tuple
+
+from constants import MODEL_PRICING
+
+logger = logging.getLogger("flyme.metrics")
+
+# Seconds; covers a cache hit through a full multi-turn agent run
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Dict[str, str]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(key) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    body = ",".join(f'{k}="{v}"' for k, v in pairs)
+    return "{" + body + "}"
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help = help_text
+        self.values: Dict[LabelKey, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = _label_key(labels)
+        self.values[key] = self.values.get(key, 0.0) + amount
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        for key, value in self.values.items():
+            yield f"{self.name}{_format_labels(key)} {value}"
+
+
+class Gauge:
+    """A value sampled from a callback at scrape time, or set directly"""
+
+    def __init__(self, name: str, help_text: str, callback: Optional[Callable[[], float]] = None):
+        self.name = name
+        self.help = help_text
+        self.callback = callback
+        self.values: Dict[LabelKey, float] = {}
+
+    def set(self, value: float, **labels):
+        self.values[_label_key(labels)] = value
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} gauge"
+        if self.callback is not None:
+            try:
+                yield f"{self.name} {float(self.callback())}"
+            except Exception as e:
+                logger.debug(f"Gauge {self.name} callback failed: {e}")
+        for key, value in self.values.items():
+            yield f"{self.name}{_format_labels(key)} {value}"
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [bucket counts..., +Inf count], sum
+        self.series: Dict[LabelKey, Tuple[list, list]] = {}
+
+    def observe(self, value: float, **labels):
+        key = _label_key(labels)
+        series = self.series.get(key)
+        if series is None:
+            series = self.series[key] = ([0] * (len(self.buckets) + 1), [0.0])
+        counts, total = series
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        total[0] += value
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        for key, (counts, total) in self.series.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                yield f"{self.name}_bucket{_format_labels(key, ('le', str(bound)))} {cumulative}"
+            cumulative += counts[-1]
+            yield f"{self.name}_bucket{_format_labels(key, ('le', '+Inf'))} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(key)} {total[0]}"
+            yield f"{self.name}_count{_format_labels(key)} {cumulative}"
+
+
+class MetricsRegistry:
+    """Holds FlyMe's metrics and renders them in Prometheus text format"""
+
+    def __init__(self):
+        self.metrics: Dict[str, object] = {}
+        self.stage_seconds = self.histogram(
+            "flyme_stage_seconds", "Latency of each request stage"
+        )
+        self.stage_errors = self.counter(
+            "flyme_stage_errors_total", "Stage executions that raised"
+        )
+        self.events = self.counter(
+            "flyme_events_total", "Slack events received by type"
+        )
+        self.model_tokens = self.counter(
+            "flyme_model_tokens_total", "Model tokens used, by model and direction"
+        )
+        self.model_cost = self.counter(
+            "flyme_model_cost_usd_total", "Estimated model spend in USD, by model"
+        )
+        self.handoffs = self.counter(
+            "flyme_handoffs_total", "Agent handoffs, e.g. from the gathering model to the full model"
+        )
+
+    def counter(self, name: str, help_text: str) -> Counter:
+        return self.metrics.setdefault(name, Counter(name, help_text))
+
+    def gauge(self, name: str, help_text: str, callback: Optional[Callable[[], float]] = None) -> Gauge:
+        return self.metrics.setdefault(name, Gauge(name, help_text, callback))
+
+    def histogram(self, name: str, help_text: str, buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self.metrics.setdefault(name, Histogram(name, help_text, buckets))
+
+    def observe_stage(self, stage: str, seconds: float, error: bool = False, **labels):
+        """Record one stage timing as a histogram sample and a structured log line"""
+        self.stage_seconds.observe(seconds, stage=stage, **labels)
+        if error:
+            self.stage_errors.inc(stage=stage, **labels)
+        if logger.isEnabledFor(logging.INFO):
+            record = {"stage": stage, "ms": round(seconds * 1000, 1), "error": error}
+            record.update(labels)
+            logger.info(json.dumps(record), extra={"sampled": True})
+
+    def record_usage(self, model: str, input_tokens: int, output_tokens: int):
+        """Count tokens and their estimated cost for one model turn"""
+        self.model_tokens.inc(input_tokens, model=model, direction="input")
+        self.model_tokens.inc(output_tokens, model=model, direction="output")
+        input_price, output_price = MODEL_PRICING.get(model, (0.0, 0.0))
+        self.model_cost.inc(
+            (input_tokens * input_price + output_tokens * output_price) / 1_000_000,
+            model=model
+        )
+
+    @contextlib.asynccontextmanager
+    async def timed(self, stage: str, **labels):
+        """Time the enclosed block as one execution of stage"""
+        started = time.perf_counter()
+        error = False
+        try:
+            yield
+        except BaseException:
+            error = True
+            raise
+        finally:
+            self.observe_stage(stage, time.perf_counter() - started, error, **labels)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# Process-wide registry used by the bot, Slack handlers and tool wrappers
+REGISTRY = MetricsRegistry()
+
+
+def timed_tools(tools, registry: MetricsRegistry = REGISTRY):
+    """Return copies of FunctionTools that record a tool_call stage per invocation"""
+    timed = []
+    for tool in tools:
+        invoke = getattr(tool, "on_invoke_tool", None)
+        if invoke is None:
+            timed.append(tool)
+            continue
+
+        async def timed_invoke(ctx, arguments, _invoke=invoke, _name=tool.name):
+            async with registry.timed("tool_call", tool=_name):
+                return await _invoke(ctx, arguments)
+
+        timed.append(dataclasses.replace(tool, on_invoke_tool=timed_invoke))
+    return timed
+
+
+_turn_hooks_class = None
+
+
+def create_run_hooks(registry: MetricsRegistry = REGISTRY):
+    """RunHooks that time each model turn of a Runner.run"""
+    global _turn_hooks_class
+    if _turn_hooks_class is None:
+        from agents import RunHooks
+
+        class TurnTimingHooks(RunHooks):
+            def __init__(self, registry):
+                self.registry = registry
+                self.started: Dict[str, float] = {}
+
+            async def on_llm_start(self, context, agent, *args, **kwargs):
+                self.started[agent.name] = time.perf_counter()
+
+            async def on_llm_end(self, context, agent, *args, **kwargs):
+                started = self.started.pop(agent.name, None)
+                if started is not None:
+                    self.registry.observe_stage(
+                        "model_turn",
+                        time.perf_counter() - started,
+                        agent=agent.name,
+                        model=str(agent.model)
+                    )
+                response = args[0] if args else kwargs.get("response")
+                usage = getattr(response, "usage", None)
+                if usage is not None:
+                    self.registry.record_usage(
+                        str(agent.model),
+                        getattr(usage, "input_tokens", 0) or 0,
+                        getattr(usage, "output_tokens", 0) or 0
+                    )
+
+            async def on_handoff(self, context, from_agent, to_agent):
+                self.registry.handoffs.inc(source=from_agent.name, target=to_agent.name)
+
+        _turn_hooks_class = TurnTimingHooks
+    return _turn_hooks_class(registry)
+
+
+class MetricsServer:
+    """Minimal HTTP server exposing GET /metrics on localhost"""
+
+    def __init__(self, registry: MetricsRegistry = REGISTRY, host: str = "127.0.0.1", port: int = 9464):
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        logger.info(f"Metrics available at http://{self.host}:{self.port}/metrics")
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request_line = await asyncio.wait_for(reader.readline(), 5)
+            # Drain headers; the request body (if any) is ignored
+            while (await asyncio.wait_for(reader.readline(), 5)) not in (b"\r\n", b"\n", b""):
+                pass
+            parts = request_line.decode("latin-1").split()
+            if len(parts) >= 2 and parts[0] == "GET" and parts[1].split("?")[0] == "/metrics":
+                body = self.registry.render().encode()
+                status = "200 OK"
+                content_type = "text/plain; version=0.0.4; charset=utf-8"
+            else:
+                body = b"Not Found\n"
+                status = "404 Not Found"
+                content_type = "text/plain"
+            writer.write(
+                f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\n"
+                f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body
+            )
+            await writer.drain()
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def stop(self):
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
@@ -0,0 +1,253 @@
+"""
+Rate-limited, ordered delivery of bot replies to Slack
+"""
+import asyncio
+import dataclasses
+import logging
+import re
+from typing import Dict, List, Optional
+
+from cache import TTLCache
+from metrics import REGISTRY
+from profiles import slack_retry_after
+from ratelimit import AdaptiveRateLimiter, current_priority
+
+logger = logging.getLogger("flyme.outbound")
+
+# Slack truncates message text around 4,000 characters; leave room for markup
+MAX_MESSAGE_CHARS = 3500
+# Block Kit limits
+MAX_SECTION_CHARS = 3000
+MAX_BLOCKS = 50
+
+# "*1. Delta - $420*" / "2. Hotel Lisboa - $180/night"
+_OPTION_START = re.compile(r"^\s*\*?\d+\.\s")
+
+
+def _units(text: str) -> List[str]:
+    """Paragraphs, with each numbered option starting a new unit"""
+    units, current = [], []
+    previous_blank = False
+    for line in text.split("\n"):
+        blank = not line.strip()
+        if current and not blank and (previous_blank or _OPTION_START.match(line)):
+            units.append("\n".join(current))
+            current = []
+        current.append(line)
+        previous_blank = blank
+    if current:
+        units.append("\n".join(current))
+    return [unit.strip("\n") for unit in units if unit.strip()]
+
+
+def _hard_split(unit: str, limit: int) -> List[str]:
+    """Split one oversized unit on lines, then on spaces as a last resort"""
+    pieces, current = [], ""
+    for line in unit.split("\n"):
+        while len(line) > limit:
+            cut = line.rfind(" ", 0, limit)
+            cut = cut if cut > 0 else limit
+            if current:
+                pieces.append(current)
+                current = ""
+            pieces.append(line[:cut])
+            line = line[cut:].lstrip()
+        candidate = f"{current}\n{line}" if current else line
+        if len(candidate) > limit:
+            pieces.append(current)
+            candidate = line
+        current = candidate
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def split_message(text: str, limit: int = MAX_MESSAGE_CHARS) -> List[str]:
+    """Split text into messages of at most limit chars, between options where possible"""
+    if len(text) <= limit:
+        return [text]
+    chunks, current = [], ""
+    for unit in _units(text):
+        if len(unit) > limit:
+            if current:
+                chunks.append(current)
+                current = ""
+            chunks.extend(_hard_split(unit, limit))
+            continue
+        candidate = f"{current}\n\n{unit}" if current else unit
+        if len(candidate) > limit:
+            chunks.append(current)
+            candidate = unit
+        current = candidate
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def _section(text: str) -> dict:
+    if len(text) > MAX_SECTION_CHARS:
+        text = text[:MAX_SECTION_CHARS - 3] + "..."
+    return {"type": "section", "text": {"type": "mrkdwn", "text": text}}
+
+
+def render_blocks(text: str) -> Optional[List[dict]]:
+    """Compact Block Kit for a flight/hotel results answer, None for other text
+
+    Each option becomes one section: its title line, then its bullet
+    details joined on a single line. An italic closing line (the "Found N
+    flights" footer with the Google link) becomes a context block.
+    """
+    units = _units(text)
+    if not any(_OPTION_START.match(unit) for unit in units):
+        return None
+    blocks = []
+    for unit in units:
+        lines = [line.strip() for line in unit.split("\n") if line.strip()]
+        if _OPTION_START.match(unit):
+            details = [line.lstrip("•-").strip() for line in lines[1:]]
+            body = lines[0] + ("\n" + " · ".join(details) if details else "")
+            if blocks and blocks[-1]["type"] == "section":
+                blocks.append({"type": "divider"})
+            blocks.append(_section(body))
+        elif len(lines) == 1 and lines[0].startswith("_") and lines[0].endswith("_"):
+            blocks.append({"type": "context", "elements": [{"type": "mrkdwn", "text": lines[0]}]})
+        else:
+            blocks.append(_section("\n".join(lines)))
+    return blocks if len(blocks) <= MAX_BLOCKS else None
+
+
+@dataclasses.dataclass
+class _Message:
+    channel: str
+    text: str
+    blocks: Optional[List[dict]]
+    thread_ts: Optional[str]
+    ts: Optional[str]
+    priority: int
+    future: asyncio.Future
+
+
+class OutboundQueue:
+    """Per-channel send queues paced to Slack's rate limits
+
+    Messages to one channel are sent in order by a worker that exists only
+    while the channel has pending messages. chat.postMessage is paced per
+    channel (Slack allows about one per second); chat.update shares one
+    workspace-wide limiter (Tier 3, which tolerates bursts). A `ratelimited`
+    error halves the limiter's rate and pauses it for the Retry-After
+    period, and the message is retried rather than dropped. Long answers
+    are split at option boundaries and results are rendered as Block Kit,
+    with the plain text kept as the notification fallback.
+    """
+
+    def __init__(
+        self,
+        client,
+        post_rate: float = 1.0,
+        post_burst: float = 3,
+        update_rate: float = 2.0,
+        update_burst: float = 50,
+        max_retries: int = 5,
+        max_chars: int = MAX_MESSAGE_CHARS,
+        blocks: bool = True,
+        limiter_idle_ttl: float = 600,
+        max_channels: int = 1000,
+    ):
+        self.client = client
+        self.post_rate = post_rate
+        self.post_burst = post_burst
+        self.max_retries = max_retries
+        self.max_chars = max_chars
+        self.blocks = blocks
+        self.update_limiter = AdaptiveRateLimiter(
+            "slack:chat.update", rate=update_rate, burst=update_burst
+        )
+        self._queues: Dict[str, asyncio.Queue] = {}
+        # Pacing and Retry-After state outlives a channel's queue; idle channels age out
+        self._limiters = TTLCache(ttl=limiter_idle_ttl, max_size=max_channels)
+        self._workers: Dict[str, asyncio.Task] = {}
+        self.sent = 0
+        self.retries = 0
+
+    def _enqueue(self, channel, text, thread_ts=None, ts=None) -> asyncio.Future:
+        future = asyncio.get_running_loop().create_future()
+        blocks = render_blocks(text) if self.blocks else None
+        message = _Message(channel, text, blocks, thread_ts, ts, current_priority.get(), future)
+        queue = self._queues.get(channel)
+        if queue is None:
+            queue = self._queues[channel] = asyncio.Queue()
+        queue.put_nowait(message)
+        if channel not in self._workers:
+            self._workers[channel] = asyncio.get_running_loop().create_task(self._drain(channel))
+        return future
+
+    async def send(self, channel: str, text: str, thread_ts: Optional[str] = None, ts: Optional[str] = None):
+        """Deliver text to channel, editing message ts with the first part if given
+
+        Returns the Slack response for the last message sent.
+        """
+        chunks = split_message(text, self.max_chars)
+        if len(chunks) > 1:
+            REGISTRY.counter("flyme_split_replies_total", "Replies split across several messages").inc()
+        futures = [
+            self._enqueue(channel, chunk, thread_ts, ts if index == 0 else None)
+            for index, chunk in enumerate(chunks)
+        ]
+        responses = await asyncio.gather(*futures)
+        return responses[-1]
+
+    async def _drain(self, channel: str):
+        queue = self._queues[channel]
+        try:
+            while not queue.empty():
+                message = queue.get_nowait()
+                try:
+                    message.future.set_result(await self._deliver(message))
+                except Exception as e:
+                    if not message.future.done():
+                        message.future.set_exception(e)
+        finally:
+            # Nothing was awaited since the final empty() check, so no message is stranded
+            del self._workers[channel]
+            if queue.empty():
+                del self._queues[channel]
+
+    def _channel_limiter(self, channel: str) -> AdaptiveRateLimiter:
+        limiter = self._limiters.get(channel)
+        if limiter is None:
+            limiter = AdaptiveRateLimiter(f"slack:{channel}", rate=self.post_rate, burst=self.post_burst)
+        # Refresh the idle TTL on every use
+        self._limiters.set(channel, limiter)
+        return limiter
+
+    async def _deliver(self, message: _Message):
+        limiter = self.update_limiter if message.ts else self._channel_limiter(message.channel)
+        kwargs = {"channel": message.channel, "text": message.text}
+        if message.blocks:
+            kwargs["blocks"] = message.blocks
+        for attempt in range(self.max_retries + 1):
+            await limiter.acquire(message.priority)
+            try:
+                if message.ts:
+                    response = await self.client.chat_update(ts=message.ts, **kwargs)
+                else:
+                    response = await self.client.chat_postMessage(thread_ts=message.thread_ts, **kwargs)
+                limiter.on_success()
+                self.sent += 1
+                return response
+            except Exception as e:
+                retry_after = slack_retry_after(e)
+                if retry_after is None or attempt == self.max_retries:
+                    raise
+                self.retries += 1
+                REGISTRY.counter("flyme_slack_retries_total", "Slack sends retried after ratelimited").inc()
+                logger.info(f"Slack rate limited on {message.channel}; retrying in {retry_after:.1f}s")
+                limiter.on_rate_limited(retry_after)
+
+    def stats(self):
+        return {
+            "channels": len(self._queues),
+            "pending": sum(queue.qsize() for queue in self._queues.values()),
+            "sent": self.sent,
+            "retries": self.retries,
+        }
@@ -0,0 +1,211 @@
+"""
+Speculative flight/hotel searches started while the agent is still clarifying
+"""
+import asyncio
+import dataclasses
+import json
+import logging
+import time
+from datetime import timedelta
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from cache import normalize_arguments
+from fanout import search_request
+from geo import geo_index
+from metrics import REGISTRY
+from ratelimit import BACKGROUND, current_priority
+from trip import TripFacts
+from watches import current_requester
+
+logger = logging.getLogger("flyme.prefetch")
+
+SearchKey = Tuple[str, str]
+
+
+def _code(place: Optional[str]) -> Optional[str]:
+    found = geo_index().lookup(place) if place else None
+    return found.codes[0] if found else None
+
+
+def likely_searches(kind: str, facts: TripFacts, trip_lengths: Sequence[int] = (7, 3)) -> Tuple[list, bool]:
+    """(tool name, arguments) pairs the next turn will most likely run, and whether certain
+
+    Complete facts give the one search the agent is about to make. With
+    only the return/check-out date missing, the guesses are the usual trip
+    lengths (plus one-way for flights). Anything vaguer gives no guesses.
+    """
+    depart = facts.depart_date
+    if depart is None:
+        return [], False
+    if kind == "hotels":
+        location = facts.location or facts.destination
+        if not location:
+            return [], False
+        if facts.return_date:
+            return [search_request("hotels", "", location, depart, facts.return_date, facts.guests)], True
+        return [
+            search_request("hotels", "", location, depart, depart + timedelta(days=nights), facts.guests)
+            for nights in trip_lengths
+        ], False
+
+    origin, destination = _code(facts.origin), _code(facts.destination)
+    if not origin or not destination or origin == destination:
+        return [], False
+    if facts.one_way:
+        return [search_request("flights", origin, destination, depart)], True
+    if facts.return_date:
+        return [search_request("flights", origin, destination, depart, facts.return_date)], True
+    guesses = [
+        search_request("flights", origin, destination, depart, depart + timedelta(days=days))
+        for days in trip_lengths
+    ]
+    guesses.append(search_request("flights", origin, destination, depart))
+    return guesses, False
+
+
+@dataclasses.dataclass
+class _Prefetch:
+    task: asyncio.Task
+    started: float
+    used: bool = False
+
+
+class SearchPrefetcher:
+    """Per-user, short-lived speculative searches served to the next turn
+
+    After each user message the bot passes the updated trip facts to
+    update(). While a detail is missing, the searches the facts make likely
+    start at background priority, at most max_per_user per user and
+    concurrency in all. Once the facts are complete, only the prefetch they
+    confirm is kept. A tool call from the same user with the same arguments
+    awaits the prefetched result instead of searching again. Prefetches the
+    new facts rule out, or that expire unused, are cancelled and counted as
+    wasted. Searches the shared tool cache already holds are not repeated,
+    and finished prefetches are added to it.
+    """
+
+    def __init__(
+        self,
+        ttl: float = 120,
+        max_per_user: int = 3,
+        concurrency: int = 4,
+        trip_lengths: Sequence[int] = (7, 3),
+        cache=None,
+    ):
+        self.ttl = ttl
+        self.cache = cache
+        self.max_per_user = max_per_user
+        self.trip_lengths = tuple(trip_lengths)
+        self._limit = asyncio.Semaphore(concurrency)
+        self._entries: Dict[str, Dict[SearchKey, _Prefetch]] = {}
+        self._swept = time.monotonic()
+        self.tools = {}
+        self.started = 0
+        self.hits = 0
+        self.wasted = 0
+
+    def bind(self, tools):
+        """Search with these tools (rate limited, not cached, so they can be cancelled)"""
+        self.tools = {tool.name: tool for tool in tools if hasattr(tool, "on_invoke_tool")}
+
+    def update(self, user_id: str, kind: str, facts: TripFacts):
+        """Start the searches the latest facts make likely; cancel the ones they rule out"""
+        self._sweep()
+        searches, certain = likely_searches(kind, facts, self.trip_lengths)
+        wanted = {
+            (tool, normalize_arguments(args)): (tool, args)
+            for tool, args in searches[:self.max_per_user] if tool in self.tools
+        }
+        entries = self._entries.setdefault(user_id, {})
+        for key in [key for key in entries if key not in wanted]:
+            self._discard(entries, key)
+        for key, (tool, args) in wanted.items():
+            if certain or key in entries or (self.cache is not None and self.cache.has(tool, args)):
+                continue
+            task = asyncio.get_running_loop().create_task(self._search(tool, args))
+            # Failures surface when (if) the result is used
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+            entries[key] = _Prefetch(task, time.monotonic())
+            self.started += 1
+            REGISTRY.counter("flyme_prefetch_total", "Speculative searches by outcome").inc(outcome="started")
+        if not entries:
+            self._entries.pop(user_id, None)
+
+    async def _search(self, tool_name: str, args: dict):
+        from agents import RunContextWrapper
+        current_priority.set(BACKGROUND)
+        async with self._limit:
+            ctx = RunContextWrapper(context={"user_id": "flyme_prefetch"})
+            result = await self.tools[tool_name].on_invoke_tool(ctx, json.dumps(args))
+        if self.cache is not None:
+            self.cache.store(tool_name, args, result)
+        return result
+
+    def _discard(self, entries: Dict[SearchKey, _Prefetch], key: SearchKey):
+        entry = entries.pop(key)
+        if entry.used:
+            return
+        entry.task.cancel()
+        self.wasted += 1
+        REGISTRY.counter("flyme_prefetch_total", "Speculative searches by outcome").inc(outcome="wasted")
+
+    def _sweep(self):
+        """Drop expired prefetches (at most once per ttl)"""
+        now = time.monotonic()
+        if now - self._swept < self.ttl:
+            return
+        self._swept = now
+        for user_id in list(self._entries):
+            entries = self._entries[user_id]
+            for key in [key for key, entry in entries.items() if now - entry.started > self.ttl]:
+                self._discard(entries, key)
+            if not entries:
+                del self._entries[user_id]
+
+    def _lookup(self, tool_name: str, arguments) -> Optional[_Prefetch]:
+        requester = current_requester.get()
+        entries = self._entries.get(requester[0]) if requester else None
+        if not entries:
+            return None
+        entry = entries.get((tool_name, normalize_arguments(arguments)))
+        if entry is None or time.monotonic() - entry.started > self.ttl:
+            return None
+        return entry
+
+    def wrap_tools(self, tools) -> List:
+        """Return tools that answer from the caller's matching prefetch when there is one"""
+        wrapped = []
+        for tool in tools:
+            invoke = getattr(tool, "on_invoke_tool", None)
+            if invoke is None:
+                wrapped.append(tool)
+                continue
+
+            async def prefetched_invoke(ctx, arguments, _invoke=invoke, _name=tool.name):
+                entry = self._lookup(_name, arguments)
+                if entry is not None and not entry.task.cancelled():
+                    try:
+                        # Shielded: a caller timing out must not cancel the shared search
+                        result = await asyncio.shield(entry.task)
+                    except Exception as e:
+                        logger.debug(f"Prefetched {_name} failed, searching again: {e}")
+                    else:
+                        if not entry.used:
+                            entry.used = True
+                            self.hits += 1
+                            REGISTRY.counter(
+                                "flyme_prefetch_total", "Speculative searches by outcome"
+                            ).inc(outcome="hit")
+                        return result
+                return await _invoke(ctx, arguments)
+
+            wrapped.append(dataclasses.replace(tool, on_invoke_tool=prefetched_invoke))
+        return wrapped
+
+    def stats(self):
+        return {
+            "started": self.started,
+            "hits": self.hits,
+            "wasted": self.wasted,
+            "pending": sum(len(entries) for entries in self._entries.values()),
+        }
@@ -0,0 +1,179 @@
+"""
+Cached Slack user profile (timezone) lookups
+"""
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Set
+
+logger = logging.getLogger("flyme.profiles")
+
+
+class UserProfile:
+    """The slice of a Slack profile FlyMe cares about"""
+
+    __slots__ = ("tz", "tz_label", "fetched_at")
+
+    def __init__(self, tz: str = "", tz_label: str = "", fetched_at: float = 0.0):
+        self.tz = tz
+        self.tz_label = tz_label
+        self.fetched_at = fetched_at
+
+    @classmethod
+    def from_user(cls, user_data: dict) -> "UserProfile":
+        return cls(
+            tz=user_data.get("tz", "") or "",
+            tz_label=user_data.get("tz_label", "") or "",
+            fetched_at=time.monotonic()
+        )
+
+
+class UserProfileCache:
+    """Stale-while-revalidate cache of Slack user profiles
+
+    Lookups never block on the Slack API: a cached profile is returned even
+    when it is past its TTL (timezones rarely change) and a refresh is queued
+    in the background. The cache is warmed with a paginated users_list sweep
+    at startup and re-swept periodically.
+    """
+
+    def __init__(
+        self,
+        slack_client,
+        ttl: float = 6 * 3600,
+        max_size: int = 20000,
+        refresh_interval: float = 3600,
+        page_size: int = 200,
+    ):
+        self.slack_client = slack_client
+        self.ttl = ttl
+        self.max_size = max_size
+        self.refresh_interval = refresh_interval
+        self.page_size = page_size
+        self._profiles: "OrderedDict[str, UserProfile]" = OrderedDict()
+        self._pending: Set[str] = set()
+        self._tasks: Set[asyncio.Task] = set()
+        self._refresh_task: Optional[asyncio.Task] = None
+        self.hits = 0
+        self.misses = 0
+
+    def peek(self, user_id: str) -> Optional[UserProfile]:
+        """Return the cached profile (possibly stale) without waiting on Slack"""
+        profile = self._profiles.get(user_id)
+        if profile is None:
+            self.misses += 1
+            self._schedule_fetch(user_id)
+            return None
+
+        self.hits += 1
+        self._profiles.move_to_end(user_id)
+        if time.monotonic() - profile.fetched_at > self.ttl:
+            self._schedule_fetch(user_id)
+        return profile
+
+    def store(self, user_id: str, profile: UserProfile):
+        """Insert or replace a profile, evicting the least recently used"""
+        self._profiles[user_id] = profile
+        self._profiles.move_to_end(user_id)
+        while len(self._profiles) > self.max_size:
+            self._profiles.popitem(last=False)
+
+    def update_from_user(self, user_data: dict):
+        """Apply a user object from a users_list page or user_change event"""
+        user_id = user_data.get("id")
+        if not user_id or user_data.get("deleted") or user_data.get("is_bot"):
+            return
+        self.store(user_id, UserProfile.from_user(user_data))
+
+    def _schedule_fetch(self, user_id: str):
+        """Queue a single-user refresh unless one is already running"""
+        if not user_id or user_id in self._pending:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        self._pending.add(user_id)
+        task = loop.create_task(self._fetch(user_id))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _fetch(self, user_id: str):
+        try:
+            user_info = await self.slack_client.users_info(user=user_id)
+            self.update_from_user(user_info.get("user", {}))
+        except Exception as e:
+            logger.debug(f"Profile fetch failed for {user_id}: {e}")
+        finally:
+            self._pending.discard(user_id)
+
+    async def warm(self):
+        """Sweep users_list page by page and load every member's timezone"""
+        cursor = None
+        loaded = 0
+        while True:
+            try:
+                response = await self.slack_client.users_list(
+                    limit=self.page_size,
+                    cursor=cursor
+                )
+            except Exception as e:
+                retry_after = slack_retry_after(e)
+                if retry_after is None:
+                    logger.warning(f"Profile sweep stopped after {loaded} users: {e}")
+                    return loaded
+                await asyncio.sleep(retry_after)
+                continue
+
+            for member in response.get("members", []):
+                self.update_from_user(member)
+                loaded += 1
+
+            cursor = response.get("response_metadata", {}).get("next_cursor")
+            if not cursor:
+                break
+
+        logger.info(f"Profile cache warmed with {loaded} users")
+        return loaded
+
+    async def _refresh_loop(self):
+        while True:
+            await self.warm()
+            await asyncio.sleep(self.refresh_interval)
+
+    def start(self):
+        """Start the background warm-up and periodic refresh"""
+        if self._refresh_task is None:
+            self._refresh_task = asyncio.get_running_loop().create_task(self._refresh_loop())
+
+    async def stop(self):
+        """Cancel the refresh loop and any outstanding fetches"""
+        tasks = list(self._tasks)
+        if self._refresh_task:
+            tasks.append(self._refresh_task)
+            self._refresh_task = None
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": len(self._profiles),
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+def slack_retry_after(error: Exception) -> Optional[float]:
+    """Return the Retry-After delay if error is a Slack rate limit response"""
+    response = getattr(error, "response", None)
+    if response is None or getattr(response, "status_code", None) != 429:
+        return None
+    headers = getattr(response, "headers", {}) or {}
+    try:
+        return float(headers.get("Retry-After", headers.get("retry-after", 1)))
+    except (TypeError, ValueError):
+        return 1.0
@@ -0,0 +1,70 @@
+"""
+Agent instructions rendered from instructions.md, kept current while running
+"""
+import logging
+import os
+import time
+from datetime import datetime
+from typing import Optional
+
+logger = logging.getLogger("flyme.prompts")
+
+# Appended to the instructions of the small model that gathers trip details
+GATHER_INSTRUCTIONS = """
+
+## YOUR ROLE IN THIS CONVERSATION
+
+You gather trip details; you cannot search. Ask for whatever essential
+information is still missing. As soon as the conversation contains enough
+to search (or the user is flexible on dates and has given a destination
+and rough window), hand off to the FlyMe Assistant without replying
+yourself. Never invent flight or hotel results."""
+
+
+class InstructionTemplate:
+    """Callable Agent instructions that re-render on a new day or file edit
+
+    The rendered text is cached; a call only stats the file (at most once
+    per check_interval) and compares the date, so the common case is a
+    couple of comparisons instead of a file read and string replace.
+    """
+
+    def __init__(self, path: str = "instructions.md", check_interval: float = 5.0, extra: str = ""):
+        self.path = path
+        self.extra = extra
+        self.check_interval = check_interval
+        self._template: Optional[str] = None
+        self._mtime = 0.0
+        self._date = ""
+        self._rendered = ""
+        self._checked = 0.0
+
+    def _reload_if_changed(self):
+        now = time.monotonic()
+        if self._template is not None and now - self._checked < self.check_interval:
+            return
+        self._checked = now
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except OSError:
+            # Keep serving the last good template if the file disappears
+            if self._template is None:
+                raise
+            return
+        if self._template is None or mtime != self._mtime:
+            with open(self.path, "r") as f:
+                self._template = f.read()
+            self._mtime = mtime
+            self._date = ""
+            logger.info(f"Instructions loaded, length: {len(self._template)}")
+
+    def render(self) -> str:
+        self._reload_if_changed()
+        today = datetime.now().strftime("%Y-%m-%d")
+        if today != self._date:
+            self._rendered = self._template.replace("{current_date}", today) + self.extra
+            self._date = today
+        return self._rendered
+
+    def __call__(self, context=None, agent=None) -> str:
+        return self.render()
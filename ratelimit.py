@@ -0,0 +1,235 @@
+"""
+Adaptive client-side rate limiting for OpenAI and Arcade calls
+"""
+import asyncio
+import contextvars
+import dataclasses
+import heapq
+import itertools
+import logging
+import random
+import re
+import time
+from typing import Any, Awaitable, Callable, List, Mapping, Optional, Tuple
+
+from deadline import current_deadline
+from transport import WARMUP_EXTENSION
+
+logger = logging.getLogger("flyme.ratelimit")
+
+# Lower values are served first
+INTERACTIVE = 0
+BACKGROUND = 1
+
+# Priority of the work running in the current task; background jobs override it
+current_priority: contextvars.ContextVar[int] = contextvars.ContextVar(
+    "current_priority", default=INTERACTIVE
+)
+
+
+class AdaptiveRateLimiter:
+    """Priority token bucket that tracks the provider's advertised limits
+
+    Tokens refill at `rate` per second up to `burst`. Waiters are served in
+    priority order so interactive requests jump ahead of background work.
+    The rate follows the x-ratelimit-* response headers when the provider
+    sends them, halves on a 429 and creeps back up on success (AIMD), which
+    keeps throughput close to the real limit instead of collapsing.
+    """
+
+    def __init__(self, name: str, rate: float, burst: Optional[float] = None, min_rate: float = 0.2):
+        self.name = name
+        self.max_rate = rate
+        self.rate = rate
+        self.min_rate = min_rate
+        self.burst = burst or max(1.0, rate)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._sequence = itertools.count()
+        self._pump: Optional[asyncio.Task] = None
+        self.throttled = 0
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, priority: Optional[int] = None):
+        """Wait for a token, ahead of any lower-priority waiters"""
+        if priority is None:
+            priority = current_priority.get()
+        self._refill()
+        if not self._waiters and self.tokens >= 1 and time.monotonic() >= self.blocked_until:
+            self.tokens -= 1
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._sequence), future))
+        if self._pump is None or self._pump.done():
+            self._pump = asyncio.get_running_loop().create_task(self._grant_loop())
+        await future
+
+    async def _grant_loop(self):
+        while self._waiters:
+            now = time.monotonic()
+            if now < self.blocked_until:
+                await asyncio.sleep(self.blocked_until - now)
+                continue
+            self._refill()
+            while self._waiters and self.tokens >= 1:
+                _, _, future = heapq.heappop(self._waiters)
+                if future.done():
+                    continue
+                self.tokens -= 1
+                future.set_result(None)
+            if self._waiters:
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def on_success(self):
+        """Additive increase back toward the configured rate"""
+        self.rate = min(self.max_rate, self.rate + self.max_rate * 0.05)
+
+    def on_rate_limited(self, retry_after: Optional[float] = None):
+        """Multiplicative decrease, and stop granting until Retry-After passes"""
+        self.throttled += 1
+        self.rate = max(self.min_rate, self.rate / 2)
+        self.tokens = 0
+        if retry_after:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + retry_after)
+        logger.info(f"{self.name} rate limited; slowing to {self.rate:.2f}/s")
+
+    def update_from_headers(self, headers: Mapping[str, str]):
+        """Adopt the provider's view of remaining requests and reset time"""
+        remaining = _as_float(headers.get("x-ratelimit-remaining-requests"))
+        reset = parse_duration(headers.get("x-ratelimit-reset-requests"))
+        if remaining is None or not reset:
+            return
+        # Spread what's left of the window evenly over the time until reset
+        self._refill()
+        self.rate = max(self.min_rate, min(self.max_rate, remaining / reset))
+        self.tokens = min(self.tokens, remaining)
+
+    def stats(self):
+        return {
+            "rate": self.rate,
+            "tokens": self.tokens,
+            "waiting": len(self._waiters),
+            "throttled": self.throttled,
+        }
+
+
+def parse_duration(value: Optional[str]) -> Optional[float]:
+    """Parse OpenAI-style durations such as '1s', '6m0s' or '120ms'"""
+    if not value:
+        return None
+    plain = _as_float(value)
+    if plain is not None:
+        return plain
+    total = 0.0
+    for amount, unit in re.findall(r"([\d.]+)(ms|h|m|s)", value):
+        total += float(amount) * {"ms": 0.001, "s": 1, "m": 60, "h": 3600}[unit]
+    return total or None
+
+
+def _as_float(value: Any) -> Optional[float]:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def rate_limit_delay(error: Exception) -> Optional[float]:
+    """Return a Retry-After hint (0 if none) for rate-limit errors, else None"""
+    response = getattr(error, "response", None)
+    status = getattr(error, "status_code", None) or getattr(response, "status_code", None)
+    text = str(error)
+    if status != 429 and "429" not in text and "rate_limit" not in text.lower():
+        return None
+    headers = getattr(response, "headers", None) or {}
+    return _as_float(headers.get("retry-after")) or 0.0
+
+
+async def call_with_retries(
+    call: Callable[[], Awaitable[Any]],
+    limiter: AdaptiveRateLimiter,
+    max_attempts: int = 4,
+    base_delay: float = 0.5,
+):
+    """Run call under the limiter, retrying rate-limit errors with jittered backoff
+
+    Retries stop early when the next attempt would land past the current
+    request's deadline, so the caller still has time to answer.
+    """
+    for attempt in range(max_attempts):
+        await limiter.acquire()
+        try:
+            result = await call()
+        except Exception as e:
+            hint = rate_limit_delay(e)
+            if hint is None or attempt == max_attempts - 1:
+                raise
+            limiter.on_rate_limited(hint)
+            # Full jitter, but never shorter than what the provider asked for
+            delay = max(hint, random.uniform(0, base_delay * 2 ** attempt))
+            deadline = current_deadline.get()
+            if deadline is not None and delay >= deadline.remaining():
+                raise
+            await asyncio.sleep(delay)
+        else:
+            limiter.on_success()
+            return result
+
+
+def rate_limited_tools(tools, limiter: AdaptiveRateLimiter):
+    """Return copies of FunctionTools whose remote calls go through the limiter"""
+    return [rate_limited_tool(tool, limiter) for tool in tools]
+
+
+def rate_limited_tool(tool, limiter: AdaptiveRateLimiter):
+    """Return a copy of a FunctionTool whose remote calls go through the limiter"""
+    invoke = getattr(tool, "on_invoke_tool", None)
+    if invoke is None:
+        return tool
+
+    async def limited_invoke(ctx, arguments):
+        return await call_with_retries(lambda: invoke(ctx, arguments), limiter)
+
+    return dataclasses.replace(tool, on_invoke_tool=limited_invoke)
+
+
+def install_model_rate_limiter(limiter: AdaptiveRateLimiter, max_retries: int = 4, transport=None):
+    """Route the Agents SDK's OpenAI traffic through the limiter
+
+    Each HTTP request waits for a token and each response feeds its
+    rate-limit headers back; the OpenAI client's own retry loop (jittered,
+    Retry-After aware) handles the 429s themselves. With a transport, the
+    client uses its pooled, kept-warm connections.
+    """
+    import httpx
+    from agents import set_default_openai_client
+    from openai import DEFAULT_TIMEOUT, AsyncOpenAI
+
+    async def on_request(request):
+        if not request.extensions.get(WARMUP_EXTENSION):
+            await limiter.acquire()
+
+    async def on_response(response):
+        if response.request.extensions.get(WARMUP_EXTENSION):
+            return
+        limiter.update_from_headers(response.headers)
+        if response.status_code == 429:
+            limiter.on_rate_limited(_as_float(response.headers.get("retry-after")))
+        elif response.status_code < 400:
+            limiter.on_success()
+
+    hooks = {"request": [on_request], "response": [on_response]}
+    if transport is not None:
+        http_client = transport.client("openai", event_hooks=hooks)
+    else:
+        http_client = httpx.AsyncClient(event_hooks=hooks)
+    # The SDK's own timeout, not the shared http_client's (which it would otherwise adopt)
+    client = AsyncOpenAI(http_client=http_client, max_retries=max_retries, timeout=DEFAULT_TIMEOUT)
+    set_default_openai_client(client)
+    return client
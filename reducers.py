@@ -0,0 +1,264 @@
+"""
+Compact, deduplicated and ranked views of flight/hotel search payloads
+"""
+import contextvars
+import dataclasses
+import json
+import logging
+from typing import Any, Iterator, List, Optional
+
+from constants import SEARCH_TOOLS
+from fanout import parse_price
+from trip import TripFacts
+
+logger = logging.getLogger("flyme.reducers")
+
+# Trip facts for the request running in the current task; set by the bot
+current_trip: contextvars.ContextVar[Optional[TripFacts]] = contextvars.ContextVar(
+    "current_trip", default=None
+)
+
+# Ranking weights: dollars per minute of travel time and per connection
+MINUTE_COST = 0.5
+STOP_COST = 60.0
+
+
+@dataclasses.dataclass
+class FlightOption:
+    price: Optional[float]
+    airlines: str
+    flight_numbers: str
+    origin: str
+    destination: str
+    departs: str
+    arrives: str
+    minutes: int
+    stops: int
+    layovers: str = ""
+    aircraft: str = ""
+
+    @property
+    def key(self):
+        return (self.flight_numbers, self.departs)
+
+    def line(self, index: int) -> str:
+        price = f"${self.price:,.0f}" if self.price is not None else "price n/a"
+        stops = "nonstop" if not self.stops else f"{self.stops} stop{'s' if self.stops > 1 else ''}"
+        if self.layovers:
+            stops += f" via {self.layovers}"
+        parts = [
+            f"{index}. {price}",
+            f"{self.airlines} {self.flight_numbers}".strip(),
+            f"{self.origin} {self.departs} → {self.destination} {self.arrives}",
+            f"{self.minutes // 60}h{self.minutes % 60:02d}m",
+            stops,
+        ]
+        if self.aircraft:
+            parts.append(self.aircraft)
+        return " | ".join(parts)
+
+
+@dataclasses.dataclass
+class HotelOption:
+    name: str
+    nightly: Optional[float]
+    total: Optional[float]
+    rating: Optional[float]
+    reviews: int
+    hotel_class: str
+    amenities: str
+    link: str = ""
+
+    @property
+    def key(self):
+        return self.name.casefold()
+
+    def line(self, index: int) -> str:
+        price = f"${self.nightly:,.0f}/night" if self.nightly is not None else "price n/a"
+        parts = [f"{index}. {self.name}", price]
+        if self.total is not None:
+            parts.append(f"total ${self.total:,.0f}")
+        if self.rating is not None:
+            parts.append(f"{self.rating}/5 ({self.reviews} reviews)")
+        if self.hotel_class:
+            parts.append(self.hotel_class)
+        if self.amenities:
+            parts.append(self.amenities)
+        if self.link:
+            parts.append(self.link)
+        return " | ".join(parts)
+
+
+def _load(payload: Any) -> Any:
+    if isinstance(payload, str):
+        try:
+            return json.loads(payload)
+        except json.JSONDecodeError:
+            return None
+    return payload
+
+
+def _walk(node: Any) -> Iterator[dict]:
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, dict):
+            yield node
+            stack.extend(v for v in node.values() if isinstance(v, (dict, list)))
+        elif isinstance(node, list):
+            stack.extend(node)
+
+
+def _clock(value: str) -> str:
+    """'2026-11-03 08:00' -> '11-03 08:00'; other formats pass through"""
+    return value[5:] if len(value) == 16 and value[4] == "-" else value
+
+
+def parse_flights(payload: Any) -> List[FlightOption]:
+    """Itineraries (anything with a list of flight legs) found in a payload"""
+    options = []
+    for node in _walk(_load(payload)):
+        legs = node.get("flights")
+        if not isinstance(legs, list) or not legs:
+            continue
+        if not all(isinstance(leg, dict) and "departure_airport" in leg for leg in legs):
+            continue
+        first, last = legs[0], legs[-1]
+        departure = first.get("departure_airport") or {}
+        arrival = last.get("arrival_airport") or {}
+        minutes = node.get("total_duration") or sum(leg.get("duration") or 0 for leg in legs)
+        layovers = node.get("layovers") or []
+        options.append(FlightOption(
+            price=parse_price(node.get("price")),
+            airlines="/".join(dict.fromkeys(leg.get("airline", "") for leg in legs if leg.get("airline"))),
+            flight_numbers="/".join(leg.get("flight_number", "") for leg in legs if leg.get("flight_number")),
+            origin=departure.get("id", ""),
+            destination=arrival.get("id", ""),
+            departs=_clock(departure.get("time", "")),
+            arrives=_clock(arrival.get("time", "")),
+            minutes=int(minutes),
+            stops=len(legs) - 1,
+            layovers=", ".join(
+                f"{stop.get('id', '')} {int(stop.get('duration') or 0) // 60}h{int(stop.get('duration') or 0) % 60:02d}m"
+                for stop in layovers if isinstance(stop, dict)
+            ) or ", ".join(leg.get("arrival_airport", {}).get("id", "") for leg in legs[:-1]),
+            aircraft=first.get("airplane", "") if len(legs) == 1 else "",
+        ))
+    return options
+
+
+def parse_hotels(payload: Any) -> List[HotelOption]:
+    """Properties (anything named with a nightly rate) found in a payload"""
+    options = []
+    for node in _walk(_load(payload)):
+        if not isinstance(node.get("name"), str) or "rate_per_night" not in node and "price" not in node:
+            continue
+        amenities = node.get("amenities") or []
+        options.append(HotelOption(
+            name=node["name"],
+            nightly=parse_price(node.get("rate_per_night", node.get("price"))),
+            total=parse_price(node.get("total_rate")),
+            rating=node.get("overall_rating"),
+            reviews=int(node.get("reviews") or 0),
+            hotel_class=str(node.get("hotel_class") or ""),
+            amenities=", ".join(amenities[:4]) if isinstance(amenities, list) else "",
+            link=node.get("link", ""),
+        ))
+    return options
+
+
+def dedupe(options: list) -> list:
+    """Keep the cheapest copy of each itinerary/property"""
+    best = {}
+    for option in options:
+        price = option.price if isinstance(option, FlightOption) else option.nightly
+        current = best.get(option.key)
+        if current is None:
+            best[option.key] = option
+            continue
+        current_price = current.price if isinstance(current, FlightOption) else current.nightly
+        if price is not None and (current_price is None or price < current_price):
+            best[option.key] = option
+    return list(best.values())
+
+
+def rank_flights(options: List[FlightOption], facts: Optional[TripFacts] = None) -> List[FlightOption]:
+    """Order by price plus the cost of time and connections, honouring preferences"""
+    facts = facts or TripFacts()
+    if facts.nonstop and any(o.stops == 0 for o in options):
+        options = [o for o in options if o.stops == 0]
+    if facts.budget and any(o.price is not None and o.price <= facts.budget for o in options):
+        options = [o for o in options if o.price is not None and o.price <= facts.budget]
+
+    def score(option: FlightOption):
+        price = option.price if option.price is not None else float("inf")
+        if facts.priority == "price":
+            return (price, option.minutes)
+        if facts.priority == "duration":
+            return (option.minutes, price)
+        return (price + option.minutes * MINUTE_COST + option.stops * STOP_COST, price)
+
+    return sorted(options, key=score)
+
+
+def rank_hotels(options: List[HotelOption], facts: Optional[TripFacts] = None) -> List[HotelOption]:
+    """Order by value (rating per dollar) unless the user asked for cheapest"""
+    facts = facts or TripFacts()
+    if facts.budget and any(o.nightly is not None and o.nightly <= facts.budget for o in options):
+        options = [o for o in options if o.nightly is not None and o.nightly <= facts.budget]
+
+    def score(option: HotelOption):
+        nightly = option.nightly if option.nightly is not None else float("inf")
+        if facts.priority == "price":
+            return (nightly, -(option.rating or 0))
+        # Each rating point above 3 is worth $60/night
+        return (nightly - max(0.0, (option.rating or 0) - 3) * 60, nightly)
+
+    return sorted(options, key=score)
+
+
+def reduce_payload(kind: str, payload: Any, facts: Optional[TripFacts] = None, top_n: int = 5) -> Optional[str]:
+    """Dense text of the top_n options, or None if the payload wasn't recognised"""
+    parsed = parse_flights(payload) if kind == "flights" else parse_hotels(payload)
+    if not parsed:
+        return None
+    options = dedupe(parsed)
+    ranked = rank_flights(options, facts) if kind == "flights" else rank_hotels(options, facts)
+    unique = len(options)
+    header = f"{unique} {kind} found"
+    if unique < len(parsed):
+        removed = len(parsed) - unique
+        header += f" ({removed} duplicate{'s' if removed > 1 else ''} removed)"
+    if len(ranked) < unique:
+        header += f", {len(ranked)} match the stated preferences"
+    header += f"; best {min(top_n, len(ranked))}:"
+    return "\n".join([header] + [option.line(i) for i, option in enumerate(ranked[:top_n], 1)])
+
+
+def reduced_tools(tools, top_n: int = 5):
+    """Return tools whose flight/hotel search output is reduced before the model sees it"""
+    kinds = {
+        name.replace(".", "_"): "hotels" if "Hotel" in name else "flights"
+        for name in SEARCH_TOOLS.values()
+    }
+    reduced = []
+    for tool in tools:
+        kind = kinds.get(getattr(tool, "name", ""))
+        if kind is None:
+            reduced.append(tool)
+            continue
+
+        async def reduced_invoke(ctx, arguments, _invoke=tool.on_invoke_tool, _kind=kind):
+            output = await _invoke(ctx, arguments)
+            try:
+                compact = reduce_payload(_kind, output, current_trip.get(), top_n)
+            except (TypeError, ValueError, AttributeError) as e:
+                logger.debug(f"Could not reduce {_kind} payload: {e}")
+                compact = None
+            if compact is None:
+                return output
+            logger.debug(f"Reduced {_kind} payload from {len(str(output))} to {len(compact)} chars")
+            return compact
+
+        reduced.append(dataclasses.replace(tool, on_invoke_tool=reduced_invoke))
+    return reduced
@@ -0,0 +1,133 @@
+"""
+Per-user request ordering with a bounded global worker pool
+"""
+import asyncio
+import logging
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, Optional
+
+from cache import TTLCache
+
+logger = logging.getLogger("flyme.scheduler")
+
+Job = Callable[[], Awaitable[None]]
+
+
+class RequestScheduler:
+    """Runs each user's requests in order under a global concurrency cap
+
+    Every user gets a FIFO of pending jobs drained by a single task, so two
+    quick messages from the same user never race on their conversation
+    history. Across users, at most max_workers jobs run at once; beyond
+    max_queued waiting jobs new work is shed instead of queued.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = 8,
+        max_queued: int = 100,
+        dedup_ttl: float = 600,
+        dedup_size: int = 10000,
+    ):
+        self.max_workers = max_workers
+        self.max_queued = max_queued
+        self._slots = asyncio.Semaphore(max_workers)
+        self._pending: Dict[str, Deque[Job]] = {}
+        self._runners: Dict[str, asyncio.Task] = {}
+        self._seen_events = TTLCache(ttl=dedup_ttl, max_size=dedup_size)
+        self.waiting = 0
+        self.active = 0
+        self.shed = 0
+        self.duplicates = 0
+        # Set by drain(); new jobs are refused while the process shuts down
+        self.draining = False
+
+    def is_duplicate(self, event_id: Optional[str]) -> bool:
+        """Record an event_id and report whether it was already seen"""
+        if not event_id:
+            return False
+        if event_id in self._seen_events:
+            self.duplicates += 1
+            return True
+        self._seen_events.set(event_id, True)
+        return False
+
+    def submit(self, user_id: str, job: Job) -> Optional[int]:
+        """Queue a job for a user
+
+        Returns 0 if the job starts right away, its position in line if it has
+        to wait, or None if the queue is full (or draining) and the job was dropped.
+        """
+        if self.draining:
+            self.shed += 1
+            return None
+
+        # Jobs not yet started that can't be covered by an idle worker
+        backlog = self.waiting - (self.max_workers - self.active)
+        if backlog >= self.max_queued:
+            self.shed += 1
+            return None
+
+        user_busy = user_id in self._runners
+        position = 0
+        if user_busy or backlog >= 0:
+            position = max(backlog, 0) + 1
+
+        self.waiting += 1
+        self._pending.setdefault(user_id, deque()).append(job)
+        if not user_busy:
+            task = asyncio.get_running_loop().create_task(self._drain_user(user_id))
+            self._runners[user_id] = task
+        return position
+
+    async def _drain_user(self, user_id: str):
+        queue = self._pending[user_id]
+        try:
+            while queue:
+                job = queue.popleft()
+                started = False
+                try:
+                    async with self._slots:
+                        self.waiting -= 1
+                        started = True
+                        self.active += 1
+                        try:
+                            await job()
+                        except Exception as e:
+                            logger.exception(f"Request for {user_id} failed: {e}")
+                        finally:
+                            self.active -= 1
+                finally:
+                    # A job cancelled while waiting for a worker stops counting as waiting
+                    if not started:
+                        self.waiting -= 1
+        finally:
+            # Anything left behind (cancellation) no longer counts as waiting
+            self.waiting -= len(queue)
+            self._pending.pop(user_id, None)
+            self._runners.pop(user_id, None)
+
+    async def drain(self, timeout: float) -> int:
+        """Refuse new jobs and wait up to timeout for queued and running ones
+
+        Returns how many users still had unfinished requests when time ran out.
+        """
+        self.draining = True
+        runners = list(self._runners.values())
+        if not runners:
+            return 0
+        _, unfinished = await asyncio.wait(runners, timeout=max(timeout, 0))
+        return len(unfinished)
+
+    @property
+    def depth(self) -> int:
+        """Jobs waiting for a worker"""
+        return self.waiting
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "active": self.active,
+            "waiting": self.waiting,
+            "shed": self.shed,
+            "duplicates": self.duplicates,
+        }
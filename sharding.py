@@ -0,0 +1,172 @@
+"""
+Consistent-hash routing of users to worker processes
+"""
+import asyncio
+import bisect
+import hashlib
+import json
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+logger = logging.getLogger("flyme.sharding")
+
+Handler = Callable[[Dict[str, Any]], Awaitable[None]]
+
+
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """Consistent hash ring; each node owns `replicas` points on the ring
+
+    Adding or removing a worker only moves the users whose points fall
+    between that worker's points and their neighbours.
+    """
+
+    def __init__(self, nodes: List[int], replicas: int = 100):
+        self.nodes = list(nodes)
+        points = sorted(
+            (_hash(f"worker-{node}-{i}"), node)
+            for node in self.nodes
+            for i in range(replicas)
+        )
+        self._points = [point for point, _ in points]
+        self._owners = [node for _, node in points]
+
+    def owner(self, key: str) -> int:
+        index = bisect.bisect(self._points, _hash(key)) % len(self._points)
+        return self._owners[index]
+
+
+class ShardRouter:
+    """Forwards events for users owned by another worker over localhost
+
+    Slack spreads events across all open Socket Mode connections, so any
+    worker may receive any user's message. Each worker listens on
+    base_port + index; an event for a user owned elsewhere is sent to the
+    owner as one line of JSON and handled there, which keeps every user's
+    requests (and conversation state) on one process.
+    """
+
+    def __init__(self, index: int, count: int, host: str = "127.0.0.1", base_port: int = 47200):
+        self.index = index
+        self.count = count
+        self.host = host
+        self.base_port = base_port
+        self.ring = HashRing(list(range(count)))
+        self.handlers: Dict[str, Handler] = {}
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._peers: Dict[int, Tuple[asyncio.StreamReader, asyncio.StreamWriter]] = {}
+        self._locks: Dict[int, asyncio.Lock] = {}
+        self._clients: Set[asyncio.StreamWriter] = set()
+        self.forwarded = 0
+        self.received = 0
+        self.fallbacks = 0
+
+    def owner(self, user_id: str) -> int:
+        return self.ring.owner(user_id)
+
+    def owns(self, user_id: str) -> bool:
+        return not user_id or self.owner(user_id) == self.index
+
+    def on(self, kind: str, handler: Handler):
+        """Register the handler for forwarded messages of one kind"""
+        self.handlers[kind] = handler
+
+    async def start(self):
+        self._server = await asyncio.start_server(
+            self._serve, self.host, self.base_port + self.index
+        )
+        logger.info(f"Worker {self.index}/{self.count} accepting forwarded events on port {self.base_port + self.index}")
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self._clients.add(writer)
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    message = json.loads(line)
+                except json.JSONDecodeError:
+                    logger.warning("Dropped malformed forwarded event")
+                    continue
+                # Acknowledge before handling so the sender isn't held up
+                writer.write(b"ok\n")
+                handler = self.handlers.get(message.get("kind"))
+                if handler is None:
+                    continue
+                self.received += 1
+                # Handled in arrival order; handlers only enqueue, so this stays fast
+                try:
+                    await handler(message)
+                except Exception as e:
+                    logger.error(f"Forwarded {message.get('kind')} failed: {e}")
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            self._clients.discard(writer)
+            writer.close()
+
+    async def forward(self, user_id: str, kind: str, message: Dict[str, Any]) -> bool:
+        """Send a message to the user's owning worker
+
+        Returns False when the owner can't be reached; the caller then
+        handles the event locally rather than dropping it.
+        """
+        owner = self.owner(user_id)
+        payload = (json.dumps(dict(message, kind=kind, user_id=user_id)) + "\n").encode()
+        lock = self._locks.setdefault(owner, asyncio.Lock())
+        async with lock:
+            # One retry with a fresh connection if the cached one went stale
+            for attempt in range(2):
+                try:
+                    reader, writer = await self._connection(owner)
+                    writer.write(payload)
+                    await writer.drain()
+                    # A write can succeed into a dying socket; only an ack counts
+                    if await asyncio.wait_for(reader.readline(), 2) != b"ok\n":
+                        raise ConnectionError("no acknowledgement")
+                    self.forwarded += 1
+                    return True
+                except (ConnectionError, OSError, asyncio.TimeoutError) as e:
+                    self._drop(owner)
+                    if attempt:
+                        logger.warning(f"Worker {owner} unreachable, handling {user_id} locally: {e}")
+        self.fallbacks += 1
+        return False
+
+    async def _connection(self, owner: int) -> Tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+        peer = self._peers.get(owner)
+        if peer is None or peer[1].is_closing():
+            peer = await asyncio.wait_for(
+                asyncio.open_connection(self.host, self.base_port + owner), 2
+            )
+            self._peers[owner] = peer
+        return peer
+
+    def _drop(self, owner: int):
+        peer = self._peers.pop(owner, None)
+        if peer is not None:
+            peer[1].close()
+
+    def stats(self):
+        return {
+            "worker": self.index,
+            "workers": self.count,
+            "forwarded": self.forwarded,
+            "received": self.received,
+            "fallbacks": self.fallbacks,
+        }
+
+    async def stop(self):
+        for owner in list(self._peers):
+            self._drop(owner)
+        if self._server:
+            self._server.close()
+            # Close accepted connections too, so peers see us gone right away
+            for writer in list(self._clients):
+                writer.close()
+            await self._server.wait_closed()
+            self._server = None
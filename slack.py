@@ -1,19 +1,153 @@
 import os
 import re
-from slack_bolt.async_app import AsyncApp
-from slack_bolt.adapter.socket_mode.async_handler import AsyncSocketModeHandler
+import asyncio
+import logging
+import time
+from constants import BOT_CONFIG, ERROR_MESSAGES
+from deadline import Deadline, current_deadline
+from metrics import REGISTRY
+from scheduler import RequestScheduler
+from streaming import SlackProgressMessage
+from watches import current_requester
 
-def create_slack_app():
-    """Create and configure the Slack app"""
-    return AsyncApp(token=os.getenv("SLACK_BOT_TOKEN"))
+def create_slack_app(transport=None):
+    """Create and configure the Slack app, on the shared transport if given"""
+    from slack_bolt.async_app import AsyncApp
+    token = os.getenv("SLACK_BOT_TOKEN")
+    if transport is None:
+        return AsyncApp(token=token)
+    return AsyncApp(token=token, client=transport.slack_client(token))
 
-def setup_slack_handlers(app, bot):
+def create_scheduler():
+    """Create the request scheduler from bot configuration"""
+    return RequestScheduler(
+        max_workers=BOT_CONFIG["max_concurrent_requests"],
+        max_queued=BOT_CONFIG["max_queued_requests"],
+        dedup_ttl=BOT_CONFIG["event_dedup_ttl"]
+    )
+
+async def process_request(bot, text, user_id, say, client=None, channel=None, received_at=None):
+    """Run a single flight or hotel request and post the result"""
+    if received_at is not None:
+        REGISTRY.observe_stage("queue_wait", time.perf_counter() - received_at)
+    
+    # Every stage below draws from one response_timeout budget
+    deadline = Deadline(BOT_CONFIG["response_timeout"])
+    token = current_deadline.set(deadline)
+    # Price watches created during this request belong to this user and channel
+    requester_token = current_requester.set((user_id, channel))
+    try:
+        async with REGISTRY.timed("request"):
+            # Get user location from profile
+            try:
+                async with REGISTRY.timed("profile_lookup"):
+                    user_location = await deadline.run(
+                        bot.get_user_location(user_id),
+                        fraction=BOT_CONFIG["profile_lookup_budget"]
+                    )
+            except asyncio.TimeoutError:
+                user_location = None
+            
+            # Stream progress into one edited message, or fall back to a typing indicator
+            progress = None
+            if BOT_CONFIG["stream_responses"] and client and channel:
+                progress = SlackProgressMessage(
+                    client,
+                    channel,
+                    min_interval=BOT_CONFIG["stream_update_interval"],
+                    outbound=bot.outbound
+                )
+                await progress.start()
+            else:
+                await say("I'm thinking...")
+            
+            # Flights or hotels, from the message's cues or the conversation so far
+            kind = bot.route(text, user_id)
+            
+            async with REGISTRY.timed("agent_run", kind=kind):
+                if kind == "hotels":
+                    result = await bot.search_hotels(text, user_id, user_location, progress=progress)
+                else:
+                    result = await bot.search_flights(text, user_id, user_location, progress=progress)
+            
+            # Send results
+            async with REGISTRY.timed("slack_send"):
+                if progress:
+                    await progress.finish(result)
+                elif bot.outbound and channel:
+                    await bot.outbound.send(channel, result)
+                else:
+                    await say(result)
+    finally:
+        current_requester.reset(requester_token)
+        current_deadline.reset(token)
+
+async def enqueue_request(scheduler, bot, body, text, user_id, say, client=None, channel=None):
+    """Hand a request to the scheduler, replying if it has to wait or is shed"""
+    # Slack redelivers events it thinks were missed; only run each one once
+    if scheduler.is_duplicate(body.get("event_id")):
+        REGISTRY.counter("flyme_duplicate_events_total", "Slack event retries dropped").inc()
+        return
+    
+    received_at = time.perf_counter()
+    event_time = body.get("event_time")
+    if event_time:
+        # How long Slack took to hand us the event
+        REGISTRY.observe_stage("event_delivery", max(0.0, time.time() - event_time))
+    
+    position = scheduler.submit(
+        user_id,
+        lambda: process_request(bot, text, user_id, say, client, channel, received_at)
+    )
+    if position is None:
+        REGISTRY.counter("flyme_shed_requests_total", "Requests dropped at the queue limit").inc()
+        await say(ERROR_MESSAGES["busy"])
+    elif position:
+        await say(f"You're #{position} in line - I'll get to your request shortly.")
+
+async def route_request(router, scheduler, bot, body, text, user_id, say, client=None, channel=None):
+    """Enqueue locally, or forward to the worker that owns this user"""
+    if router and not router.owns(user_id):
+        forwarded = await router.forward(user_id, "request", {
+            "text": text,
+            "channel": channel,
+            "event_id": body.get("event_id"),
+            "event_time": body.get("event_time"),
+        })
+        if forwarded:
+            return
+    await enqueue_request(scheduler, bot, body, text, user_id, say, client, channel)
+
+def setup_slack_handlers(app, bot, scheduler=None, router=None):
     """Set up all Slack event handlers"""
+    scheduler = scheduler or create_scheduler()
+    
+    if router:
+        async def handle_forwarded_request(message):
+            """Serve a request another worker received for one of our users"""
+            channel = message["channel"]
+            
+            async def say(text):
+                return await app.client.chat_postMessage(channel=channel, text=text)
+            
+            body = {"event_id": message.get("event_id"), "event_time": message.get("event_time")}
+            await enqueue_request(
+                scheduler, bot, body, message["text"], message["user_id"], say,
+                app.client, channel
+            )
+        
+        async def handle_forwarded_user_change(message):
+            if bot.profiles:
+                bot.profiles.update_from_user(message["user"])
+        
+        router.on("request", handle_forwarded_request)
+        router.on("user_change", handle_forwarded_user_change)
     
     @app.event("message")
-    async def handle_message_events(event, say, logger):
+    async def handle_message_events(event, body, say, client, logger):
         """Handle DM messages"""
-        logger.info(f"Message event received: {event}")
+        logger.debug(f"Message event received: {event}")
+        REGISTRY.events.inc(type="message")
         
         if event.get("bot_id"):
             return
@@ -21,52 +155,35 @@ def setup_slack_handlers(app, bot):
         channel_type = event.get("channel_type")
         
         if channel_type == "im":
-            user_message = event.get("text", "").lower()
             user_id = event.get("user", "")
             original_message = event.get("text", "")
-            
-            # Get user location from profile
-            user_location = await bot.get_user_location(user_id)
-            
-            # Send typing indicator
-            await say("I'm thinking...")
-            
-            # Determine if this is a hotel search request
-            hotel_keywords = ["hotel", "hotels", "accommodation", "stay", "booking", "room", "lodge", "resort"]
-            is_hotel_request = any(keyword in user_message for keyword in hotel_keywords)
-            
-            if is_hotel_request:
-                # Search hotels
-                result = await bot.search_hotels(original_message, user_id, user_location)
-            else:
-                # Search flights (existing functionality)
-                result = await bot.search_flights(original_message, user_id, user_location)
-            
-            # Send results
-            await say(result)
+            await route_request(
+                router, scheduler, bot, body, original_message, user_id, say,
+                client, event.get("channel")
+            )
 
     @app.event("app_mention")
-    async def handle_app_mention(event, say, logger):
+    async def handle_app_mention(event, body, say, client, logger):
         """Handle @mentions in channels"""
+        REGISTRY.events.inc(type="app_mention")
         user_message = event.get("text", "")
         user_id = event.get("user", "")
         user_message_clean = re.sub(r'<@[A-Z0-9]+>', '', user_message).strip()
-        
-        # Get user location from profile
-        user_location = await bot.get_user_location(user_id)
-        
-        await say("I'm thinking...")
-        
-        # Determine if this is a hotel search request
-        hotel_keywords = ["hotel", "hotels", "accommodation", "stay", "booking", "room", "lodge", "resort"]
-        is_hotel_request = any(keyword in user_message_clean.lower() for keyword in hotel_keywords)
-        
-        if is_hotel_request:
-            result = await bot.search_hotels(user_message_clean, user_id, user_location)
-        else:
-            result = await bot.search_flights(user_message_clean, user_id, user_location)
-        
-        await say(result)
+        await route_request(
+            router, scheduler, bot, body, user_message_clean, user_id, say,
+            client, event.get("channel")
+        )
+
+    # Keep cached timezones current when users edit their profile
+    @app.event("user_change")
+    async def handle_user_change(event, logger):
+        """Refresh the cached profile for an edited user"""
+        user = event.get("user", {})
+        if router and not router.owns(user.get("id", "")):
+            if await router.forward(user.get("id", ""), "user_change", {"user": user}):
+                return
+        if bot.profiles:
+            bot.profiles.update_from_user(user)
 
     # Handle app_home_opened events to prevent warnings
     @app.event("app_home_opened")
@@ -83,13 +200,16 @@ def setup_slack_handlers(app, bot):
 
 async def create_socket_handler(app):
     """Create and configure Socket Mode handler"""
+    from slack_bolt.adapter.socket_mode.async_handler import AsyncSocketModeHandler
     handler = AsyncSocketModeHandler(app, os.getenv("SLACK_APP_TOKEN"))
     
     # Add connection handler to confirm Socket Mode is working
     @handler.client.socket_mode_request_listeners.append
     async def handle_socket_mode_request(client, request):
         if request.type == "events_api":
-            print(f"Event received: {request.payload.get('event', {}).get('type', 'unknown')}")
+            logging.getLogger("flyme.slack").debug(
+                f"Event received: {request.payload.get('event', {}).get('type', 'unknown')}"
+            )
     
     return handler
     
@@ -0,0 +1,112 @@
+"""
+On-disk snapshot of conversations and caches, handed from one process to the next
+"""
+import json
+import logging
+import os
+import time
+from typing import Optional
+
+from conversation import Turn
+
+logger = logging.getLogger("flyme.snapshot")
+
+SNAPSHOT_VERSION = 1
+
+
+def _serializable(value) -> bool:
+    try:
+        json.dumps(value)
+    except (TypeError, ValueError):
+        return False
+    return True
+
+
+class StateSnapshot:
+    """JSON file holding the in-memory state a restart would otherwise lose
+
+    A draining process saves its conversation windows, trip facts, running
+    summaries and cached search results and answers. The next process restores them
+    at startup, or, when it replaces a running instance, once that instance
+    has exited. Restored turns are merged with any the new process already
+    has, cache entries keep only the TTL they had left, and the file is
+    removed once it has been read so a later restart can't replay it.
+    """
+
+    def __init__(self, path: str, max_age: float = 600):
+        self.path = path
+        self.max_age = max_age
+
+    def save(self, bot) -> bool:
+        """Write the bot's conversations and caches; False if the file couldn't be written"""
+        conversations = bot.conversation_history.snapshot()
+        data = {
+            "version": SNAPSHOT_VERSION,
+            "saved_at": time.time(),
+            "conversations": {
+                uid: [[turn.role, turn.content, turn.ts] for turn in turns]
+                for uid, turns in conversations.items()
+            },
+            "contexts": bot.context.snapshot(),
+            # Results the tools returned as non-JSON objects are simply not carried over
+            "tool_cache": [entry for entry in bot.tool_cache.entries() if _serializable(entry[2])],
+            "answer_cache": bot.answer_cache.entries(),
+        }
+        directory = os.path.dirname(self.path)
+        # Write then rename so the next process never reads a half-written snapshot
+        tmp_path = f"{self.path}.tmp"
+        try:
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(tmp_path, "w") as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.warning(f"Could not write state snapshot {self.path}: {e}")
+            return False
+        logger.info(
+            f"Saved state snapshot: {len(conversations)} conversations, "
+            f"{len(data['tool_cache'])} search results, {len(data['answer_cache'])} answers"
+        )
+        return True
+
+    def _read(self) -> Optional[dict]:
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable state snapshot {self.path}: {e}")
+            return None
+        finally:
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+        if data.get("version") != SNAPSHOT_VERSION:
+            logger.info("State snapshot is from a different version; starting fresh")
+            return None
+        if time.time() - data.get("saved_at", 0) > self.max_age:
+            logger.info("State snapshot is too old; starting fresh")
+            return None
+        return data
+
+    def restore(self, bot) -> bool:
+        """Load a snapshot left by the previous process, if there is a recent one"""
+        data = self._read()
+        if data is None:
+            return False
+        age = max(0.0, time.time() - data["saved_at"])
+        conversations = data.get("conversations", {})
+        for uid, turns in conversations.items():
+            bot.conversation_history.merge(uid, [Turn(role, content, ts) for role, content, ts in turns])
+        for uid, saved in data.get("contexts", {}).items():
+            # Turns this process recorded itself (while both ran) update the saved facts
+            known = {ts for _, _, ts in conversations.get(uid, ())}
+            newer = [turn for turn in bot.conversation_history.history(uid) if turn.ts not in known]
+            bot.context.restore(uid, saved, newer)
+        bot.tool_cache.restore(data.get("tool_cache", []), age)
+        bot.answer_cache.restore(data.get("answer_cache", []), age)
+        logger.info(f"Restored state snapshot from {age:.0f}s ago: {len(conversations)} conversations")
+        return True
@@ -0,0 +1,139 @@
+"""
+Progressive Slack message updates for streamed agent runs
+"""
+import asyncio
+import logging
+import time
+from typing import Optional
+
+from profiles import slack_retry_after
+
+logger = logging.getLogger("flyme.streaming")
+
+# Slack rejects chat.update text beyond this; final answers are split by outbound.py
+MAX_UPDATE_CHARS = 3900
+
+
+def describe_tool(tool_name: str) -> str:
+    """Human-readable status line for a tool call"""
+    name = (tool_name or "").lower()
+    if "hotel" in name:
+        return "Searching hotels..."
+    if "flight" in name:
+        return "Searching flights..."
+    return "Looking that up..."
+
+
+class SlackProgressMessage:
+    """A single Slack message edited in place as the agent works
+
+    Edits are coalesced: every token or tool event marks the message dirty and
+    at most one chat.update is sent per min_interval, which keeps a streamed
+    run well inside chat.update's rate limit.
+    """
+
+    def __init__(
+        self,
+        client,
+        channel: str,
+        thread_ts: Optional[str] = None,
+        min_interval: float = 1.2,
+        placeholder: str = "I'm thinking...",
+        outbound=None,
+    ):
+        self.client = client
+        self.channel = channel
+        self.thread_ts = thread_ts
+        self.min_interval = min_interval
+        self.placeholder = placeholder
+        # Final answers go through the outbound queue (split, Block Kit, retried) when given
+        self.outbound = outbound
+        self.ts: Optional[str] = None
+        self.text = ""
+        self.status = placeholder
+        self._last_sent = ""
+        self._last_update = 0.0
+        self._flush_task: Optional[asyncio.Task] = None
+        self._closed = False
+
+    async def start(self):
+        """Post the placeholder message that later edits replace"""
+        response = await self.client.chat_postMessage(
+            channel=self.channel,
+            text=self.placeholder,
+            thread_ts=self.thread_ts
+        )
+        self.ts = response["ts"]
+        self._last_sent = self.placeholder
+        self._last_update = time.monotonic()
+
+    def on_turn_start(self):
+        """A new model turn begins; text from the previous turn is superseded"""
+        self.text = ""
+
+    def on_text(self, delta: str):
+        self.text += delta
+        self._schedule()
+
+    def on_tool_start(self, tool_name: str):
+        self.status = describe_tool(tool_name)
+        self._schedule()
+
+    def render(self) -> str:
+        if not self.text:
+            return self.status
+        text = self.text
+        if len(text) > MAX_UPDATE_CHARS:
+            text = text[:MAX_UPDATE_CHARS] + "..."
+        return text
+
+    def _schedule(self):
+        if self._closed or not self.ts or self._flush_task:
+            return
+        self._flush_task = asyncio.get_running_loop().create_task(self._flush_later())
+
+    async def _flush_later(self):
+        try:
+            delay = self._last_update + self.min_interval - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            await self._update(self.render())
+        finally:
+            self._flush_task = None
+
+    async def _update(self, text: str):
+        if text == self._last_sent:
+            return
+        try:
+            await self.client.chat_update(channel=self.channel, ts=self.ts, text=text)
+            self._last_sent = text
+        except Exception as e:
+            # Back off on rate limiting; the next flush carries the latest text
+            retry_after = slack_retry_after(e)
+            if retry_after:
+                self.min_interval = max(self.min_interval, retry_after)
+            logger.debug(f"Progress update failed: {e}")
+        finally:
+            self._last_update = time.monotonic()
+
+    async def finish(self, final_text: str):
+        """Replace the progress message with the final answer"""
+        self._closed = True
+        if self._flush_task:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+        if self.outbound is not None:
+            await self.outbound.send(self.channel, final_text, thread_ts=self.thread_ts, ts=self.ts)
+            return
+        if not self.ts:
+            await self.client.chat_postMessage(
+                channel=self.channel,
+                text=final_text,
+                thread_ts=self.thread_ts
+            )
+            return
+        await self.client.chat_update(channel=self.channel, ts=self.ts, text=final_text)
+
@@ -0,0 +1,107 @@
+"""
+Supervisor that runs FlyMe as several sharded worker processes
+"""
+import asyncio
+import logging
+import os
+import signal
+import sys
+import time
+from typing import Dict, List, Optional
+
+from config import Config
+from constants import BOT_CONFIG
+from graceful import GracefulShutdown
+
+logger = logging.getLogger("flyme.supervisor")
+
+# Slack allows at most 10 concurrent Socket Mode connections per app
+MAX_WORKERS = 10
+
+
+class Supervisor:
+    """Starts one worker process per shard and restarts any that exit
+
+    Each worker is this same program with FLYME_WORKER_INDEX set, so it
+    opens its own Socket Mode connection and serves the users that hash to
+    its index. Workers share conversation history through the SQLite file
+    in CONVERSATION_DB.
+    """
+
+    def __init__(self, config: Config, workers: int, restart_delay: float = 1.0, max_restart_delay: float = 30.0):
+        self.config = config
+        self.workers = min(workers, MAX_WORKERS)
+        self.restart_delay = restart_delay
+        self.max_restart_delay = max_restart_delay
+        self.processes: Dict[int, asyncio.subprocess.Process] = {}
+        self.restarts = 0
+        self._stopping = False
+        self.shutdown = GracefulShutdown()
+        if workers > MAX_WORKERS:
+            logger.warning(f"Capping workers at {MAX_WORKERS} (Slack Socket Mode connection limit)")
+
+    def _worker_env(self, index: int) -> Dict[str, str]:
+        env = dict(os.environ)
+        env["FLYME_WORKER_INDEX"] = str(index)
+        env["FLYME_WORKERS"] = str(self.workers)
+        # History must be shared so a worker restart (or resharding) keeps context
+        env["CONVERSATION_DB"] = self.config.conversation_db or "flyme_conversations.db"
+        return env
+
+    async def _spawn(self, index: int) -> asyncio.subprocess.Process:
+        process = await asyncio.create_subprocess_exec(
+            sys.executable, os.path.abspath(sys.argv[0]),
+            env=self._worker_env(index)
+        )
+        self.processes[index] = process
+        logger.info(f"Started worker {index} (pid {process.pid})")
+        return process
+
+    async def _watch(self, index: int):
+        """Keep worker `index` running, backing off if it crashes repeatedly"""
+        delay = self.restart_delay
+        while not self._stopping:
+            started = time.monotonic()
+            process = await self._spawn(index)
+            code = await process.wait()
+            if self._stopping:
+                break
+            # A worker that ran for a while gets restarted promptly
+            if time.monotonic() - started > self.max_restart_delay:
+                delay = self.restart_delay
+            logger.warning(f"Worker {index} exited with {code}; restarting in {delay:.0f}s")
+            self.restarts += 1
+            await asyncio.sleep(delay)
+            delay = min(self.max_restart_delay, delay * 2)
+
+    async def stop_workers(self, timeout: Optional[float] = None):
+        """Ask every worker to shut down gracefully, killing stragglers"""
+        # Workers drain in-flight requests before exiting
+        timeout = BOT_CONFIG["drain_timeout"] + 10.0 if timeout is None else timeout
+        self._stopping = True
+        running = [p for p in self.processes.values() if p.returncode is None]
+        for process in running:
+            process.send_signal(signal.SIGTERM)
+        try:
+            await asyncio.wait_for(
+                asyncio.gather(*(p.wait() for p in running)), timeout
+            )
+        except asyncio.TimeoutError:
+            for process in running:
+                if process.returncode is None:
+                    process.kill()
+
+    async def run(self):
+        logger.info(f"Supervisor starting {self.workers} workers")
+        self.shutdown.add_handler(self.stop_workers)
+        self.shutdown.setup_signal_handlers()
+        watchers: List[asyncio.Task] = [
+            asyncio.create_task(self._watch(index)) for index in range(self.workers)
+        ]
+        try:
+            await self.shutdown.wait_for_shutdown()
+        finally:
+            await self.shutdown.shutdown()
+            for task in watchers:
+                task.cancel()
+            await asyncio.gather(*watchers, return_exceptions=True)
@@ -0,0 +1,20 @@
+import os
+import sys
+import types
+
+import pytest
+
+# The modules live at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def agents_sdk(monkeypatch):
+    """The agents SDK, or just the RunContextWrapper background searches build when it isn't installed"""
+    try:
+        import agents
+    except ImportError:
+        agents = types.ModuleType("agents")
+        agents.RunContextWrapper = lambda context: types.SimpleNamespace(context=context)
+        monkeypatch.setitem(sys.modules, "agents", agents)
+    return agents
@@ -0,0 +1,96 @@
+import asyncio
+
+import pytest
+
+from cache import ToolResultCache
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_coalesced_waiter_survives_owner_cancellation():
+    async def scenario():
+        cache = ToolResultCache()
+        calls = []
+
+        async def fetcher():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return "result"
+
+        owner = asyncio.create_task(cache.fetch("Search", {"a": 1}, fetcher))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(cache.fetch("Search", {"a": 1}, fetcher))
+        await asyncio.sleep(0.01)
+        owner.cancel()
+        assert await waiter == "result"
+        with pytest.raises(asyncio.CancelledError):
+            await owner
+        assert len(calls) == 1
+        assert cache.stats()["coalesced"] == 1
+        # The shared result was cached
+        assert await cache.fetch("Search", {"a": 1}, fetcher) == "result"
+        assert len(calls) == 1
+
+    run(scenario())
+
+
+def test_search_cancelled_when_every_caller_gives_up():
+    async def scenario():
+        cache = ToolResultCache()
+        cancelled = asyncio.Event()
+
+        async def fetcher():
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        callers = [asyncio.create_task(cache.fetch("Search", {"a": 1}, fetcher)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        for caller in callers:
+            caller.cancel()
+        await asyncio.gather(*callers, return_exceptions=True)
+        await asyncio.wait_for(cancelled.wait(), 1)
+        assert not cache.has("Search", {"a": 1})
+
+        async def fresh():
+            return "fresh"
+
+        assert await cache.fetch("Search", {"a": 1}, fresh) == "fresh"
+
+    run(scenario())
+
+
+def test_errors_are_shared_but_not_cached():
+    async def scenario():
+        cache = ToolResultCache()
+
+        async def failing():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("upstream down")
+
+        results = await asyncio.gather(
+            cache.fetch("Search", {"a": 1}, failing),
+            cache.fetch("Search", {"a": 1}, failing),
+            return_exceptions=True,
+        )
+        assert all(isinstance(r, RuntimeError) for r in results)
+        assert not cache.has("Search", {"a": 1})
+
+    run(scenario())
+
+
+def test_arguments_are_normalized():
+    async def scenario():
+        cache = ToolResultCache()
+
+        async def fetcher():
+            return "ok"
+
+        await cache.fetch("Search", {"code": "SFO ", "date": "2026-11-03"}, fetcher)
+        assert cache.has("Search", '{"date": "2026-11-03", "code": "sfo"}')
+
+    run(scenario())
@@ -0,0 +1,88 @@
+import asyncio
+import dataclasses
+import json
+import os
+from typing import Any, Callable
+
+from constants import ERROR_MESSAGES
+from deadline import Deadline, bound_tools, current_deadline
+from reducers import reduced_tools
+
+PAYLOADS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks", "payloads.json")
+
+
+@dataclasses.dataclass
+class FakeTool:
+    name: str
+    on_invoke_tool: Callable[[Any, str], Any]
+
+
+def flight_tool(delay=0.0):
+    with open(PAYLOADS) as f:
+        payload = json.load(f)["flights"]
+
+    async def invoke(ctx, arguments):
+        await asyncio.sleep(delay)
+        return json.dumps(payload)
+
+    return FakeTool("Search_SearchOneWayFlights", invoke), payload
+
+
+def wrapped(tools):
+    # Same order as FlyMeBot._wrap_tools
+    return reduced_tools(bound_tools(tools, tool_timeout=5), 5)
+
+
+ARGS = json.dumps({"departure_airport_code": "JFK", "arrival_airport_code": "LAX", "outbound_date": "2026-11-03"})
+
+
+def test_partial_response_quotes_the_raw_payload_price():
+    async def scenario():
+        raw, payload = flight_tool()
+        tool = wrapped([raw])[0]
+        deadline = Deadline(5)
+        current_deadline.set(deadline)
+        output = await tool.on_invoke_tool(None, ARGS)
+        # The model still gets the reduced text
+        assert output != json.dumps(payload)
+        answer = deadline.partial_response(ERROR_MESSAGES["timeout"], ERROR_MESSAGES["timeout_partial"])
+        assert answer.startswith("• JFK → LAX (2026-11-03): from $")
+        assert ERROR_MESSAGES["timeout_partial"] in answer
+
+    asyncio.run(scenario())
+
+
+def test_nothing_finished_gives_the_timeout_message():
+    async def scenario():
+        raw, _ = flight_tool(delay=1)
+        tool = wrapped([raw])[0]
+        deadline = Deadline(0.05)
+        current_deadline.set(deadline)
+        output = await tool.on_invoke_tool(None, ARGS)
+        assert "timed out" in output
+        answer = deadline.partial_response(ERROR_MESSAGES["timeout"], ERROR_MESSAGES["timeout_partial"])
+        assert answer == ERROR_MESSAGES["timeout"]
+
+    asyncio.run(scenario())
+
+
+def test_streamed_text_wins_over_tool_results():
+    deadline = Deadline(5)
+    deadline.text = "Here are some options"
+    answer = deadline.partial_response("timeout", "partial")
+    assert answer == "Here are some options\n\n_partial_"
+
+
+def test_used_tool_records_completed_calls():
+    async def scenario():
+        async def watch(ctx, arguments):
+            return "Watch #1 created."
+
+        tool = bound_tools([FakeTool("FlyMe_PriceWatch", watch)], tool_timeout=5)[0]
+        deadline = Deadline(5)
+        current_deadline.set(deadline)
+        assert not deadline.used_tool("FlyMe_PriceWatch")
+        await tool.on_invoke_tool(None, json.dumps({"action": "list"}))
+        assert deadline.used_tool("FlyMe_PriceWatch")
+
+    asyncio.run(scenario())
@@ -0,0 +1,81 @@
+from datetime import date
+
+import pytest
+
+from fastpath import parse_query, route_kind
+
+TODAY = date(2026, 10, 18)
+
+
+@pytest.mark.parametrize("text, previous, kind", [
+    ("Can you find a hotel in Chicago?", None, "hotels"),
+    ("I need a double room in Lisbon", None, "hotels"),
+    ("Any rooms for 2 in Lisbon?", None, "hotels"),
+    ("Find me flights from JFK to LAX", None, "flights"),
+    ("I need flights and a hotel in Miami", None, "flights"),
+    ("What about returning 2026-11-08?", "hotels", "hotels"),
+    ("What about returning 2026-11-08?", None, "flights"),
+    ("JFK to LAX 2026-11-03 returning 2026-11-06, is there room for a carry-on?", None, "flights"),
+    ("Boston to Chicago Nov 3 back Nov 6, staying at my sister's", None, "flights"),
+    ("Boston to Chicago Nov 3 back Nov 6", "hotels", "flights"),
+])
+def test_route_kind(text, previous, kind):
+    assert route_kind(text, previous) == kind
+
+
+def test_complete_flight_search_takes_the_fast_path():
+    query = parse_query("JFK to LAX 2026-11-03 one way", "flights", TODAY)
+    assert query.tool == "Search_SearchOneWayFlights"
+    assert query.args == {
+        "departure_airport_code": "JFK", "arrival_airport_code": "LAX", "outbound_date": "2026-11-03",
+    }
+
+
+def test_incidental_or_keeps_the_fast_path():
+    query = parse_query("JFK to LAX 2026-11-03 one way, window or aisle seat", "flights", TODAY)
+    assert query is not None
+
+
+@pytest.mark.parametrize("text", [
+    "JFK or EWR to LAX 2026-11-03 one way",
+    "JFK to LAX 2026-11-03 or 2026-11-04 one way",
+    "compare JFK to LAX 2026-11-03 one way",
+    "JFK to LAX 2026-11-03",
+    "NYC to LAX 2026-11-03 one way",
+    "JFK to LAX next month",
+])
+def test_open_ended_or_incomplete_goes_to_the_agent(text):
+    assert parse_query(text, "flights", TODAY) is None
+
+
+def test_complete_hotel_search_takes_the_fast_path():
+    query = parse_query("hotel in Paris Nov 3 to Nov 6 for 2 guests", "hotels", TODAY)
+    assert query.tool == "Search_GoogleHotels"
+    assert query.args == {"location": "Paris", "checkin_date": "2026-11-03", "checkout_date": "2026-11-06", "guests": 2}
+
+
+@pytest.mark.parametrize("text", [
+    "hotel in Springfield Nov 3 to Nov 6",
+    "hotels in Lisbon Nov 3",
+    "hotel in Lisbon or Porto Nov 3 to Nov 6",
+])
+def test_unknown_or_incomplete_hotel_goes_to_the_agent(text):
+    assert parse_query(text, "hotels", TODAY) is None
+
+
+def test_room_for_luggage_is_a_flight_search():
+    text = "JFK to LAX 2026-11-03 returning 2026-11-06, is there room for a carry-on?"
+    query = parse_query(text, route_kind(text), TODAY)
+    assert query.tool == "Search_SearchRoundtripFlights"
+    assert query.args["arrival_airport_code"] == "LAX"
+
+
+@pytest.mark.parametrize("text", [
+    "JFK to LAX 2026-11-03 returning 2026-11-06, is there room for a carry-on?",
+    "Boston to Chicago Nov 3 back Nov 6, staying at my sister's",
+    "Boston to Chicago Nov 3 back Nov 6, hotel near the airport",
+])
+def test_a_route_is_never_a_hotel_search(text):
+    assert parse_query(text, "hotels", TODAY) is None
+    query = parse_query(text, route_kind(text), TODAY)
+    assert query is None or query.kind == "flights"
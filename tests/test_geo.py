@@ -0,0 +1,88 @@
+import pytest
+
+from geo import _RadixTrie, geo_index, resolve_trip_places
+
+
+def test_trie_splits_edges_and_finds_every_key():
+    trie = _RadixTrie()
+    for value, key in enumerate(["san francisco", "san jose", "santa ana", "san"]):
+        trie.insert(key, value)
+    assert trie.size == 4
+    assert [trie.get(key) for key in ["san francisco", "san jose", "santa ana", "san"]] == [0, 1, 2, 3]
+    assert trie.get("sa") is None
+    assert trie.get("san j") is None
+    assert trie.get("san franciscos") is None
+    trie.insert("san jose", 9)
+    assert (trie.size, trie.get("san jose")) == (4, 9)
+
+
+def test_trie_completes_prefixes_in_key_order():
+    trie = _RadixTrie()
+    for value, key in enumerate(["san jose", "san francisco", "santa ana", "seattle"]):
+        trie.insert(key, value)
+    assert trie.complete("san ") == [1, 0]
+    assert sorted(trie.complete("sa")) == [0, 1, 2]
+    assert trie.complete("san fx") == []
+    assert trie.complete("san", limit=1) == [1]
+
+
+def test_trie_matches_whole_words_only():
+    trie = _RadixTrie()
+    trie.insert("new york", 0)
+    trie.insert("new york city", 1)
+    text = "new york city trip"
+    assert list(trie.matches(text, 0)) == [(8, 0), (13, 1)]
+    assert list(trie.matches("newark", 0)) == []
+
+
+@pytest.mark.parametrize("name, kind, codes", [
+    ("NYC", "metro", ("JFK", "EWR", "LGA")),
+    ("the Bay Area", "metro", ("SFO", "OAK", "SJC")),
+    ("JFK", "airport", ("JFK",)),
+    ("Charles de Gaulle", "airport", ("CDG",)),
+    ("paris", "metro", ("CDG", "ORY")),
+    ("Manchester", "city", ("MAN",)),
+])
+def test_lookup_resolves_codes_names_and_aliases(name, kind, codes):
+    place = geo_index().lookup(name)
+    assert (place.kind, place.codes) == (kind, codes)
+
+
+def test_lookup_misses_unknown_places():
+    assert geo_index().lookup("Springfield") is None
+
+
+def roles(text):
+    return [(role, place.codes) for role, place in geo_index().find_places(text)]
+
+
+def test_places_are_tagged_with_their_role():
+    assert roles("JFK to LAX") == [("origin", ("JFK",)), ("destination", ("LAX",))]
+    assert roles("flights to Paris from London") == [
+        ("destination", ("CDG", "ORY")), ("origin", ("LHR", "LGW", "STN", "LTN", "LCY")),
+    ]
+    assert roles("a hotel in San Francisco") == [("location", ("SFO",))]
+
+
+def test_longest_name_wins():
+    assert [place.name for _, place in geo_index().find_places("fly to New York City")] == ["New York City"]
+
+
+@pytest.mark.parametrize("text", [
+    "la la land",
+    "a nice hotel",
+    "flights to jfk",
+])
+def test_lowercase_short_keys_and_ambiguous_words_are_not_places(text):
+    assert roles(text) == []
+
+
+def test_capitalized_short_keys_and_ambiguous_words_are_places():
+    assert roles("LA to Nice") == [("origin", ("LAX", "SNA", "BUR", "LGB", "ONT")), ("destination", ("NCE",))]
+
+
+def test_resolve_trip_places_names_airports_and_hubs():
+    line = resolve_trip_places("flights to Paris", tz="America/New_York")
+    assert line.startswith("Resolved places: destination Paris (CDG, ORY).")
+    assert "Main airports in the user's timezone (America/New_York): JFK, EWR" in line
+    assert resolve_trip_places("what's the weather like") == ""
@@ -0,0 +1,73 @@
+import asyncio
+import time
+
+from outbound import OutboundQueue, render_blocks, split_message
+
+
+class FakeSlack:
+    def __init__(self):
+        self.posted = []
+        self.updated = []
+
+    async def chat_postMessage(self, channel, text="", **kwargs):
+        self.posted.append((time.monotonic(), channel, text))
+        return {"ok": True, "ts": str(len(self.posted))}
+
+    async def chat_update(self, channel, ts, text="", **kwargs):
+        self.updated.append((channel, ts, text))
+        return {"ok": True, "ts": ts}
+
+
+def test_channel_pacing_survives_idle_queues():
+    async def scenario():
+        slack = FakeSlack()
+        queue = OutboundQueue(slack, post_rate=10, post_burst=1, blocks=False)
+        started = time.monotonic()
+        for n in range(6):
+            # Each send drains the channel's queue before the next one arrives
+            await queue.send("C1", f"reply {n}")
+            await asyncio.sleep(0.01)
+        elapsed = time.monotonic() - started
+        assert len(slack.posted) == 6
+        # One token up front, then 10 per second
+        assert elapsed >= 0.45
+
+    asyncio.run(scenario())
+
+
+def test_channels_are_paced_independently():
+    async def scenario():
+        slack = FakeSlack()
+        queue = OutboundQueue(slack, post_rate=1, post_burst=1, blocks=False)
+        started = time.monotonic()
+        await asyncio.gather(*(queue.send(f"C{n}", "hi") for n in range(5)))
+        assert time.monotonic() - started < 0.5
+        assert queue.stats()["channels"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_long_replies_are_split_in_order():
+    async def scenario():
+        slack = FakeSlack()
+        queue = OutboundQueue(slack, post_rate=100, post_burst=10, max_chars=100, blocks=False)
+        text = "\n\n".join(f"*{n}. Option {n} - ${n}00*\n• Details {'x' * 40}" for n in range(1, 6))
+        await queue.send("C1", text, ts="1")
+        assert slack.updated[0][1] == "1"
+        parts = [slack.updated[0][2]] + [text for _, _, text in slack.posted]
+        assert "\n\n".join(parts) == text
+
+    asyncio.run(scenario())
+
+
+def test_split_message_respects_limit():
+    text = "\n".join(f"line {n} " + "y" * 30 for n in range(50))
+    chunks = split_message(text, 200)
+    assert all(len(chunk) <= 200 for chunk in chunks)
+    assert "".join(chunks).replace("\n", "") == text.replace("\n", "")
+
+
+def test_render_blocks_only_for_results():
+    assert render_blocks("When are you flying back?") is None
+    blocks = render_blocks("*1. Delta - $420*\n• Departs: 08:00\n\n_Found 1 flights._")
+    assert [block["type"] for block in blocks] == ["section", "context"]
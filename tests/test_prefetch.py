@@ -0,0 +1,125 @@
+import asyncio
+import dataclasses
+import json
+from datetime import date, timedelta
+from typing import Any, Callable
+
+from fanout import search_request
+from prefetch import SearchPrefetcher
+from trip import TripFacts
+from watches import current_requester
+
+DEPART = date.today() + timedelta(days=30)
+ONE_WAY, _ = search_request("flights", "JFK", "LAX", DEPART)
+ROUND_TRIP, _ = search_request("flights", "JFK", "LAX", DEPART, DEPART + timedelta(days=7))
+
+
+class StubSearch:
+    """Search tool that records its calls and answers once released"""
+
+    def __init__(self, name):
+        self.name = name
+        self.calls = []
+        self.cancelled = 0
+        self.release = asyncio.Event()
+
+    async def on_invoke_tool(self, ctx, arguments):
+        self.calls.append(json.loads(arguments))
+        try:
+            await self.release.wait()
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        return {"searched": self.name, "price": 199}
+
+
+@dataclasses.dataclass
+class Tool:
+    """The two FunctionTool fields wrap_tools uses"""
+    name: str
+    on_invoke_tool: Callable[..., Any]
+
+
+def flight_facts(return_days=None):
+    facts = TripFacts()
+    facts.kind = "flights"
+    facts.origin, facts.destination = "JFK", "LAX"
+    facts.depart_date = DEPART
+    if return_days is not None:
+        facts.return_date = DEPART + timedelta(days=return_days)
+    return facts
+
+
+def setup():
+    tools = [StubSearch(ONE_WAY), StubSearch(ROUND_TRIP)]
+    prefetcher = SearchPrefetcher(max_per_user=3)
+    prefetcher.bind(tools)
+    return prefetcher, {tool.name: tool for tool in tools}
+
+
+def test_guesses_ruled_out_by_new_facts_are_cancelled_and_counted(agents_sdk):
+    async def scenario():
+        prefetcher, tools = setup()
+        prefetcher.update("U1", "flights", flight_facts())
+        await asyncio.sleep(0)
+        assert prefetcher.stats()["started"] == 3
+        assert len(tools[ROUND_TRIP].calls) == 2 and len(tools[ONE_WAY].calls) == 1
+
+        # The user picks a 7-day round trip: that guess stays, the others go
+        prefetcher.update("U1", "flights", flight_facts(return_days=7))
+        await asyncio.sleep(0)
+        assert prefetcher.stats() == {"started": 3, "hits": 0, "wasted": 2, "pending": 1}
+        assert tools[ONE_WAY].cancelled == 1
+        assert tools[ROUND_TRIP].cancelled == 1
+        for tool in tools.values():
+            tool.release.set()
+
+    asyncio.run(scenario())
+
+
+def test_matching_call_from_the_same_user_awaits_the_prefetch(agents_sdk):
+    async def scenario():
+        prefetcher, tools = setup()
+        fallback = StubSearch(ROUND_TRIP)
+        fallback.release.set()
+        (wrapped,) = prefetcher.wrap_tools([Tool(ROUND_TRIP, fallback.on_invoke_tool)])
+        prefetcher.update("U1", "flights", flight_facts())
+        await asyncio.sleep(0)
+        arguments = json.dumps(tools[ROUND_TRIP].calls[0])
+
+        current_requester.set(("U1", None))
+        call = asyncio.ensure_future(wrapped.on_invoke_tool(None, arguments))
+        await asyncio.sleep(0)
+        assert not call.done()
+        tools[ROUND_TRIP].release.set()
+        assert (await call)["price"] == 199
+        assert fallback.calls == []
+        assert prefetcher.stats()["hits"] == 1
+
+        # Served once, then counted neither as a hit again nor as wasted
+        await wrapped.on_invoke_tool(None, arguments)
+        prefetcher.update("U1", "flights", TripFacts())
+        assert (prefetcher.hits, prefetcher.wasted) == (1, 2)
+        tools[ONE_WAY].release.set()
+
+    asyncio.run(scenario())
+
+
+def test_another_users_prefetch_is_never_served(agents_sdk):
+    async def scenario():
+        prefetcher, tools = setup()
+        fallback = StubSearch(ROUND_TRIP)
+        fallback.release.set()
+        (wrapped,) = prefetcher.wrap_tools([Tool(ROUND_TRIP, fallback.on_invoke_tool)])
+        prefetcher.update("U1", "flights", flight_facts())
+        await asyncio.sleep(0)
+        arguments = json.dumps(tools[ROUND_TRIP].calls[0])
+
+        current_requester.set(("U2", None))
+        await wrapped.on_invoke_tool(None, arguments)
+        assert fallback.calls == [json.loads(arguments)]
+        assert prefetcher.stats()["hits"] == 0
+        for tool in tools.values():
+            tool.release.set()
+
+    asyncio.run(scenario())
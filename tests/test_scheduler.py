@@ -0,0 +1,54 @@
+import asyncio
+
+from scheduler import RequestScheduler
+
+
+def test_cancelled_jobs_stop_counting_as_waiting():
+    async def scenario():
+        scheduler = RequestScheduler(max_workers=1, max_queued=10)
+        release = asyncio.Event()
+
+        async def blocking():
+            await release.wait()
+
+        async def quick():
+            pass
+
+        scheduler.submit("U1", blocking)
+        scheduler.submit("U2", quick)
+        scheduler.submit("U2", quick)
+        await asyncio.sleep(0.01)
+        assert scheduler.active == 1
+        assert scheduler.depth == 2
+
+        # U2's runner is cancelled while its first job waits for the only worker
+        scheduler._runners["U2"].cancel()
+        await asyncio.sleep(0.01)
+        assert scheduler.depth == 0
+
+        release.set()
+        await asyncio.sleep(0.01)
+        assert scheduler.stats()["active"] == 0
+        assert scheduler.depth == 0
+
+    asyncio.run(scenario())
+
+
+def test_jobs_for_one_user_run_in_order():
+    async def scenario():
+        scheduler = RequestScheduler(max_workers=4)
+        order = []
+
+        def job(n):
+            async def run():
+                await asyncio.sleep(0.01 * (3 - n))
+                order.append(n)
+            return run
+
+        for n in range(3):
+            scheduler.submit("U1", job(n))
+        assert await scheduler.drain(1) == 0
+        assert order == [0, 1, 2]
+        assert scheduler.submit("U1", job(0)) is None
+
+    asyncio.run(scenario())
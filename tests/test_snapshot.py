@@ -0,0 +1,104 @@
+import json
+import os
+from datetime import date
+from types import SimpleNamespace
+
+from cache import AnswerCache, ToolResultCache
+from context_builder import ContextBuilder
+from conversation import ConversationStore
+from snapshot import StateSnapshot
+
+
+def make_bot():
+    return SimpleNamespace(
+        conversation_history=ConversationStore(max_turns=5),
+        context=ContextBuilder(),
+        tool_cache=ToolResultCache(ttl=300),
+        answer_cache=AnswerCache(ttl=120),
+    )
+
+
+def say(bot, user_id, role, content):
+    turn = bot.conversation_history.append(user_id, role, content)
+    bot.context.record(user_id, turn, bot.conversation_history.history(user_id)[:-1])
+    return turn
+
+
+def backdate(path, seconds):
+    with open(path) as f:
+        data = json.load(f)
+    data["saved_at"] -= seconds
+    with open(path, "w") as f:
+        json.dump(data, f)
+
+
+def test_restore_hands_over_conversations_facts_and_caches(tmp_path):
+    path = str(tmp_path / "state.json")
+    old = make_bot()
+    say(old, "U1", "user", "Find me flights from JFK to LAX on 2026-11-03")
+    say(old, "U1", "assistant", "Round trip or one way?")
+    old.tool_cache.store("Search_SearchOneWayFlights", {"outbound_date": "2026-11-03"}, {"price": 199})
+    old.answer_cache.set("key", "cached answer")
+    assert StateSnapshot(path).save(old)
+
+    new = make_bot()
+    assert StateSnapshot(path).restore(new)
+    assert not os.path.exists(path)
+    assert [turn.content for turn in new.conversation_history.history("U1")] == [
+        "Find me flights from JFK to LAX on 2026-11-03", "Round trip or one way?",
+    ]
+    facts = new.context.facts("U1")
+    assert (facts.origin, facts.destination, facts.depart_date) == ("JFK", "LAX", date(2026, 11, 3))
+    assert new.tool_cache.has("Search_SearchOneWayFlights", {"outbound_date": "2026-11-03"})
+    assert new.answer_cache.get("key") == "cached answer"
+
+
+def test_turns_recorded_while_both_ran_are_merged_and_applied(tmp_path):
+    path = str(tmp_path / "state.json")
+    old = make_bot()
+    say(old, "U1", "user", "Find me flights from JFK to LAX on 2026-11-03")
+    say(old, "U1", "assistant", "Round trip or one way?")
+    assert StateSnapshot(path).save(old)
+
+    new = make_bot()
+    # The user's reply reached the new process before the old one exited
+    say(new, "U1", "user", "Round trip, returning 2026-11-08")
+    assert StateSnapshot(path).restore(new)
+
+    assert [turn.role for turn in new.conversation_history.history("U1")] == ["user", "assistant", "user"]
+    facts = new.context.facts("U1")
+    assert (facts.origin, facts.destination) == ("JFK", "LAX")
+    assert (facts.depart_date, facts.return_date) == (date(2026, 11, 3), date(2026, 11, 8))
+    assert facts.one_way is False
+
+
+def test_cache_entries_keep_only_the_ttl_they_had_left(tmp_path):
+    path = str(tmp_path / "state.json")
+    old = make_bot()
+    old.tool_cache._results.set(("Search_GoogleHotels", "short"), "stale", 50)
+    old.tool_cache._results.set(("Search_GoogleHotels", "long"), "fresh", 300)
+    old.answer_cache.set("answer", "old answer")
+    assert StateSnapshot(path).save(old)
+    backdate(path, 100)
+
+    new = make_bot()
+    assert StateSnapshot(path).restore(new)
+    entries = {arguments: (result, ttl) for _, arguments, result, ttl in new.tool_cache.entries()}
+    assert set(entries) == {"long"}
+    assert 190 < entries["long"][1] <= 200
+    assert new.answer_cache.get("answer") == "old answer"
+    assert new.answer_cache.entries()[0][2] <= 20
+
+
+def test_stale_or_missing_snapshots_are_ignored_and_removed(tmp_path):
+    path = str(tmp_path / "state.json")
+    assert not StateSnapshot(path).restore(make_bot())
+
+    old = make_bot()
+    say(old, "U1", "user", "hotel in Paris")
+    assert StateSnapshot(path, max_age=60).save(old)
+    backdate(path, 120)
+    new = make_bot()
+    assert not StateSnapshot(path, max_age=60).restore(new)
+    assert not os.path.exists(path)
+    assert new.conversation_history.history("U1") == []
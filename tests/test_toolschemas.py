@@ -0,0 +1,27 @@
+import asyncio
+from types import SimpleNamespace
+
+from toolschemas import DeferredToolset
+
+
+def test_a_retried_fetch_still_reports_the_loaded_tools():
+    loaded = []
+    attempts = []
+
+    async def fetch():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise ConnectionError("Arcade unreachable")
+        return [SimpleNamespace(name="Search_SearchOneWayFlights")]
+
+    async def scenario():
+        toolset = DeferredToolset(fetch, on_loaded=loaded.append)
+        first = toolset.start()
+        await asyncio.gather(first, return_exceptions=True)
+        assert loaded == []
+        tool = await toolset.live("Search_SearchOneWayFlights")
+        assert tool.name == "Search_SearchOneWayFlights"
+
+    asyncio.run(scenario())
+    assert len(attempts) == 2
+    assert [[tool.name for tool in tools] for tools in loaded] == [["Search_SearchOneWayFlights"]]
@@ -0,0 +1,58 @@
+from datetime import date
+
+from trip import TripFacts
+
+TODAY = date(2026, 10, 18)
+
+
+def facts(*messages):
+    trip = TripFacts()
+    for message in messages:
+        trip.update(message, TODAY)
+    return trip
+
+
+def test_route_and_dates():
+    trip = facts("Find me flights from JFK to LAX on 2026-11-03", "What about returning 2026-11-08?")
+    assert (trip.origin, trip.destination) == ("JFK", "LAX")
+    assert trip.depart_date == date(2026, 11, 3)
+    assert trip.return_date == date(2026, 11, 8)
+    assert trip.one_way is False
+    assert trip.kind == "flights"
+
+
+def test_place_names_stop_before_dates():
+    assert facts("hotel in Paris Nov 3 to Nov 6").location == "Paris"
+    assert facts("flights to San Francisco Dec 4").destination == "San Francisco"
+    assert facts("fly to Austin December 3").destination == "Austin"
+    assert facts("fly to Austin December").destination == "Austin"
+    assert facts("flights to Denver Friday").destination == "Denver"
+
+
+def test_place_names_stop_at_sentence_ends_and_function_words():
+    trip = facts("I want to fly to Paris. Also need a hotel")
+    assert (trip.destination, trip.location) == ("Paris", "Paris")
+    assert facts("What about flights To Tokyo In December?").destination == "Tokyo"
+    assert facts("Flights to Paris On Nov 3").destination == "Paris"
+    assert facts("Flights from Boston And Chicago").origin == "Boston"
+    assert facts("fly to St. Louis Nov 3").destination == "St. Louis"
+
+
+def test_multi_word_places_are_kept():
+    trip = facts("flights from Los Angeles to Sao Paulo")
+    assert (trip.origin, trip.destination) == ("Los Angeles", "Sao Paulo")
+    assert facts("hotels in New York City").location == "New York City"
+
+
+def test_hotel_details():
+    trip = facts("Can you find a hotel in Chicago?", "Check in 2026-11-14, check out 2026-11-16, 2 guests")
+    assert trip.kind == "hotels"
+    assert trip.location == "Chicago"
+    assert (trip.depart_date, trip.return_date) == (date(2026, 11, 14), date(2026, 11, 16))
+    assert trip.guests == 2
+    assert trip.hotel_ready
+
+
+def test_as_dict_round_trip():
+    trip = facts("SFO to ORD 2026-11-14 one way under $300")
+    assert TripFacts.from_dict(trip.as_dict()).as_dict() == trip.as_dict()
@@ -0,0 +1,122 @@
+import asyncio
+import json
+from datetime import date, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+from fanout import search_request
+from watches import PriceWatcher, WatchStore, current_requester, route_key
+
+TRIP = date.today() + timedelta(days=30)
+
+
+class StubSearch:
+    """A search tool whose lowest price is whatever the test sets"""
+
+    def __init__(self, name, price):
+        self.name = name
+        self.price = price
+        self.calls = []
+
+    async def on_invoke_tool(self, ctx, arguments):
+        self.calls.append(json.loads(arguments))
+        return {"best_flights": [{"price": self.price}]}
+
+
+class StubOutbound:
+    def __init__(self):
+        self.sent = []
+
+    async def send(self, channel, text):
+        self.sent.append((channel, text))
+
+
+def watcher(price, interval=3600):
+    tool, args = search_request("flights", "JFK", "LAX", TRIP)
+    search = StubSearch(tool, price)
+    outbound = StubOutbound()
+    prices = PriceWatcher(WatchStore(":memory:"), outbound, interval=interval, tick=1)
+    prices.bind([search])
+    return prices, search, outbound, tool, args
+
+
+def add(prices, user_id, tool, args, threshold, channel=None, travel_date=TRIP):
+    return prices.store.add(user_id, channel, tool, args, "JFK → LAX", threshold, travel_date.isoformat(), 0)
+
+
+def test_one_search_per_route_however_many_watch_it(agents_sdk):
+    prices, search, outbound, tool, args = watcher(price=250)
+    add(prices, "U1", tool, args, threshold=300)
+    add(prices, "U2", tool, args, threshold=200, channel="D2")
+    add(prices, "U3", tool, dict(reversed(list(args.items()))), threshold=260)
+
+    assert asyncio.run(prices.poll_once(now=100)) == 1
+    assert search.calls == [args]
+    assert sorted(channel for channel, _ in outbound.sent) == ["U1", "U3"]
+    # Rescheduled about one interval out, so the next tick has nothing due
+    assert asyncio.run(prices.poll_once(now=101)) == 0
+    assert prices.stats() == {"watches": 3, "routes": 1, "polls": 1, "alerts": 2}
+
+
+def test_alerts_once_then_re_arms_above_the_target(agents_sdk):
+    prices, search, outbound, tool, args = watcher(price=250)
+    add(prices, "U1", tool, args, threshold=300, channel="C1")
+    route = route_key(tool, args)
+
+    async def scenario():
+        await prices._notify(route, 250, None)
+        await prices._notify(route, 240, 250)
+        assert len(outbound.sent) == 1
+        await prices._notify(route, 320, 240)
+        await prices._notify(route, 280, 320)
+
+    asyncio.run(scenario())
+    assert [channel for channel, _ in outbound.sent] == ["U1", "U1"]
+    assert "down from $320" in outbound.sent[1][1]
+
+
+def test_failed_alerts_stay_armed(agents_sdk):
+    prices, search, outbound, tool, args = watcher(price=250)
+    add(prices, "U1", tool, args, threshold=300)
+
+    async def refuse(channel, text):
+        raise ConnectionError("Slack unreachable")
+
+    prices.outbound = SimpleNamespace(send=refuse)
+    asyncio.run(prices._notify(route_key(tool, args), 250, None))
+    prices.outbound = outbound
+    asyncio.run(prices._notify(route_key(tool, args), 250, None))
+    assert len(outbound.sent) == 1
+
+
+def test_expired_watches_drop_their_routes():
+    store = WatchStore(":memory:")
+    old_tool, old_args = search_request("flights", "SFO", "ORD", date(2026, 1, 5))
+    tool, args = search_request("flights", "JFK", "LAX", TRIP)
+    store.add("U1", None, old_tool, old_args, "SFO → ORD", 200, "2026-01-05", 0)
+    shared = store.add("U1", None, tool, args, "JFK → LAX", 200, TRIP.isoformat(), 0)
+    store.add("U2", None, tool, args, "JFK → LAX", 300, TRIP.isoformat(), 0)
+
+    assert store.expire("2026-02-01") == 1
+    assert store.count() == (2, 1)
+    assert store.remove("U2", shared) is False
+    assert store.remove("U1", shared) is True
+    assert store.count() == (1, 1)
+
+
+@pytest.mark.parametrize("max_price, created", [(0, True), (None, False)])
+def test_a_zero_target_is_not_missing(agents_sdk, max_price, created):
+    prices, search, outbound, tool, args = watcher(price=250)
+    request = {
+        "action": "create", "origin": "JFK", "destination": "LAX",
+        "depart_date": TRIP.isoformat(), "max_price": max_price,
+    }
+
+    async def scenario():
+        current_requester.set(("U1", "D1"))
+        return await prices.handle(request)
+
+    reply = asyncio.run(scenario())
+    assert reply.startswith("Watch #1 created") is created
+    assert ("max_price" in reply) is not created
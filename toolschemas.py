@@ -0,0 +1,148 @@
+"""
+On-disk cache of Arcade tool definitions for fast warm starts
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+from importlib import metadata
+from typing import Awaitable, Callable, Dict, List, Optional, Sequence
+
+logger = logging.getLogger("flyme.toolschemas")
+
+# Bump when the cached file layout changes
+FORMAT_VERSION = 1
+
+ToolFetcher = Callable[[], Awaitable[list]]
+
+
+def _package_version(name: str) -> str:
+    try:
+        return metadata.version(name)
+    except metadata.PackageNotFoundError:
+        return "unknown"
+
+
+def tool_schema_version(toolkits: Sequence[str]) -> str:
+    """Key that invalidates the cache when the toolkits or SDK versions change"""
+    return ";".join([
+        f"format={FORMAT_VERSION}",
+        f"toolkits={','.join(sorted(toolkits))}",
+        f"agents-arcade={_package_version('agents-arcade')}",
+        f"arcadepy={_package_version('arcadepy')}",
+        f"openai-agents={_package_version('openai-agents')}",
+    ])
+
+
+def tool_spec(tool) -> dict:
+    """The serializable part of a FunctionTool"""
+    return {
+        "name": tool.name,
+        "description": tool.description,
+        "params_json_schema": tool.params_json_schema,
+        "strict_json_schema": getattr(tool, "strict_json_schema", False),
+    }
+
+
+class ToolSchemaCache:
+    """JSON file holding the tool specs from the last successful fetch"""
+
+    def __init__(self, path: str, max_age: float = 7 * 24 * 3600):
+        self.path = path
+        self.max_age = max_age
+
+    def load(self, version: str) -> Optional[List[dict]]:
+        """Cached specs, or None if missing, unreadable, too old or from another version"""
+        if not self.path:
+            return None
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable tool cache {self.path}: {e}")
+            return None
+        if data.get("version") != version:
+            logger.info("Tool cache is from a different version; fetching tools")
+            return None
+        if time.time() - data.get("saved_at", 0) > self.max_age:
+            logger.info("Tool cache expired; fetching tools")
+            return None
+        specs = data.get("tools")
+        return specs if isinstance(specs, list) and specs else None
+
+    def save(self, specs: List[dict], version: str):
+        if not self.path:
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Write then rename so a crash never leaves a half-written cache
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                json.dump({"version": version, "saved_at": time.time(), "tools": specs}, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.warning(f"Could not write tool cache {self.path}: {e}")
+
+
+class DeferredToolset:
+    """FunctionTools built from cached specs, bound to the live tools later
+
+    The agent can be created from the cached specs without waiting on the
+    network. The real tools are fetched in the background; a call that
+    arrives before they are loaded waits for the fetch (retrying it if an
+    earlier attempt failed) and is then delegated by name. on_loaded gets
+    the tools of whichever fetch succeeds.
+    """
+
+    def __init__(self, fetch: ToolFetcher, on_loaded: Optional[Callable[[list], None]] = None):
+        self._fetch = fetch
+        self._on_loaded = on_loaded
+        self._live: Optional[Dict[str, object]] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> asyncio.Task:
+        """Begin fetching the live tools if no fetch is running"""
+        if self._task is None or (self._task.done() and self._live is None):
+            self._task = asyncio.get_running_loop().create_task(self._load())
+        return self._task
+
+    async def _load(self) -> list:
+        tools = await self._fetch()
+        self._live = {tool.name: tool for tool in tools}
+        if self._on_loaded is not None:
+            try:
+                self._on_loaded(tools)
+            except Exception:
+                logger.exception("Handling the fetched tools failed")
+        return tools
+
+    async def live(self, name: str):
+        if self._live is None:
+            await asyncio.shield(self.start())
+        tool = self._live.get(name)
+        if tool is None:
+            raise RuntimeError(f"Tool {name} is no longer offered by Arcade")
+        return tool
+
+    def tools(self, specs: List[dict]) -> list:
+        from agents import FunctionTool
+
+        def make_tool(spec: dict):
+            async def invoke(ctx, arguments, _name=spec["name"]):
+                tool = await self.live(_name)
+                return await tool.on_invoke_tool(ctx, arguments)
+
+            return FunctionTool(
+                name=spec["name"],
+                description=spec["description"],
+                params_json_schema=spec["params_json_schema"],
+                on_invoke_tool=invoke,
+                strict_json_schema=spec.get("strict_json_schema", False)
+            )
+
+        return [make_tool(spec) for spec in specs]
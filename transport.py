@@ -0,0 +1,157 @@
+"""
+Shared, pooled HTTP transport for the Slack, Arcade and OpenAI clients
+"""
+import asyncio
+import importlib.util
+import logging
+import os
+import time
+from typing import Dict, Optional
+
+logger = logging.getLogger("flyme.transport")
+
+# Hosts kept warm; the base URLs follow the same env vars the SDKs honour
+WARM_URLS = {
+    "openai": os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1"),
+    "arcade": os.getenv("ARCADE_BASE_URL", "https://api.arcade.dev"),
+    "slack": "https://slack.com/api/api.test",
+}
+
+# Marks warm-up requests so rate limiters and metrics can skip them
+WARMUP_EXTENSION = "flyme_warmup"
+
+
+class HttpTransport:
+    """Connection pools with keep-alive for every outbound API
+
+    Arcade and OpenAI each get an httpx client (HTTP/2 when the h2 package
+    is installed) and Slack's web client gets an aiohttp session; all use
+    the same pool limits and keep-alive expiry. A background task sends a
+    cheap HEAD request to any upstream that has been idle for
+    warm_interval, so pooled connections (and their TLS sessions) are still
+    open when the next real request arrives.
+    """
+
+    def __init__(
+        self,
+        max_connections: int = 100,
+        max_keepalive: int = 20,
+        keepalive_expiry: float = 90,
+        http2: bool = True,
+        connect_timeout: float = 5,
+        warm_interval: float = 30,
+        warm_timeout: float = 10,
+    ):
+        self.max_connections = max_connections
+        self.max_keepalive = max_keepalive
+        self.keepalive_expiry = keepalive_expiry
+        self.http2 = http2 and importlib.util.find_spec("h2") is not None
+        if http2 and not self.http2:
+            logger.info("h2 not installed; using HTTP/1.1 keep-alive")
+        self.connect_timeout = connect_timeout
+        self.warm_timeout = warm_timeout
+        self.warm_interval = warm_interval
+        self._clients: Dict[str, object] = {}
+        self._slack_session = None
+        self._last_used: Dict[str, float] = {}
+        self._warmer: Optional[asyncio.Task] = None
+        self.warmups = 0
+
+    def client(self, name: str, event_hooks: Optional[dict] = None):
+        """The pooled httpx.AsyncClient for one upstream (created on first use)"""
+        client = self._clients.get(name)
+        if client is not None:
+            return client
+        import httpx
+
+        async def mark_used(response):
+            if not response.request.extensions.get(WARMUP_EXTENSION):
+                self._last_used[name] = time.monotonic()
+
+        hooks = {"request": [], "response": [mark_used]}
+        for kind, callbacks in (event_hooks or {}).items():
+            hooks.setdefault(kind, []).extend(callbacks)
+        client = httpx.AsyncClient(
+            http2=self.http2,
+            limits=httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_keepalive,
+                keepalive_expiry=self.keepalive_expiry
+            ),
+            # Stainless SDKs adopt a custom client's timeout, so bot.py and ratelimit.py
+            # pass each SDK its DEFAULT_TIMEOUT; this one only covers warm-up requests
+            timeout=httpx.Timeout(self.warm_timeout, connect=self.connect_timeout),
+            event_hooks=hooks
+        )
+        self._clients[name] = client
+        self._last_used[name] = time.monotonic()
+        return client
+
+    def slack_session(self):
+        """The pooled aiohttp session for Slack's AsyncWebClient"""
+        if self._slack_session is None:
+            import aiohttp
+
+            async def mark_used(session, context, params):
+                self._last_used["slack"] = time.monotonic()
+
+            trace = aiohttp.TraceConfig()
+            trace.on_request_end.append(mark_used)
+            connector = aiohttp.TCPConnector(
+                limit=self.max_connections,
+                keepalive_timeout=self.keepalive_expiry,
+                ttl_dns_cache=300
+            )
+            self._slack_session = aiohttp.ClientSession(connector=connector, trace_configs=[trace])
+            self._last_used["slack"] = time.monotonic()
+        return self._slack_session
+
+    def slack_client(self, token: Optional[str]):
+        from slack_sdk.web.async_client import AsyncWebClient
+        return AsyncWebClient(token=token, session=self.slack_session())
+
+    def start(self):
+        if self.warm_interval and self._warmer is None:
+            self._warmer = asyncio.get_running_loop().create_task(self._keep_warm())
+
+    async def warm(self, name: str):
+        """Send one HEAD request through an upstream's pool"""
+        url = WARM_URLS[name]
+        try:
+            if name == "slack":
+                async with self.slack_session().head(url) as response:
+                    await response.read()
+            else:
+                client = self._clients[name]
+                request = client.build_request("HEAD", url, extensions={WARMUP_EXTENSION: True})
+                await (await client.send(request)).aclose()
+            self.warmups += 1
+        except Exception as e:
+            logger.debug(f"Warm-up of {name} failed: {e}")
+
+    async def _keep_warm(self):
+        while True:
+            await asyncio.sleep(self.warm_interval)
+            now = time.monotonic()
+            idle = [
+                name for name, used in self._last_used.items()
+                if name in WARM_URLS and now - used >= self.warm_interval
+            ]
+            if idle:
+                await asyncio.gather(*(self.warm(name) for name in idle))
+                for name in idle:
+                    self._last_used[name] = time.monotonic()
+
+    def stats(self):
+        return {"clients": sorted(self._clients), "http2": self.http2, "warmups": self.warmups}
+
+    async def close(self):
+        if self._warmer:
+            self._warmer.cancel()
+            self._warmer = None
+        for client in self._clients.values():
+            await client.aclose()
+        self._clients.clear()
+        if self._slack_session is not None:
+            await self._slack_session.close()
+            self._slack_session = None
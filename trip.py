@@ -0,0 +1,321 @@
+"""
+Trip fact extraction (places, dates, guests, budget) from user messages
+"""
+import re
+from datetime import date, timedelta
+from typing import List, Optional
+
+MONTHS = {
+    "jan": 1, "january": 1, "feb": 2, "february": 2, "mar": 3, "march": 3,
+    "apr": 4, "april": 4, "may": 5, "jun": 6, "june": 6, "jul": 7, "july": 7,
+    "aug": 8, "august": 8, "sep": 9, "sept": 9, "september": 9, "oct": 10,
+    "october": 10, "nov": 11, "november": 11, "dec": 12, "december": 12,
+}
+WEEKDAYS = {
+    "monday": 0, "mon": 0, "tuesday": 1, "tue": 1, "tues": 1, "wednesday": 2, "wed": 2,
+    "thursday": 3, "thu": 3, "thurs": 3, "friday": 4, "fri": 4, "saturday": 5, "sat": 5,
+    "sunday": 6, "sun": 6,
+}
+
+_MONTH_NAMES = "|".join(sorted(MONTHS, key=len, reverse=True))
+_WEEKDAY_NAMES = "|".join(sorted(WEEKDAYS, key=len, reverse=True))
+
+# One alternation, scanned once, so dates come back in the order they appear
+_DATE_PATTERN = re.compile(
+    r"(?P<iso>\b\d{4}-\d{1,2}-\d{1,2}\b)"
+    rf"|\b(?P<month_a>{_MONTH_NAMES})\.?\s+(?P<day_a>\d{{1,2}})(?:st|nd|rd|th)?(?:,?\s+(?P<year_a>\d{{4}}))?\b"
+    rf"|\b(?P<day_b>\d{{1,2}})(?:st|nd|rd|th)?\s+(?:of\s+)?(?P<month_b>{_MONTH_NAMES})(?:,?\s+(?P<year_b>\d{{4}}))?\b"
+    r"|\b(?P<m_slash>\d{1,2})/(?P<d_slash>\d{1,2})(?:/(?P<y_slash>\d{2,4}))?\b"
+    r"|\b(?P<today>today|tonight)\b"
+    r"|\b(?P<tomorrow>tomorrow)\b"
+    r"|\bin\s+(?P<in_days>\d{1,2})\s+days?\b"
+    rf"|\b(?P<rel>next|this|on)\s+(?P<weekday>{_WEEKDAY_NAMES})\b",
+    re.IGNORECASE
+)
+
+# Uppercase 3-letter tokens that are not airport codes
+_NOT_AIRPORTS = {
+    "THE", "AND", "FOR", "YOU", "NOT", "ANY", "USD", "EUR", "GBP", "CAD", "AUD",
+    "USA", "ETA", "PTO", "FYI", "BTW", "EST", "PST", "CST", "MST", "EDT",
+    "PDT", "CDT", "MDT", "UTC", "GMT",
+}
+_AIRPORT = re.compile(r"\b[A-Z]{3}\b")
+_ROUTE = re.compile(r"\b([A-Z]{3})\s*(?:to|->|→|-)\s*([A-Z]{3})\b")
+# Words that look like places after "to"/"in" but are not, and that end a place name
+_PLACE_STOPWORDS = {
+    "I", "I'm", "Me", "My", "We", "Our", "The", "A", "An", "It", "This", "That", "Please", "Thanks",
+    "In", "On", "At", "To", "From", "For", "With", "By", "Near", "Into", "Via", "Of",
+    "And", "Or", "But", "So", "Then", "Also", "Is", "Are",
+}
+_STOPWORD_NAMES = "|".join(re.escape(word) for word in sorted(_PLACE_STOPWORDS, key=len, reverse=True))
+# A capitalized word; a trailing "." only on abbreviations ("St. Louis", not "Paris. Also")
+_PLACE_WORD = r"(?:(?:St|Ste|Ft|Mt)\.|[A-Z][\w'-]*(?:\.[\w'-]+)*)"
+# Up to four capitalized words, stopping before a month, weekday or stopword ("Paris Nov 3", "Tokyo In")
+_PLACE_WORDS = (
+    rf"({_PLACE_WORD}(?:\s+"
+    rf"(?!(?i:{_MONTH_NAMES}|{_WEEKDAY_NAMES})\b)(?!(?:{_STOPWORD_NAMES})\b)"
+    rf"{_PLACE_WORD}){{0,3}})"
+)
+_FROM_PLACE = re.compile(r"\b(?i:from)\s+" + _PLACE_WORDS)
+_TO_PLACE = re.compile(r"\b(?i:to|into)\s+" + _PLACE_WORDS)
+_IN_PLACE = re.compile(r"\b(?i:in|near|at)\s+" + _PLACE_WORDS)
+_GUESTS = re.compile(r"\b(\d{1,2})\s+(?:guests?|people|persons?|adults?|travell?ers?|of us)\b", re.IGNORECASE)
+_BUDGET = re.compile(
+    r"(?:under|below|less than|max(?:imum)?|budget(?: of| is)?|up to|<)\s*\$?\s*(\d[\d,]*)"
+    r"|\$\s*(\d[\d,]*)\s*(?:max|or less|budget)",
+    re.IGNORECASE
+)
+_RETURN_CUE = re.compile(r"\b(return\w*|back|coming home|check[\s-]?out|until|through)\b", re.IGNORECASE)
+_HOTEL_CUE = re.compile(r"\b(hotels?|accommodations?|lodging|resorts?|motels?|check[\s-]?in)\b", re.IGNORECASE)
+_FLIGHT_CUE = re.compile(r"\b(flights?|fly|flying|airfare|plane|nonstop|non-stop|direct|one[\s-]?way|round[\s-]?trip)\b", re.IGNORECASE)
+_ONE_WAY = re.compile(r"\bone[\s-]?way\b", re.IGNORECASE)
+_ROUND_TRIP = re.compile(r"\b(round[\s-]?trip|return\w*|coming back)\b", re.IGNORECASE)
+_NONSTOP = re.compile(r"\b(non[\s-]?stop|direct)\b", re.IGNORECASE)
+_FLEXIBLE = re.compile(r"\b(flexible|whenever|any ?time|don'?t care)\b", re.IGNORECASE)
+_CHEAPEST = re.compile(r"\b(cheapest|cheap|lowest price|least expensive|affordable|inexpensive)\b", re.IGNORECASE)
+_FASTEST = re.compile(r"\b(fastest|quickest|shortest|least time)\b", re.IGNORECASE)
+_MONTH_ONLY = re.compile(
+    rf"\b(?:in|during|early|mid|late)\s+(?:(?:early|mid|late)\s+)?(?P<month>{_MONTH_NAMES})\b"
+    r"|\b(?P<next>next month)\b",
+    re.IGNORECASE
+)
+
+_ORDINAL = re.compile(r"\d+(?:st|nd|rd|th)?")
+
+# Words that carry no search intent once places, dates and the request kind are extracted
+_FILLER = {
+    "a", "an", "the", "me", "my", "i", "im", "i'm", "we", "us", "need", "want", "find", "search",
+    "look", "looking", "for", "please", "pls", "can", "could", "you", "would", "like", "to",
+    "from", "in", "on", "at", "into", "near", "show", "get", "some", "any", "hi", "hello", "hey",
+    "thanks", "thank", "book", "what", "are", "is", "there", "with", "and", "or", "of", "going",
+    "go", "trip", "flight", "flights", "fly", "flying", "hotel", "hotels", "stay", "options",
+    "next", "this", "between", "depart", "departing", "leaving", "returning", "return", "back",
+}
+_WORD = re.compile(r"[a-z0-9$']+")
+
+
+def _resolve_year(month: int, day: int, year: Optional[str], today: date) -> Optional[date]:
+    try:
+        if year:
+            y = int(year)
+            return date(y + 2000 if y < 100 else y, month, day)
+        candidate = date(today.year, month, day)
+        # A month/day with no year means the next occurrence
+        if candidate < today:
+            candidate = date(today.year + 1, month, day)
+        return candidate
+    except ValueError:
+        return None
+
+
+def parse_dates(text: str, today: Optional[date] = None) -> List[date]:
+    """Every date mentioned in text, resolved against today, in order of appearance"""
+    today = today or date.today()
+    found = []
+    for match in _DATE_PATTERN.finditer(text):
+        groups = match.groupdict()
+        value = None
+        if groups["iso"]:
+            try:
+                value = date.fromisoformat("-".join(f"{int(p):02d}" for p in groups["iso"].split("-")))
+            except ValueError:
+                value = None
+        elif groups["month_a"]:
+            value = _resolve_year(MONTHS[groups["month_a"].lower()], int(groups["day_a"]), groups["year_a"], today)
+        elif groups["month_b"]:
+            value = _resolve_year(MONTHS[groups["month_b"].lower()], int(groups["day_b"]), groups["year_b"], today)
+        elif groups["m_slash"]:
+            value = _resolve_year(int(groups["m_slash"]), int(groups["d_slash"]), groups["y_slash"], today)
+        elif groups["today"]:
+            value = today
+        elif groups["tomorrow"]:
+            value = today + timedelta(days=1)
+        elif groups["in_days"]:
+            value = today + timedelta(days=int(groups["in_days"]))
+        elif groups["weekday"]:
+            target = WEEKDAYS[groups["weekday"].lower()]
+            if groups["rel"].lower() == "next":
+                # "next friday" is the friday of next (Monday-start) week
+                value = today + timedelta(days=7 - today.weekday() + target)
+            else:
+                value = today + timedelta(days=(target - today.weekday()) % 7 or 7)
+        if value is not None:
+            found.append(value)
+    return found
+
+
+def find_airport_codes(text: str) -> List[str]:
+    """Uppercase 3-letter tokens that could be IATA codes, in order"""
+    return [code for code in _AIRPORT.findall(text) if code not in _NOT_AIRPORTS]
+
+
+def request_modifiers(text: str, facts: "TripFacts") -> List[str]:
+    """Sorted words of a request left after removing its extracted facts and filler
+
+    Two requests with the same facts and modifiers ask for the same thing,
+    however they are phrased ("flights SFO to JFK next Friday" vs "find me
+    a flight from SFO to JFK next friday please").
+    """
+    text = _DATE_PATTERN.sub(" ", text)
+    text = _GUESTS.sub(" ", text)
+    text = _BUDGET.sub(" ", text)
+    for place in (facts.origin, facts.destination, facts.location):
+        if place:
+            text = re.sub(rf"\b{re.escape(place)}\b", " ", text, flags=re.IGNORECASE)
+    words = set(_WORD.findall(text.lower())) - _FILLER
+    return sorted(words)
+
+
+def _is_date_word(word: str) -> bool:
+    word = word.lower().rstrip(".,")
+    return word in MONTHS or word in WEEKDAYS or bool(_ORDINAL.fullmatch(word))
+
+
+def _clean_place(place: str) -> Optional[str]:
+    words = place.split()
+    while words and (words[-1] in _PLACE_STOPWORDS or _is_date_word(words[-1])):
+        words.pop()
+    if not words or words[0] in _PLACE_STOPWORDS or _DATE_PATTERN.fullmatch(" ".join(words)):
+        return None
+    if words[0].lower() in MONTHS or words[0].lower() in WEEKDAYS:
+        return None
+    return " ".join(words).rstrip(".,!?")
+
+
+class TripFacts:
+    """What FlyMe knows about the trip so far, updated one message at a time"""
+
+    __slots__ = (
+        "kind", "origin", "destination", "location", "depart_date", "return_date",
+        "one_way", "guests", "budget", "nonstop", "flexible", "month", "priority",
+    )
+
+    def __init__(self):
+        self.kind: Optional[str] = None
+        self.origin: Optional[str] = None
+        self.destination: Optional[str] = None
+        self.location: Optional[str] = None
+        self.depart_date: Optional[date] = None
+        self.return_date: Optional[date] = None
+        self.one_way: Optional[bool] = None
+        self.guests: Optional[int] = None
+        self.budget: Optional[float] = None
+        self.nonstop: Optional[bool] = None
+        self.flexible: bool = False
+        self.month: Optional[int] = None
+        # "price" or "duration" when the user said what matters most
+        self.priority: Optional[str] = None
+
+    def update(self, text: str, today: Optional[date] = None) -> "TripFacts":
+        """Fold one user message into the known facts; later messages win"""
+        today = today or date.today()
+
+        if _HOTEL_CUE.search(text):
+            self.kind = "hotels"
+        elif _FLIGHT_CUE.search(text):
+            self.kind = "flights"
+
+        route = _ROUTE.search(text)
+        if route:
+            self.origin, self.destination = route.group(1), route.group(2)
+        else:
+            from_place = _FROM_PLACE.search(text)
+            to_place = _TO_PLACE.search(text)
+            if from_place:
+                self.origin = _clean_place(from_place.group(1)) or self.origin
+            if to_place:
+                self.destination = _clean_place(to_place.group(1)) or self.destination
+            if not from_place and not to_place:
+                codes = find_airport_codes(text)
+                if len(codes) >= 2:
+                    self.origin, self.destination = codes[0], codes[1]
+                elif len(codes) == 1 and not self.destination:
+                    self.destination = codes[0]
+
+        in_place = _IN_PLACE.search(text)
+        if in_place:
+            place = _clean_place(in_place.group(1))
+            if place:
+                self.location = place
+        if self.kind == "hotels" and not self.location and self.destination:
+            self.location = self.destination
+
+        dates = parse_dates(text, today)
+        if len(dates) >= 2:
+            self.depart_date, self.return_date = dates[0], dates[1]
+        elif len(dates) == 1:
+            if self.depart_date and _RETURN_CUE.search(text) and dates[0] >= self.depart_date:
+                self.return_date = dates[0]
+            else:
+                self.depart_date = dates[0]
+                if self.return_date and self.return_date < dates[0]:
+                    self.return_date = None
+
+        if _ONE_WAY.search(text):
+            self.one_way = True
+        elif _ROUND_TRIP.search(text) or self.return_date:
+            self.one_way = False
+
+        guests = _GUESTS.search(text)
+        if guests:
+            self.guests = int(guests.group(1))
+        budget = _BUDGET.search(text)
+        if budget:
+            self.budget = float((budget.group(1) or budget.group(2)).replace(",", ""))
+        if _NONSTOP.search(text):
+            self.nonstop = True
+        if _FLEXIBLE.search(text):
+            self.flexible = True
+        if _CHEAPEST.search(text):
+            self.priority = "price"
+        elif _FASTEST.search(text):
+            self.priority = "duration"
+        month = _MONTH_ONLY.search(text)
+        if month:
+            if month.group("next"):
+                self.month = today.month % 12 + 1
+            else:
+                self.month = MONTHS[month.group("month").lower()]
+        return self
+
+    @property
+    def flight_ready(self) -> bool:
+        """Enough to run a flight search without asking anything"""
+        if not (self.origin and self.destination and self.depart_date):
+            return False
+        return self.one_way is True or self.return_date is not None
+
+    @property
+    def hotel_ready(self) -> bool:
+        return bool((self.location or self.destination) and self.depart_date and self.return_date)
+
+    @property
+    def complete(self) -> bool:
+        return self.hotel_ready if self.kind == "hotels" else self.flight_ready
+
+    def as_dict(self) -> dict:
+        values = {}
+        for name in self.__slots__:
+            value = getattr(self, name)
+            if value is None or value is False:
+                continue
+            values[name] = value.isoformat() if isinstance(value, date) else value
+        return values
+
+    @classmethod
+    def from_dict(cls, values: dict) -> "TripFacts":
+        """Inverse of as_dict (e.g. for facts restored from a snapshot)"""
+        facts = cls()
+        for name, value in values.items():
+            if name in ("depart_date", "return_date"):
+                value = date.fromisoformat(value)
+            if name in cls.__slots__:
+                setattr(facts, name, value)
+        return facts
+
+    def render(self) -> str:
+        """One compact line for the prompt, e.g. 'origin=SFO; depart_date=2026-11-03'"""
+        return "; ".join(f"{k}={v}" for k, v in self.as_dict().items())
+
+    def __bool__(self) -> bool:
+        return bool(self.as_dict())
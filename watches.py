@@ -0,0 +1,400 @@
+"""
+Persistent price watches polled in the background, one search per route
+"""
+import asyncio
+import contextvars
+import json
+import logging
+import random
+import sqlite3
+import time
+import zlib
+from datetime import date
+from typing import Any, Dict, List, Optional, Tuple
+
+from cache import normalize_arguments
+from fanout import lowest_price, search_request
+from metrics import REGISTRY
+from ratelimit import BACKGROUND, current_priority
+
+logger = logging.getLogger("flyme.watches")
+
+WATCH_TOOL = "FlyMe_PriceWatch"
+
+WATCH_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "action": {
+            "type": "string",
+            "enum": ["create", "list", "cancel"],
+            "description": "Create a watch, list the user's watches, or cancel one"
+        },
+        "kind": {
+            "type": "string",
+            "enum": ["flights", "hotels"],
+            "description": "Watch flight or hotel prices (create only)"
+        },
+        "origin": {
+            "type": "string",
+            "description": "Departure airport IATA code (flights only)"
+        },
+        "destination": {
+            "type": "string",
+            "description": "Arrival airport IATA code for flights, or city/area for hotels"
+        },
+        "depart_date": {
+            "type": "string",
+            "description": "Outbound or check-in date, YYYY-MM-DD"
+        },
+        "return_date": {
+            "type": "string",
+            "description": "Return or check-out date, YYYY-MM-DD. Omit for one-way flights"
+        },
+        "guests": {
+            "type": "integer",
+            "description": "Number of hotel guests (hotels only)"
+        },
+        "max_price": {
+            "type": "number",
+            "description": "Alert the user when the lowest price drops to or below this (USD)"
+        },
+        "watch_id": {
+            "type": "integer",
+            "description": "Watch to cancel (cancel only)"
+        }
+    },
+    "required": ["action"],
+    "additionalProperties": False
+}
+
+WATCH_DESCRIPTION = (
+    "Watch a flight route or hotel stay and DM the user when the lowest price "
+    "drops to their target. Use when the user asks to be told about price drops "
+    "or to 'check again later'. Also lists or cancels the user's watches."
+)
+
+# Slack user and channel behind the request running in the current task
+current_requester: contextvars.ContextVar[Optional[Tuple[str, Optional[str]]]] = contextvars.ContextVar(
+    "current_requester", default=None
+)
+
+
+def route_key(tool: str, args: Dict[str, Any]) -> str:
+    """Watches with the same key are served by the same search"""
+    return f"{tool}:{normalize_arguments(args)}"
+
+
+class WatchStore:
+    """SQLite tables of watches and the last price seen per route"""
+
+    def __init__(self, path: str = ":memory:"):
+        self.path = path or ":memory:"
+        self.db = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS watches ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " user_id TEXT NOT NULL,"
+            " channel TEXT,"
+            " route TEXT NOT NULL,"
+            " label TEXT NOT NULL,"
+            " threshold REAL NOT NULL,"
+            " armed INTEGER NOT NULL DEFAULT 1,"
+            " travel_date TEXT NOT NULL,"
+            " created_at REAL NOT NULL)"
+        )
+        self.db.execute("CREATE INDEX IF NOT EXISTS watches_route ON watches (route)")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS routes ("
+            " route TEXT PRIMARY KEY,"
+            " tool TEXT NOT NULL,"
+            " args TEXT NOT NULL,"
+            " price REAL,"
+            " checked_at REAL,"
+            " next_check REAL NOT NULL)"
+        )
+
+    def add(self, user_id: str, channel: Optional[str], tool: str, args: Dict[str, Any],
+            label: str, threshold: float, travel_date: str, next_check: float) -> int:
+        route = route_key(tool, args)
+        with self.db:
+            self.db.execute("BEGIN")
+            self.db.execute(
+                "INSERT OR IGNORE INTO routes (route, tool, args, next_check) VALUES (?, ?, ?, ?)",
+                (route, tool, json.dumps(args), next_check)
+            )
+            cursor = self.db.execute(
+                "INSERT INTO watches (user_id, channel, route, label, threshold, travel_date, created_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (user_id, channel, route, label, threshold, travel_date, time.time())
+            )
+        return cursor.lastrowid
+
+    def for_user(self, user_id: str) -> List[tuple]:
+        return self.db.execute(
+            "SELECT w.id, w.label, w.threshold, r.price FROM watches w JOIN routes r USING (route)"
+            " WHERE w.user_id = ? ORDER BY w.id",
+            (user_id,)
+        ).fetchall()
+
+    def remove(self, user_id: str, watch_id: int) -> bool:
+        cursor = self.db.execute(
+            "DELETE FROM watches WHERE id = ? AND user_id = ?", (watch_id, user_id)
+        )
+        self._drop_orphan_routes()
+        return cursor.rowcount > 0
+
+    def expire(self, today: str) -> int:
+        """Drop watches for trips that have already started"""
+        cursor = self.db.execute("DELETE FROM watches WHERE travel_date < ?", (today,))
+        self._drop_orphan_routes()
+        return cursor.rowcount
+
+    def _drop_orphan_routes(self):
+        self.db.execute("DELETE FROM routes WHERE route NOT IN (SELECT DISTINCT route FROM watches)")
+
+    def due_routes(self, now: float, limit: int) -> List[tuple]:
+        return self.db.execute(
+            "SELECT route, tool, args, price FROM routes WHERE next_check <= ? ORDER BY next_check LIMIT ?",
+            (now, limit)
+        ).fetchall()
+
+    def watchers(self, route: str) -> List[tuple]:
+        return self.db.execute(
+            "SELECT id, user_id, channel, label, threshold, armed FROM watches WHERE route = ?",
+            (route,)
+        ).fetchall()
+
+    def record(self, route: str, price: Optional[float], checked_at: float, next_check: float):
+        self.db.execute(
+            "UPDATE routes SET price = COALESCE(?, price), checked_at = ?, next_check = ? WHERE route = ?",
+            (price, checked_at, next_check, route)
+        )
+
+    def set_armed(self, watch_id: int, armed: bool):
+        self.db.execute("UPDATE watches SET armed = ? WHERE id = ?", (int(armed), watch_id))
+
+    def count(self) -> Tuple[int, int]:
+        watches = self.db.execute("SELECT COUNT(*) FROM watches").fetchone()[0]
+        routes = self.db.execute("SELECT COUNT(*) FROM routes").fetchone()[0]
+        return watches, routes
+
+    def close(self):
+        self.db.close()
+
+
+class PriceWatcher:
+    """Polls watched routes and DMs users whose price target was reached
+
+    Watches on the same route (same search tool and normalized arguments)
+    share one search per interval however many users registered them.
+    Each route's schedule is offset by a stable hash of the route plus a
+    little random jitter, so routes registered together do not poll
+    together, and at most max_per_tick routes are searched per tick.
+    A watch alerts once when the price falls to its threshold and re-arms
+    if the price climbs back above it.
+    """
+
+    def __init__(
+        self,
+        store: WatchStore,
+        outbound,
+        interval: float = 3 * 3600,
+        tick: float = 60,
+        max_per_tick: int = 5,
+        max_per_user: int = 10,
+    ):
+        self.store = store
+        self.outbound = outbound
+        self.interval = interval
+        self.tick = tick
+        self.max_per_tick = max_per_tick
+        self.max_per_user = max_per_user
+        self.tools: Dict[str, Any] = {}
+        self._task: Optional[asyncio.Task] = None
+        self.polls = 0
+        self.alerts = 0
+
+    def bind(self, tools):
+        """Use these (cached, rate-limited) search tools for polling"""
+        self.tools = {tool.name: tool for tool in tools if hasattr(tool, "on_invoke_tool")}
+
+    def _next_check(self, route: str, now: float) -> float:
+        # Stable per-route phase in [0.9, 1.1) of the interval, plus jitter
+        phase = 0.9 + 0.2 * (zlib.crc32(route.encode()) % 1000) / 1000
+        return now + self.interval * phase + random.uniform(0, self.tick)
+
+    async def _search(self, tool_name: str, args: Dict[str, Any]) -> Optional[float]:
+        tool = self.tools.get(tool_name)
+        if tool is None:
+            return None
+        from agents import RunContextWrapper
+        ctx = RunContextWrapper(context={"user_id": "flyme_watcher"})
+        return lowest_price(await tool.on_invoke_tool(ctx, json.dumps(args)))
+
+    async def create(self, user_id: str, channel: Optional[str], args: Dict[str, Any]) -> str:
+        if len(self.store.for_user(user_id)) >= self.max_per_user:
+            return f"The user already has {self.max_per_user} watches; cancel one first."
+        kind = args.get("kind", "flights")
+        depart = date.fromisoformat(args["depart_date"])
+        inbound = date.fromisoformat(args["return_date"]) if args.get("return_date") else None
+        if kind == "hotels" and inbound is None:
+            return "Hotel watches need a check-out date (return_date)."
+        if depart < date.today():
+            return "That date has already passed."
+        tool, tool_args = search_request(
+            kind, args.get("origin", ""), args["destination"], depart, inbound, args.get("guests")
+        )
+        if kind == "hotels":
+            label = f"hotels in {args['destination']}, {depart:%b %d}–{inbound:%b %d}"
+        else:
+            label = f"{tool_args['departure_airport_code']} → {tool_args['arrival_airport_code']} on {depart:%b %d}"
+            if inbound:
+                label += f", back {inbound:%b %d}"
+        threshold = float(args["max_price"])
+        route = route_key(tool, tool_args)
+        now = time.time()
+        watch_id = self.store.add(
+            user_id, channel, tool, tool_args, label, threshold, depart.isoformat(),
+            self._next_check(route, now)
+        )
+        # Baseline from the search the user most likely just ran (usually a cache hit)
+        current = await self._search(tool, tool_args)
+        if current is not None:
+            self.store.record(route, current, now, self._next_check(route, now))
+            if current <= threshold:
+                self.store.set_armed(watch_id, False)
+        REGISTRY.counter("flyme_watches_created_total", "Price watches registered").inc()
+        now_text = f" It's ${current:,.0f} right now." if current is not None else ""
+        return (
+            f"Watch #{watch_id} created for {label}. FlyMe will DM the user when the lowest "
+            f"price is ${threshold:,.0f} or less.{now_text}"
+        )
+
+    def list(self, user_id: str) -> str:
+        rows = self.store.for_user(user_id)
+        if not rows:
+            return "The user has no price watches."
+        lines = []
+        for watch_id, label, threshold, price in rows:
+            last = f"last seen ${price:,.0f}" if price is not None else "not checked yet"
+            lines.append(f"#{watch_id}: {label}, target ${threshold:,.0f}, {last}")
+        return "\n".join(lines)
+
+    def cancel(self, user_id: str, watch_id: Optional[int]) -> str:
+        if watch_id is None:
+            return "Which watch? Give its watch_id (see action=list)."
+        if self.store.remove(user_id, int(watch_id)):
+            return f"Watch #{watch_id} cancelled."
+        return f"No watch #{watch_id} for this user."
+
+    async def handle(self, args: Dict[str, Any]) -> str:
+        requester = current_requester.get()
+        if requester is None:
+            return "Price watches are only available in Slack conversations."
+        user_id, channel = requester
+        action = args.get("action")
+        if action == "list":
+            return self.list(user_id)
+        if action == "cancel":
+            return self.cancel(user_id, args.get("watch_id"))
+        # max_price 0 is a (free) target, not a missing one
+        missing = [k for k in ("destination", "depart_date", "max_price") if args.get(k) in (None, "")]
+        if args.get("kind", "flights") == "flights" and not args.get("origin"):
+            missing.append("origin")
+        if missing:
+            return f"Missing {', '.join(missing)} to create a watch."
+        return await self.create(user_id, channel, args)
+
+    def as_tool(self):
+        """Expose watch management as a single agent tool"""
+        from agents import FunctionTool
+
+        async def on_invoke(ctx, arguments):
+            try:
+                return await self.handle(json.loads(arguments or "{}"))
+            except (KeyError, ValueError) as e:
+                return f"Invalid price watch arguments: {e}"
+
+        return FunctionTool(
+            name=WATCH_TOOL,
+            description=WATCH_DESCRIPTION,
+            params_json_schema=WATCH_SCHEMA,
+            on_invoke_tool=on_invoke,
+            strict_json_schema=False
+        )
+
+    async def poll_once(self, now: Optional[float] = None) -> int:
+        """Search every due route once and alert watchers; returns routes polled"""
+        now = now or time.time()
+        expired = self.store.expire(date.today().isoformat())
+        if expired:
+            logger.info(f"Removed {expired} expired price watches")
+        due = self.store.due_routes(now, self.max_per_tick)
+        for route, tool, args, previous in due:
+            try:
+                price = await self._search(tool, json.loads(args))
+            except Exception as e:
+                logger.warning(f"Watch poll for {route} failed: {e}")
+                price = None
+            self.polls += 1
+            self.store.record(route, price, now, self._next_check(route, now))
+            if price is None:
+                continue
+            if previous is not None and price != previous:
+                logger.info(f"Watched route {route} moved from {previous} to {price}")
+            await self._notify(route, price, previous)
+        return len(due)
+
+    async def _notify(self, route: str, price: float, previous: Optional[float]):
+        for watch_id, user_id, channel, label, threshold, armed in self.store.watchers(route):
+            if price > threshold:
+                if not armed:
+                    self.store.set_armed(watch_id, True)
+                continue
+            if not armed:
+                continue
+            was = f", down from ${previous:,.0f}" if previous is not None and previous > price else ""
+            text = (
+                f"📉 Price alert: {label} is now ${price:,.0f}{was} "
+                f"(your target was ${threshold:,.0f}). Reply here and I'll pull up the options."
+            )
+            try:
+                # Alerts go to the user's DM with FlyMe even if the watch was made in a channel
+                dm = channel if channel and channel.startswith("D") else user_id
+                await self.outbound.send(dm, text)
+            except Exception as e:
+                logger.warning(f"Could not send price alert for watch #{watch_id}: {e}")
+                continue
+            self.store.set_armed(watch_id, False)
+            self.alerts += 1
+            REGISTRY.counter("flyme_watch_alerts_total", "Price alerts sent").inc()
+
+    async def _run(self):
+        # Polls never compete with interactive requests for rate-limit tokens
+        current_priority.set(BACKGROUND)
+        while True:
+            try:
+                await self.poll_once()
+            except Exception as e:
+                logger.error(f"Price watch poll failed: {e}")
+            await asyncio.sleep(self.tick)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self):
+        watches, routes = self.store.count()
+        return {"watches": watches, "routes": routes, "polls": self.polls, "alerts": self.alerts}
+